@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Stand-in for the `pyenv` executable used by run_benchmarks.py. It answers the subcommands the GUI and
+# engine use from a throwaway $PYENV_ROOT, with sizes and delays taken from the environment. Like pyenv's front
+# script, `pyenv <command>` execs a `pyenv-<command>` found on PATH (the sandbox links those to this file too,
+# which then answers as that subcommand), exporting PYENV_ROOT, PYENV_DIR and PYENV_HOOK_PATH first.
+#   FAKE_PYENV_CATALOGUE_LINES     versions printed by `install --list` (default 10000)
+#   FAKE_PYENV_INSTALL_LOG_LINES   lines printed by `install -v` (default 50000)
+#   FAKE_PYENV_INSTALL_SECONDS     total time an install takes, spread over its log (default 0)
+#   FAKE_PYENV_COMMAND_DELAY       seconds every invocation sleeps first, like pyenv's shell start-up (default 0);
+#                                  paid by the front script and again by the subcommand it execs
+import os
+import sys
+import time
+import shutil
+
+FAKE_VERSION = "pyenv 2.4.0-fake"
+
+def env_number(name, default):
+    try: return type(default)(os.environ.get(name, default))
+    except ValueError: return default
+
+def catalogue(count):
+    # Deterministic mix of CPython and the other implementations python-build knows, round-robin
+    families = [
+        lambda i: f"{2 + (i % 10 > 1)}.{i % 14}.{i // 14}",
+        lambda i: f"3.{13 + i % 3}.{i // 3}t",
+        lambda i: f"pypy3.{i % 11}-7.3.{i // 11}",
+        lambda i: f"miniconda3-{i // 12}.{i % 12}.0",
+        lambda i: f"anaconda3-20{10 + i % 15}.{i // 15:02d}",
+        lambda i: f"graalpy-{20 + i // 4}.{i % 4}.0",
+        lambda i: f"micropython-1.{i // 3}.{i % 3}",
+    ]
+    counters = [0] * len(families)
+    lines = []
+    while len(lines) < count:
+        index = len(lines) % len(families)
+        lines.append(families[index](counters[index])); counters[index] += 1
+    return lines
+
+def install_log(version, root, count):
+    # Roughly the phase mix of a real verbose CPython build
+    yield f"Downloading Python-{version}.tar.xz...\n"
+    yield f"-> https://www.python.org/ftp/python/{version}/Python-{version}.tar.xz\n"
+    yield f"Installing Python-{version}...\n"
+    body = max(0, count - 5)
+    for i in range(body):
+        fraction = i / max(1, body)
+        if fraction < 0.15: yield f"checking for feature_{i}... yes\n"
+        elif fraction < 0.80: yield f"gcc -pthread -fno-strict-overflow -O3 -Wall -c ./Objects/object_{i}.c -o Objects/object_{i}.o\n"
+        elif fraction < 0.97: yield f"/usr/bin/install -c -m 644 ./Lib/module_{i}.py {root}/versions/{version}/lib/python3/module_{i}.py\n"
+        else: yield f"Looking in links: /tmp/tmp{i}\n"
+    yield "Successfully installed pip-24.0 setuptools-69.0\n"
+    yield f"Installed Python-{version} to {root}/versions/{version}\n"
+
+def local_version_file(start):
+    directory = os.path.abspath(start)
+    while True:
+        candidate = os.path.join(directory, ".python-version")
+        if os.path.isfile(candidate): return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory: return None
+        directory = parent
+
+def read_versions(path):
+    with open(path) as f: return [word for line in f for word in line.split() if not word.startswith("#")]
+
+def dispatch(command, args):
+    # What pyenv's front script does: prepare the environment and exec pyenv-<command> if PATH has one
+    name = "pyenv---version" if command in ("--version", "-v") else f"pyenv-{command}"
+    path = shutil.which(name) if command and command != "--help" else None
+    if not path: return
+    root = os.environ.get("PYENV_ROOT") or os.path.expanduser("~/.pyenv")
+    os.environ.update(PYENV_ROOT=root, PYENV_DIR=os.environ.get("PYENV_DIR") or os.getcwd(),
+                      PYENV_HOOK_PATH=os.path.join(root, "pyenv.d"))
+    os.execv(path, [path] + ([] if command in ("--version", "-v") else args))
+
+def main(argv):
+    time.sleep(env_number("FAKE_PYENV_COMMAND_DELAY", 0.0))
+    root = os.environ.get("PYENV_ROOT") or os.path.expanduser("~/.pyenv")
+    versions_dir = os.path.join(root, "versions")
+    invoked_as = os.path.basename(sys.argv[0])
+    if invoked_as.startswith("pyenv-"): # A subcommand link: pyenv-global, pyenv---version, ...
+        command, args = invoked_as[len("pyenv-"):], argv
+    else:
+        command, args = (argv[0], argv[1:]) if argv else ("", [])
+        dispatch(command, args)
+    if command == "--version": print(FAKE_VERSION)
+    elif command == "root": print(root)
+    elif command == "rehash": pass
+    elif command == "versions" and "--bare" in args:
+        for name in sorted(os.listdir(versions_dir)) if os.path.isdir(versions_dir) else []: print(name)
+    elif command == "global":
+        global_file = os.path.join(root, "version")
+        if args:
+            with open(global_file, "w") as f: f.write("\n".join(args) + "\n")
+        else: print("\n".join(read_versions(global_file)) if os.path.isfile(global_file) else "system")
+    elif command == "local":
+        if args:
+            with open(".python-version", "w") as f: f.write("\n".join(args) + "\n")
+            return 0
+        path = local_version_file(os.getcwd())
+        if path is None:
+            sys.stderr.write("pyenv: no local version configured for this directory\n"); return 1
+        print("\n".join(read_versions(path)))
+    elif command == "install" and "--list" in args:
+        print("Available versions:")
+        for line in catalogue(env_number("FAKE_PYENV_CATALOGUE_LINES", 10000)): print(f"  {line}")
+    elif command == "install" and args:
+        version = args[-1]
+        count = env_number("FAKE_PYENV_INSTALL_LOG_LINES", 50000)
+        pause = env_number("FAKE_PYENV_INSTALL_SECONDS", 0.0) / max(1, count) * 100 # Sleep per 100 lines, not per line
+        out = sys.stdout
+        for i, line in enumerate(install_log(version, root, count)):
+            out.write(line)
+            if pause and i % 100 == 99: out.flush(); time.sleep(pause)
+        os.makedirs(os.path.join(versions_dir, version, "bin"), exist_ok=True)
+        with open(os.path.join(versions_dir, version, "bin", "python"), "w") as f: f.write("#!/bin/sh\n")
+    elif command == "uninstall" and args:
+        shutil.rmtree(os.path.join(versions_dir, args[-1]), ignore_errors=True)
+    else:
+        sys.stderr.write(f"pyenv: no such command `{command}'\n"); return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# Performance benchmarks for pyenv-gui, run against benchmarks/fake_pyenv.py in a throwaway PYENV_ROOT,
+# cache and HOME, so nothing real is touched and the numbers do not depend on the local pyenv setup.
+#
+#   python benchmarks/run_benchmarks.py                      # engine benchmarks, plus GUI ones if a display (or Xvfb) exists
+#   python benchmarks/run_benchmarks.py --display xvfb       # start a private Xvfb for the GUI benchmarks
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json --max-regression 15
+#
+# Results go to a JSON file (benchmarks/results/bench-<timestamp>.json by default). --compare prints the change
+# of every metric against an earlier file; metrics ending in _per_sec and the command_speedup ratios are better
+# when higher, all others when lower.
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+import fake_pyenv
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+def peak_rss_kb(who=None):
+    if resource is None: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss # bytes on macOS, KiB elsewhere
+
+def summarize_latency_ms(samples):
+    return {"median": round(statistics.median(samples), 3), "p90": round(sorted(samples)[int(len(samples) * 0.9)], 3), "max": round(max(samples), 3)}
+
+def summarize_ms(samples):
+    return {"median": round(statistics.median(samples), 3), "max": round(max(samples), 3),
+            "per_keystroke": [round(s, 3) for s in samples]}
+
+def keystrokes(query):
+    # Typing query one character at a time, then deleting it again
+    typed = [query[:i] for i in range(1, len(query) + 1)]
+    return typed + typed[-2::-1] + [""]
+
+# --- Sandbox ---
+class Sandbox:
+    # PYENV_ROOT with `installed` versions, a global and a local version file, the fake pyenv (and its
+    # pyenv-<command> links) first on PATH, and private HOME/XDG_CACHE_HOME. apply() points this process at it;
+    # env is for child processes.
+    SUBCOMMANDS = ("--version", "root", "rehash", "versions", "global", "local", "install", "uninstall")
+    def __init__(self, options):
+        self.options = options
+        self.dir = tempfile.mkdtemp(prefix="pyenv-gui-bench-")
+        self.root = os.path.join(self.dir, "root")
+        self.bin_dir = os.path.join(self.dir, "bin")
+        self.project_dir = os.path.join(self.dir, "project")
+        self.home = os.path.join(self.dir, "home")
+        for d in (self.bin_dir, self.project_dir, self.home, os.path.join(self.root, "versions")): os.makedirs(d)
+        with open(os.path.join(BENCH_DIR, "fake_pyenv.py")) as f: source = f.read()
+        self.pyenv = os.path.join(self.bin_dir, "pyenv")
+        with open(self.pyenv, "w") as f: f.write(f"#!{sys.executable}\n" + source.split("\n", 1)[1])
+        os.chmod(self.pyenv, 0o755)
+        for command in self.SUBCOMMANDS: os.symlink("pyenv", os.path.join(self.bin_dir, f"pyenv-{command}"))
+        self.original_env = dict(os.environ)
+        self.installed = fake_pyenv.catalogue(options.installed)
+        for version in self.installed: os.makedirs(os.path.join(self.root, "versions", version, "bin"))
+        with open(os.path.join(self.root, "version"), "w") as f: f.write(self.installed[0] + "\n")
+        with open(os.path.join(self.project_dir, ".python-version"), "w") as f: f.write(self.installed[-1] + "\n")
+        self.env = {k: v for k, v in os.environ.items() if not k.startswith(("PYENV", "FAKE_PYENV_", "PYTHON_BUILD"))}
+        self.env.update(PATH=self.bin_dir + os.pathsep + os.environ.get("PATH", ""), PYENV_ROOT=self.root, HOME=self.home,
+                        XDG_CACHE_HOME=os.path.join(self.dir, "cache"), LOCALAPPDATA=os.path.join(self.dir, "cache"),
+                        FAKE_PYENV_CATALOGUE_LINES=str(options.catalogue_lines),
+                        FAKE_PYENV_INSTALL_LOG_LINES=str(options.install_log_lines),
+                        FAKE_PYENV_INSTALL_SECONDS=str(options.install_seconds),
+                        FAKE_PYENV_COMMAND_DELAY=str(options.command_delay))
+
+    def apply(self):
+        os.environ.clear(); os.environ.update(self.env)
+        os.chdir(self.project_dir)
+
+    def clear_cache(self):
+        shutil.rmtree(self.env["XDG_CACHE_HOME"], ignore_errors=True)
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def run_timed(command, env, cwd):
+    # (wall seconds, exit code, stdout, peak RSS in KiB of the child) for a fresh process
+    with tempfile.TemporaryFile() as out:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=out, stderr=subprocess.DEVNULL, env=env, cwd=cwd)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            process.wait(); rss = None
+        elapsed = time.perf_counter() - start
+        out.seek(0)
+        return elapsed, process.returncode, out.read().decode(errors="replace"), rss
+
+# --- Engine benchmarks (no display needed) ---
+def bench_engine(sandbox, options):
+    import pyenv_engine
+    results = {}
+    engine_script = os.path.join(REPO_DIR, "pyenv_engine.py")
+    sandbox.clear_cache()
+    for label in ("cold", "warm"): # Fresh process each; "cold" starts without the install --list cache
+        seconds, code, output, rss = run_timed([sys.executable, engine_script, "list", "--available"], sandbox.env, sandbox.project_dir)
+        if code != 0: raise RuntimeError(f"headless list failed ({code}): {output[:500]}")
+        results[f"headless_list_available_{label}_seconds"] = round(seconds, 4)
+        results[f"headless_list_available_{label}_peak_rss_kb"] = rss
+    seconds, code, output, rss = run_timed([sys.executable, engine_script, "current"], sandbox.env, sandbox.project_dir)
+    results["headless_current_seconds"] = round(seconds, 4)
+
+    sandbox.apply(); sandbox.clear_cache()
+    start = time.perf_counter()
+    engine = pyenv_engine.PyenvEngine()
+    results["engine_construct_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    start = time.perf_counter(); engine.probe()
+    results["engine_probe_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    start = time.perf_counter(); lines = engine.refresh_catalogue(None)
+    results["catalogue_fetch_seconds"] = round(time.perf_counter() - start, 4)
+    start = time.perf_counter(); engine.cached_catalogue()
+    results["catalogue_cache_load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    start = time.perf_counter(); index = pyenv_engine.CatalogueIndex(pyenv_engine.parse_install_list(lines))
+    results["catalogue_index_build_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    samples = []
+    for query in keystrokes(options.filter_query):
+        start = time.perf_counter(); index.search(query); samples.append((time.perf_counter() - start) * 1000)
+    results["catalogue_search_keystroke_ms"] = summarize_ms(samples)
+
+    start = time.perf_counter(); installed = pyenv_engine.scan_installed_versions(engine.pyenv_root_path)
+    results["scan_installed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["scan_installed_count"] = len(installed)
+
+    for mode in ("native", "subprocess"):
+        engine.version_resolver_mode = mode
+        done, pending = threading.Event(), {"installed", "current", "available"}
+        def deliver_for(source):
+            def deliver(result, error):
+                pending.discard(source)
+                if not pending: done.set()
+            return deliver
+        coordinator = pyenv_engine.RefreshCoordinator()
+        coordinator.register("installed", engine.installed_versions, deliver_for("installed"))
+        coordinator.register("current", lambda flight: engine.current_versions(flight=flight), deliver_for("current"))
+        coordinator.register("available", lambda flight: engine.refresh_catalogue(engine.catalogue_key, flight=flight), deliver_for("available"))
+        start = time.perf_counter()
+        for source in ("installed", "current", "available"): coordinator.request(source)
+        done.wait(60)
+        results[f"refresh_wall_{mode}_seconds"] = round(time.perf_counter() - start, 4)
+        results[f"refresh_{mode}_processes"] = sum(counters.get("processes", 0) for counters in coordinator.stats().values())
+
+    finished, line_count = threading.Event(), [0]
+    def on_job_event(event, job, data):
+        if event == "output": line_count[0] += 1
+        elif event == "finished": finished.set()
+    engine.add_job_listener(on_job_event)
+    job = engine.submit_install("3.99.0")
+    finished.wait(600)
+    engine.remove_job_listener(on_job_event)
+    seconds = job.finished_at - job.started_at
+    results["install_seconds"] = round(seconds, 4)
+    results["install_log_lines"] = line_count[0]
+    results["install_log_lines_per_sec"] = round(line_count[0] / seconds) if seconds > 0 else None
+    results["install_status"] = job.status
+    results.update(bench_command_modes(options))
+    if options.real_pyenv:
+        real = shutil.which("pyenv", path=sandbox.original_env.get("PATH")) if options.real_pyenv == "auto" else options.real_pyenv
+        if real:
+            os.environ.clear(); os.environ.update(sandbox.original_env)
+            try: results["real_pyenv"] = dict(bench_command_modes(options, real), pyenv=real)
+            finally: sandbox.apply()
+        else: results["real_pyenv"] = None
+    results["harness_peak_rss_kb"] = peak_rss_kb()
+    return results
+
+COMMAND_BENCH = (["--version"], ["global"], ["local"], ["versions", "--bare"], ["install", "--list"])
+
+def bench_command_modes(options, pyenv_executable=None):
+    # Per-command latency of PyenvEngine.capture() spawning pyenv each time vs. going through the PyenvSession.
+    # Uses the current environment (the sandbox after Sandbox.apply(), or the real pyenv); commands are read-only.
+    import pyenv_engine
+    results = {}
+    for mode in ("spawn", "session"):
+        os.environ["PYENV_GUI_COMMAND_MODE"] = mode
+        engine = pyenv_engine.PyenvEngine(pyenv_executable_path=pyenv_executable)
+        if engine.session:
+            start = time.perf_counter()
+            engine.session.warm()
+            results["session_start_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            if engine.session.disabled_reason: raise RuntimeError(f"pyenv session unavailable: {engine.session.disabled_reason}")
+        latencies = {}
+        for command in COMMAND_BENCH:
+            engine.capture(["pyenv", *command], timeout=60) # Not timed: fills OS caches (and the session's command lookup)
+            samples = []
+            for _ in range(options.command_repeats):
+                start = time.perf_counter()
+                engine.capture(["pyenv", *command], timeout=60)
+                samples.append((time.perf_counter() - start) * 1000)
+            latencies["_".join(c.strip("-") for c in command)] = summarize_latency_ms(samples)
+        results[f"command_latency_{mode}_ms"] = latencies
+        if engine.session:
+            results["session_counters"] = dict(engine.session.counters)
+            engine.session.close()
+    os.environ.pop("PYENV_GUI_COMMAND_MODE", None)
+    results["command_speedup"] = {name: round(results["command_latency_spawn_ms"][name]["median"] / max(1e-6, latency["median"]), 2)
+                                  for name, latency in results["command_latency_session_ms"].items()}
+    return results
+
+# --- GUI benchmarks (need a display) ---
+PROFILE_LINE = re.compile(r"^\s+(.+?)\s+([\d.]+) ms\s+\(\+([\d.]+)\)$")
+
+def start_xvfb():
+    executable = shutil.which("Xvfb")
+    if not executable: return None, None
+    display = next(n for n in range(99, 199) if not os.path.exists(f"/tmp/.X{n}-lock"))
+    process = subprocess.Popen([executable, f":{display}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{display}"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill(); return None, None
+        time.sleep(0.05)
+    return process, f":{display}"
+
+def measure_gui_startup(sandbox, timeout=60):
+    # Runs the GUI with --startup-profile until it reports its first interactive frame; returns the profile in ms
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "pyenv_tkinter_gui.py"), "--startup-profile"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=sandbox.env, cwd=sandbox.project_dir)
+    timer = threading.Timer(timeout, process.kill); timer.start()
+    profile = {}
+    try:
+        for line in process.stderr:
+            match = PROFILE_LINE.match(line.rstrip("\n"))
+            if match: profile[match.group(1)] = float(match.group(2))
+            if "first interactive frame" in profile: break
+    finally:
+        timer.cancel(); process.terminate()
+        if hasattr(os, "wait4"):
+            _, _, usage = os.wait4(process.pid, 0)
+            profile["peak_rss_kb"] = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else: process.wait()
+    if "first interactive frame" not in profile: raise RuntimeError("the GUI never reported its first interactive frame")
+    return profile
+
+def pump(root, condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise TimeoutError("GUI benchmark step timed out")
+        root.update(); time.sleep(0.001)
+
+def bench_gui(sandbox, options):
+    results = {}
+    sandbox.clear_cache()
+    for label in ("cold", "warm"): # "warm" has the previous run's session and catalogue caches
+        profile = measure_gui_startup(sandbox)
+        results[f"startup_to_interactive_{label}_ms"] = profile["first interactive frame"]
+        results[f"startup_{label}_peak_rss_kb"] = profile.pop("peak_rss_kb", None)
+        results[f"startup_{label}_profile_ms"] = profile
+        if label == "cold": time.sleep(1) # Give the cold run's background fetches time to write their caches
+
+    sandbox.apply()
+    import tkinter as tk
+    import pyenv_tkinter_gui
+    root = tk.Tk()
+    app = pyenv_tkinter_gui.PyenvGUI(root)
+    if not app.is_successfully_initialized: raise RuntimeError("PyenvGUI failed to initialize against the fake pyenv")
+    delivered = lambda: {s: c.get("delivered", 0) + c.get("failed", 0) for s, c in app.refresh.stats().items()}
+    pump(root, lambda: app._startup_finished and all(delivered().values()) and app.gui_queue.empty())
+
+    samples = []
+    for query in keystrokes(options.filter_query):
+        app.filter_var.set(query) # Schedules the debounced filter; run it now instead and time it with its redraw
+        if app._filter_after_id is not None: root.after_cancel(app._filter_after_id)
+        start = time.perf_counter()
+        app.filter_available_versions(); root.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    results["filter_keystroke_ms"] = summarize_ms(samples)
+
+    log_lines = list(fake_pyenv.install_log("3.98.0", sandbox.root, options.queue_lines))
+    start = time.perf_counter()
+    for line in log_lines: app.gui_queue.put(("append_output", line))
+    pump(root, app.gui_queue.empty); root.update_idletasks()
+    results["gui_queue_lines_per_sec"] = round(len(log_lines) / (time.perf_counter() - start))
+
+    before = delivered()
+    start = time.perf_counter()
+    app.refresh_all_data()
+    pump(root, lambda: all(delivered()[s] > before[s] for s in before) and app.gui_queue.empty())
+    results["gui_refresh_wall_seconds"] = round(time.perf_counter() - start, 4)
+
+    job = app.engine.submit_install("3.99.1")
+    start = time.perf_counter()
+    pump(root, lambda: not job.active and app.gui_queue.empty(), timeout=600)
+    results["gui_install_seconds"] = round(time.perf_counter() - start, 4)
+    results["gui_install_lines_per_sec"] = round(options.install_log_lines / (time.perf_counter() - start))
+    results["harness_peak_rss_kb"] = peak_rss_kb()
+    root.destroy()
+    return results
+
+# --- Reporting ---
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in (results or {}).items():
+        if isinstance(value, dict): flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool): flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(old, new, threshold_pct):
+    # Prints each shared metric's change; returns the metrics that got worse by more than threshold_pct
+    old_flat = flatten({"engine": old.get("engine"), "gui": old.get("gui")})
+    new_flat = flatten({"engine": new.get("engine"), "gui": new.get("gui")})
+    regressions = []
+    changed = sorted(k for k in set(old.get("config", {})) | set(new.get("config", {})) if old.get("config", {}).get(k) != new.get("config", {}).get(k))
+    if changed: print(f"Note: the runs used different settings ({', '.join(changed)}); changes may not be regressions.")
+    for name in sorted(set(old_flat) & set(new_flat)):
+        if ".per_keystroke." in name or "session_counters." in name or name.endswith(("_count", "_lines", "_processes")): continue
+        before, after = old_flat[name], new_flat[name]
+        if not before: continue
+        change = (after - before) / before * 100
+        worse = -change if name.endswith("_per_sec") or ".command_speedup." in name else change
+        flag = "REGRESSION" if worse > threshold_pct else ""
+        if flag: regressions.append(name)
+        print(f"{name:<58} {before:>12g} -> {after:<12g} {change:+7.1f}%  {flag}")
+    return regressions
+
+def git_describe():
+    try: return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError): return None
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark pyenv-gui against a fake pyenv and write the results as JSON.")
+    parser.add_argument("--display", choices=("auto", "xvfb", "none"), default="auto",
+                        help="auto: use $DISPLAY or start Xvfb if installed; xvfb: always start a private Xvfb; none: engine benchmarks only")
+    parser.add_argument("--catalogue-lines", type=int, default=10000)
+    parser.add_argument("--installed", type=int, default=500, help="installed versions in the fake PYENV_ROOT")
+    parser.add_argument("--install-log-lines", type=int, default=50000)
+    parser.add_argument("--install-seconds", type=float, default=0.0, help="how long each fake install takes")
+    parser.add_argument("--command-delay", type=float, default=0.0, help="start-up delay of every fake pyenv call")
+    parser.add_argument("--queue-lines", type=int, default=50000, help="console lines pushed through process_gui_queue")
+    parser.add_argument("--command-repeats", type=int, default=20, help="runs per command for the spawn vs. session latency comparison")
+    parser.add_argument("--real-pyenv", nargs="?", const="auto", metavar="PATH",
+                        help="also compare spawn vs. session latency on a real pyenv (read-only commands; default: the one on PATH)")
+    parser.add_argument("--filter-query", default="3.12.1", help="typed (then deleted) one keystroke at a time")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="print changes against an earlier result file")
+    parser.add_argument("--max-regression", type=float, metavar="PCT", help="with --compare, exit 1 if any metric got worse by more than PCT%%")
+    parser.add_argument("--keep-sandbox", action="store_true", help="leave the fake PYENV_ROOT and caches on disk")
+    return parser
+
+def main(argv=None):
+    options = build_arg_parser().parse_args(argv)
+    output = os.path.abspath(options.output or os.path.join(BENCH_DIR, "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    report = {"schema": 1, "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": git_describe(),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "config": {k: v for k, v in vars(options).items() if k not in ("output", "compare", "max_regression", "keep_sandbox")},
+              "engine": None, "gui": None, "gui_skipped": None}
+    sandbox, xvfb = Sandbox(options), None
+    original_cwd = os.getcwd()
+    try:
+        print("Running engine benchmarks...", file=sys.stderr)
+        report["engine"] = bench_engine(sandbox, options)
+        display = os.environ.get("DISPLAY") if options.display == "auto" else None
+        if options.display != "none" and not display:
+            xvfb, display = start_xvfb()
+        if options.display == "none": report["gui_skipped"] = "--display none"
+        elif not display: report["gui_skipped"] = "no $DISPLAY and Xvfb is not available"
+        else:
+            sandbox.env["DISPLAY"] = display
+            print(f"Running GUI benchmarks on display {display}...", file=sys.stderr)
+            try: report["gui"] = bench_gui(sandbox, options)
+            except Exception as e: report["gui_skipped"] = f"GUI benchmarks failed: {e}"
+    finally:
+        os.chdir(original_cwd)
+        if xvfb: xvfb.terminate()
+        if options.keep_sandbox: print(f"Sandbox kept at {sandbox.dir}", file=sys.stderr)
+        else: sandbox.remove()
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f: json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+    if options.compare:
+        with open(options.compare) as f: old = json.load(f)
+        regressions = compare(old, report, options.max_regression if options.max_regression is not None else 10.0)
+        if regressions and options.max_regression is not None: return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
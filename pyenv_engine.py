@@ -0,0 +1,2921 @@
+# UI-independent pyenv engine: path detection, version listing/resolution, the install --list catalogue,
+# the install job scheduler and its caches. Imports nothing from tkinter, so it can be driven headlessly
+# (see main() / `pyenv_tkinter_gui.py --headless`) as well as by the GUI.
+import subprocess
+import threading
+import os
+import sys
+import shutil
+import re
+import time
+import select
+import ctypes
+import ctypes.util
+import json
+import hashlib
+import operator
+import itertools
+import signal
+import collections
+import sqlite3
+import contextlib
+import platform
+import statistics
+import shlex
+import tempfile
+import atexit
+import mmap
+import bisect
+import array
+import stat
+import filecmp
+# asyncio and argparse are imported where they are used: together they add ~70 ms to every GUI start,
+# and only the async API and the headless CLI need them
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+def version_sort_key(version):
+    # Approximates `sort --version-sort`, which is what `pyenv versions` uses
+    return [(0, int(tok), "") if tok.isdigit() else (1, 0, tok) for tok in re.findall(r"\d+|\D+", version)]
+
+def scan_installed_versions(pyenv_root):
+    # Native equivalent of `pyenv versions --bare`: every directory (or symlink to one, e.g. pyenv-virtualenv
+    # aliases) in $PYENV_ROOT/versions, plus the <version>/envs/<name> environments nested inside them.
+    versions_dir = os.path.join(pyenv_root, "versions")
+    versions = []
+    with os.scandir(versions_dir) as entries:
+        top_level = sorted((e for e in entries if e.is_dir()), key=lambda e: version_sort_key(e.name))
+    for entry in top_level:
+        versions.append(entry.name)
+        try:
+            with os.scandir(os.path.join(entry.path, "envs")) as envs:
+                versions.extend(f"{entry.name}/envs/{env.name}" for env in sorted(envs, key=lambda e: e.name) if env.is_dir())
+        except OSError: pass
+    return versions
+
+class VersionsDirWatcher:
+    # Watches $PYENV_ROOT/versions and reports (added, removed, current) to on_change from a daemon thread.
+    # Uses inotify through ctypes where the platform has it, otherwise polls the directory mtime.
+    IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO = 0x100, 0x200, 0x40, 0x80
+    IN_DELETE_SELF, IN_MOVE_SELF, IN_ATTRIB = 0x400, 0x800, 0x4
+    DEBOUNCE_SECONDS = 0.2
+    POLL_INTERVAL_SECONDS = 2.0
+
+    def __init__(self, pyenv_root, on_change, initial_versions=None):
+        self.pyenv_root = pyenv_root
+        self.versions_dir = os.path.join(pyenv_root, "versions")
+        self.on_change = on_change
+        self._known = list(initial_versions) if initial_versions is not None else None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.mode = None # "inotify" or "poll" once started
+
+    def start(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _rescan(self):
+        try: current = scan_installed_versions(self.pyenv_root)
+        except OSError: current = []
+        if self._known is None:
+            self._known = current; return
+        known_set, current_set = set(self._known), set(current)
+        added = [v for v in current if v not in known_set]
+        removed = [v for v in self._known if v not in current_set]
+        self._known = current
+        if added or removed: self.on_change(added, removed, current)
+
+    def _watched_mtimes(self):
+        # The top-level dir mtime changes on add/remove; envs/ dirs have their own mtimes
+        mtimes = []
+        for path in [self.versions_dir] + [os.path.join(self.versions_dir, v.split("/envs/")[0], "envs") for v in (self._known or [])]:
+            try: mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError: mtimes.append(None)
+        return mtimes
+
+    def _init_inotify(self):
+        if not sys.platform.startswith("linux"): return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0: return None
+            return libc, fd
+        except (OSError, AttributeError):
+            return None
+
+    def _add_inotify_watches(self, libc, fd):
+        mask = self.IN_CREATE | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_ATTRIB
+        paths = [self.versions_dir] + sorted({os.path.join(self.versions_dir, v.split("/envs/")[0], "envs") for v in (self._known or [])})
+        # Re-adding a watch on the same inode just updates its mask, so this is safe to call after every change
+        results = [libc.inotify_add_watch(fd, os.fsencode(path), mask) for path in paths if os.path.isdir(path)]
+        return any(result >= 0 for result in results)
+
+    def _run(self):
+        self._rescan()
+        inotify = self._init_inotify()
+        if inotify and self._add_inotify_watches(*inotify):
+            self.mode = "inotify"
+            self._run_inotify(*inotify)
+        else:
+            if inotify: os.close(inotify[1])
+            self.mode = "poll"
+            self._run_poll()
+
+    def _versions_dir_inode(self):
+        try: return os.stat(self.versions_dir).st_ino
+        except OSError: return None
+
+    def _run_inotify(self, libc, fd):
+        watched_inode = self._versions_dir_inode()
+        try:
+            while not self._stop_event.is_set():
+                # Wake up periodically so stop() and a recreated versions/ dir are noticed
+                readable, _, _ = select.select([fd], [], [], 1.0)
+                if not readable:
+                    if self._versions_dir_inode() not in (None, watched_inode):
+                        watched_inode = self._versions_dir_inode()
+                        self._add_inotify_watches(libc, fd); self._rescan()
+                    continue
+                # Let a burst of events (e.g. an install unpacking) settle before rescanning
+                while readable:
+                    try: os.read(fd, 65536)
+                    except BlockingIOError: pass
+                    readable, _, _ = select.select([fd], [], [], self.DEBOUNCE_SECONDS)
+                self._rescan()
+                self._add_inotify_watches(libc, fd)
+                watched_inode = self._versions_dir_inode()
+        finally:
+            os.close(fd)
+
+    def _run_poll(self):
+        last_mtimes = self._watched_mtimes()
+        while not self._stop_event.wait(self.POLL_INTERVAL_SECONDS):
+            mtimes = self._watched_mtimes()
+            if mtimes != last_mtimes:
+                self._rescan()
+                last_mtimes = self._watched_mtimes()
+
+def user_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "pyenv-gui", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/pyenv-gui")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pyenv-gui")
+
+def root_cache_dir(pyenv_root):
+    # Where the caches that belong to one PYENV_ROOT live (catalogue, session, installed scan, shim manifest), so
+    # several roots can be used side by side without evicting each other's entries
+    real_root = os.path.realpath(os.path.expanduser(pyenv_root))
+    name = re.sub(r"[^\w.-]+", "_", os.path.basename(real_root)) or "root"
+    return os.path.join(user_cache_dir(), "roots", f"{name}-{hashlib.sha1(real_root.encode()).hexdigest()[:10]}")
+
+class Tracer:
+    # Opt-in instrumentation: spans, counters and instant events in Chrome trace-event format (open an export in
+    # chrome://tracing or ui.perfetto.dev), plus running per-name aggregates for a live stats view. While disabled,
+    # span() hands out a shared no-op and the other recorders return straight away.
+    # PYENV_GUI_TRACE=1 enables it at start-up; any other value (except 0) is also a file to export to on exit.
+    MAX_EVENTS = 200000 # Oldest events are dropped past this
+
+    def __init__(self, enabled=False, export_path=None):
+        self.enabled = enabled
+        self.export_path = export_path
+        self._origin = time.perf_counter()
+        self._events = collections.deque(maxlen=self.MAX_EVENTS)
+        self._thread_names = {}
+        self._spans = {} # name -> [count, total seconds, max seconds, last seconds]
+        self._counters = {} # name -> [last value, max value]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        value = os.environ.get("PYENV_GUI_TRACE", "").strip()
+        if value.lower() in ("", "0", "false", "no", "off"): return cls()
+        return cls(enabled=True, export_path=None if value.lower() in ("1", "true", "yes", "on") else value)
+
+    def span(self, name, cat="app", **args):
+        # with tracer.span("pyenv install", "subprocess", version=v) as span: ...; span.set(returncode=rc)
+        return TraceSpan(self, name, cat, args) if self.enabled else NULL_SPAN
+
+    def _record(self, event):
+        tid = threading.get_native_id()
+        event["pid"], event["tid"] = os.getpid(), tid
+        if tid not in self._thread_names: self._thread_names[tid] = threading.current_thread().name
+        self._events.append(event)
+
+    def complete(self, name, start, end, cat="app", args=None): # A finished span, bounds from time.perf_counter()
+        if not self.enabled: return
+        duration = end - start
+        self._record({"name": name, "cat": cat, "ph": "X", "ts": (start - self._origin) * 1e6, "dur": duration * 1e6, "args": args or {}})
+        with self._lock:
+            stats = self._spans.setdefault(name, [0, 0.0, 0.0, 0.0])
+            stats[0] += 1; stats[1] += duration; stats[2] = max(stats[2], duration); stats[3] = duration
+
+    def counter(self, name, value):
+        if not self.enabled: return
+        self._record({"name": name, "cat": "counter", "ph": "C", "ts": (time.perf_counter() - self._origin) * 1e6, "args": {"value": value}})
+        with self._lock:
+            last_max = self._counters.setdefault(name, [value, value])
+            last_max[0] = value; last_max[1] = max(last_max[1], value)
+
+    def instant(self, name, cat="app", **args):
+        if not self.enabled: return
+        self._record({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": (time.perf_counter() - self._origin) * 1e6, "args": args})
+
+    def stats(self):
+        # ({span name: (count, total s, max s, last s)}, {counter name: (last, max)}, events buffered)
+        with self._lock:
+            return ({name: tuple(v) for name, v in self._spans.items()},
+                    {name: tuple(v) for name, v in self._counters.items()}, len(self._events))
+
+    def reset(self):
+        with self._lock:
+            self._events.clear(); self._spans.clear(); self._counters.clear()
+
+    def export(self, path): # Returns the number of events written
+        events = list(self._events)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in list(self._thread_names.items())]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+        return len(events)
+
+class TraceSpan:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None: self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+class NullSpan: # What span() returns while tracing is off
+    __slots__ = ()
+    def set(self, **args): pass
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc, tb): return False
+
+NULL_SPAN = NullSpan()
+tracer = Tracer.from_env()
+
+def command_span_name(command_args):
+    # "pyenv install", "pyenv install --list", ...: one stats row per kind of command rather than per version
+    if not command_args: return "command"
+    return " ".join([os.path.basename(str(command_args[0]))] + list(command_args[1:2]) + [a for a in command_args[2:] if a == "--list"])
+
+def python_build_sort_key(name):
+    # Port of python-build's sort_versions: sed 'h; s/[+-]/./g; s/.p\([[:digit:]]\)/.z.\1/; s/$/.z/; G; s/\n/ /'
+    # piped into `LC_ALL=C sort -t. -k 1,1 -k 2,2n -k 3,3n -k 4,4n -k 5,5n`
+    transformed = re.sub(r".p(\d)", r".z.\1", re.sub(r"[+-]", ".", name), count=1) + ".z"
+    line = f"{transformed} {name}"
+    fields = line.split(".")
+    def numeric(index):
+        match = re.match(r"\s*(\d+)", fields[index]) if index < len(fields) else None
+        return int(match.group(1)) if match else 0
+    return (fields[0].encode(), numeric(1), numeric(2), numeric(3), numeric(4), line.encode())
+
+class InstallListCache:
+    # On-disk cache of `pyenv install --list`, keyed on the pyenv version and a fingerprint of every
+    # python-build definitions directory (`share/python-build` of python-build and any plugin).
+    FILE_NAME = "install-list.json"
+
+    def __init__(self, pyenv_root, pyenv_executable, cache_dir=None):
+        self.pyenv_root = pyenv_root
+        self.pyenv_executable = pyenv_executable
+        self.cache_path = os.path.join(cache_dir or user_cache_dir(), self.FILE_NAME)
+
+    def definition_dirs(self):
+        # Same search path pyenv-install/python-build build up: $PYTHON_BUILD_DEFINITIONS, then
+        # share/python-build of each plugin in $PYENV_ROOT and next to the pyenv executable (e.g. Homebrew)
+        dirs = [d for d in os.environ.get("PYTHON_BUILD_DEFINITIONS", "").split(os.pathsep) if d]
+        plugin_roots = [os.path.join(self.pyenv_root, "plugins")]
+        if self.pyenv_executable:
+            plugin_roots.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(self.pyenv_executable))), "plugins"))
+        for plugin_root in plugin_roots:
+            try:
+                with os.scandir(plugin_root) as plugins:
+                    dirs.extend(os.path.join(p.path, "share", "python-build") for p in sorted(plugins, key=lambda e: e.name))
+            except OSError: pass
+        seen, result = set(), []
+        for d in dirs:
+            real = os.path.realpath(d)
+            if real not in seen and os.path.isdir(real):
+                seen.add(real); result.append(real)
+        return result
+
+    def compute_key(self, pyenv_version):
+        digest = hashlib.sha1(str(pyenv_version).encode())
+        for d in self.definition_dirs():
+            try: names, mtime = sorted(os.listdir(d)), os.stat(d).st_mtime_ns
+            except OSError: continue # Removed since definition_dirs() listed it
+            digest.update(f"\0{d}\0{mtime}\0".encode())
+            digest.update("\n".join(names).encode())
+        return digest.hexdigest()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["key"], data["lines"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def store(self, key, lines):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "created": time.time(), "lines": lines}, f)
+        os.replace(tmp_path, self.cache_path) # Atomic, so a concurrent reader never sees a partial file
+
+    def read_definitions(self):
+        # Direct equivalent of `python-build --definitions`, formatted like `pyenv install --list`
+        names = set()
+        for d in self.definition_dirs():
+            try: names.update(n for n in os.listdir(d) if n != "patches")
+            except OSError: pass
+        return ["Available versions:"] + [f"  {n}" for n in sorted(names, key=python_build_sort_key)]
+
+class SessionCache:
+    # What the GUI last showed (installed versions, global/local/shell), so the next start can paint it
+    # before any fetch has run. Entries are only trusted for the PYENV_ROOT they were written for.
+    FILE_NAME = "session.json"
+
+    def __init__(self, pyenv_root, cache_dir=None):
+        self.pyenv_root = pyenv_root
+        self.cache_path = os.path.join(cache_dir or user_cache_dir(), self.FILE_NAME)
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if data.get("pyenv_root") == self.pyenv_root else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def update(self, **fields): # Called from refresh threads; best effort
+        with self._lock:
+            data = self.load()
+            if all(data.get(name) == value for name, value in fields.items()): return
+            data.update(fields, pyenv_root=self.pyenv_root, saved=time.time())
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError: pass
+
+class InstalledVersionScanner:
+    # Disk usage and a health probe for every installed version, so the GUI can show what is worth pruning.
+    # Trees are walked in parallel (scandir, hardlinks counted once per tree, an env nested in <version>/envs
+    # counted under its own row only); each bin/python is started once to report its version and whether ssl
+    # and sqlite3 import. Results are cached in installed-scan.json keyed on the inode and mtime of the version
+    # directory, its bin/ and its site-packages, so a rescan only touches versions that changed.
+    FILE_NAME = "installed-scan.json"
+    PROBE_TIMEOUT_SECONDS = 15
+    # Runs under every interpreter we ship, 2.7 included
+    PROBE_SCRIPT = ("import sys, json\n"
+                    "r = {'python_version': sys.version.split()[0]}\n"
+                    "for m in ('ssl', 'sqlite3'):\n"
+                    "    try: __import__(m); r[m] = True\n"
+                    "    except Exception: r[m] = False\n"
+                    "print(json.dumps(r))\n")
+
+    def __init__(self, pyenv_root, cache_dir=None, max_workers=None):
+        self.pyenv_root = pyenv_root
+        self.versions_dir = os.path.join(pyenv_root, "versions")
+        self.cache_path = os.path.join(cache_dir or user_cache_dir(), self.FILE_NAME)
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) * 2)
+        self.last_scan = {}
+        self._lock = threading.Lock()
+
+    def cached(self): # {version: record} from the last scan of this PYENV_ROOT, without touching the trees
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["entries"] if data.get("pyenv_root") == self.pyenv_root else {}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _save(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pyenv_root": self.pyenv_root, "entries": entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError: pass
+
+    def cache_key(self, version):
+        path = os.path.join(self.versions_dir, version)
+        key = []
+        for directory in [path, os.path.join(path, "bin")] + sorted(glob_site_packages(path)):
+            try: st = os.stat(directory)
+            except OSError: key.append(None); continue
+            key.append([st.st_ino, st.st_mtime_ns])
+        return key
+
+    def scan(self, versions=None, force=False, on_result=None, flight=None):
+        # Returns {version: record}; on_result(record) is called from the pool as each version finishes.
+        # A cancelled flight stops handing out work and raises RefreshCancelled.
+        from concurrent.futures import ThreadPoolExecutor, as_completed # Only paid for by the first scan
+        if versions is None: versions = scan_installed_versions(self.pyenv_root)
+        with self._lock:
+            started = time.perf_counter()
+            previous = {} if force else self.cached()
+            entries, to_scan = {}, []
+            for version in versions:
+                key = self.cache_key(version)
+                record = previous.get(version)
+                if record is not None and record.get("key") == key: entries[version] = record
+                else: to_scan.append((version, key))
+            for record in entries.values():
+                if on_result: on_result(record)
+            def scan_one(version, key):
+                if flight is not None and flight.cancelled.is_set(): return None
+                with tracer.span("scan version", "scan", version=version):
+                    return dict(self.measure(version), key=key)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="version-scan") as pool:
+                futures = [pool.submit(scan_one, version, key) for version, key in to_scan]
+                for future in as_completed(futures):
+                    record = future.result()
+                    if record is None: continue
+                    entries[record["version"]] = record
+                    if on_result: on_result(record)
+            if flight is not None and flight.cancelled.is_set(): raise RefreshCancelled(flight.source)
+            self._save(entries)
+            self.last_scan = {"versions": len(versions), "rescanned": len(to_scan), "cached": len(versions) - len(to_scan),
+                              "seconds": round(time.perf_counter() - started, 3)}
+            return entries
+
+    def measure(self, version):
+        path = os.path.join(self.versions_dir, version)
+        record = {"version": version, "bytes": None, "files": None, "alias_of": None, "python": None,
+                  "python_version": None, "ssl": None, "sqlite3": None, "error": None, "scanned": time.time()}
+        if os.path.islink(path): # pyenv-virtualenv alias: the target has its own row
+            record["alias_of"] = os.path.relpath(os.path.realpath(path), self.versions_dir)
+            return record
+        try: record["bytes"], record["files"] = tree_disk_usage(path, skip=("envs",) if "/" not in version else ())
+        except OSError as e: record["error"] = str(e)
+        record.update(self.probe_interpreter(path))
+        return record
+
+    def probe_interpreter(self, path):
+        python = os.path.join(path, "bin", "python")
+        if sys.platform == "win32": python = os.path.join(path, "python.exe")
+        if not os.path.exists(python): return {"python": "missing"}
+        env = {k: v for k, v in os.environ.items() if k not in ("PYTHONHOME", "PYTHONPATH", "PYTHONSTARTUP")}
+        try:
+            proc = subprocess.run([python, "-E", "-s", "-c", self.PROBE_SCRIPT], capture_output=True, text=True,
+                                  env=env, timeout=self.PROBE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired: return {"python": "timeout"}
+        except OSError as e: return {"python": "broken", "error": str(e)}
+        if proc.returncode != 0: return {"python": "broken", "error": (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]}
+        try: result = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError): return {"python": "broken", "error": "unexpected probe output"}
+        return dict(result, python="ok")
+
+def glob_site_packages(version_path): # lib/python*/site-packages (lib/site-packages for PyPy/Windows layouts)
+    found = []
+    for lib in ("lib", "Lib"):
+        lib_path = os.path.join(version_path, lib)
+        try:
+            with os.scandir(lib_path) as entries:
+                for entry in entries:
+                    if entry.name == "site-packages" or entry.name.startswith(("python", "pypy")):
+                        candidate = entry.path if entry.name == "site-packages" else os.path.join(entry.path, "site-packages")
+                        if os.path.isdir(candidate): found.append(candidate)
+        except OSError: pass
+    return found
+
+def tree_disk_usage(path, skip=()):
+    # (bytes on disk, file count) like `du -s`: allocated blocks where the platform reports them, symlinks
+    # not followed, and a hardlinked inode counted once. Names in `skip` are ignored at the top level only.
+    total = files = 0
+    seen_inodes = set()
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        try: entries = os.scandir(directory)
+        except OSError: continue
+        with entries:
+            for entry in entries:
+                if directory == path and entry.name in skip: continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path); continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError: continue
+                files += 1
+                if st.st_nlink > 1:
+                    if (st.st_dev, st.st_ino) in seen_inodes: continue
+                    seen_inodes.add((st.st_dev, st.st_ino))
+                blocks = getattr(st, "st_blocks", None)
+                total += blocks * 512 if blocks is not None else st.st_size
+    return total, files
+
+class ShimRehasher:
+    # Incremental `pyenv rehash`. pyenv rescans every versions/*/bin and recreates every shim; this keeps a
+    # manifest (shims-manifest.json) of each version's bin/ entries, keyed on the directory's inode and mtime, and
+    # only copies in or deletes the shims whose names appeared or disappeared. New shims are copies of an existing
+    # one, as pyenv copies its prototype. It takes pyenv's own lock (shims/.pyenv-shim) while it works.
+    # Falls back to run_full_rehash() (then records the result) whenever the manifest can't be trusted: none yet,
+    # another PYENV_ROOT, the shims directory not matching what was recorded (someone else rehashed or edited it),
+    # a new shim template (pyenv upgraded), the lock being held, or any error. Shims added or dropped by rehash
+    # hooks are remembered as extra/hidden names from the last full rehash. PYENV_GUI_REHASH=full disables it.
+    FILE_NAME = "shims-manifest.json"
+    LOCK_NAME = ".pyenv-shim"
+    LOCK_WAIT_SECONDS = 10
+
+    def __init__(self, pyenv_root, run_full_rehash, cache_dir=None):
+        self.pyenv_root = pyenv_root
+        self.shims_dir = os.path.join(pyenv_root, "shims")
+        self.versions_dir = os.path.join(pyenv_root, "versions")
+        self.run_full_rehash = run_full_rehash # () -> (ok, error text)
+        self.cache_path = os.path.join(cache_dir or user_cache_dir(), self.FILE_NAME)
+        self.last_result = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if data.get("pyenv_root") == self.pyenv_root else None
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _save(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(data, pyenv_root=self.pyenv_root), f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError: pass
+
+    def _shim_listing(self):
+        with os.scandir(self.shims_dir) as entries:
+            return {entry.name for entry in entries if not entry.name.startswith(".")}
+
+    def _prototype(self, listing): # (path, digest) of an existing shim to copy
+        for name in ["python"] + sorted(listing):
+            path = os.path.join(self.shims_dir, name)
+            try:
+                with open(path, "rb") as f: return path, hashlib.sha256(f.read()).hexdigest()
+            except OSError: continue
+        return None, None
+
+    def _scan_versions(self, previous):
+        # {version: {"key": [ino, mtime_ns], "executables": [...]}}, listing only bin/ dirs that changed; same glob as pyenv
+        versions, rescanned = {}, 0
+        with os.scandir(self.versions_dir) as entries:
+            names = [entry.name for entry in entries if not entry.name.startswith(".")]
+        for name in names:
+            bin_dir = os.path.join(self.versions_dir, name, "bin")
+            try: st = os.stat(bin_dir)
+            except OSError: continue
+            key = [st.st_ino, st.st_mtime_ns]
+            entry = previous.get(name)
+            if entry is None or entry.get("key") != key:
+                try:
+                    with os.scandir(bin_dir) as bin_entries: executables = sorted(e.name for e in bin_entries if not e.name.startswith("."))
+                except OSError: continue
+                entry, rescanned = {"key": key, "executables": executables}, rescanned + 1
+            versions[name] = entry
+        return versions, rescanned
+
+    def adopt(self, previous=None):
+        # Records the shims directory as it is now, e.g. right after `pyenv install`/`uninstall` rehashed
+        with self._lock: return self._adopt(previous)
+
+    def _adopt(self, previous=None):
+        versions, rescanned = self._scan_versions((previous or self._load() or {}).get("versions", {}))
+        listing = self._shim_listing()
+        provided = set(itertools.chain.from_iterable(v["executables"] for v in versions.values()))
+        _, digest = self._prototype(listing)
+        self._save({"versions": versions, "shims": sorted(listing), "prototype": digest,
+                    "extra": sorted(listing - provided), "hidden": sorted(provided - listing)})
+        return rescanned
+
+    def _acquire_pyenv_lock(self):
+        deadline = time.monotonic() + self.LOCK_WAIT_SECONDS
+        while True:
+            try:
+                os.close(os.open(os.path.join(self.shims_dir, self.LOCK_NAME), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o755))
+                return True
+            except FileExistsError:
+                if time.monotonic() > deadline: return False
+                time.sleep(0.1)
+
+    def rehash(self):
+        # Returns {"mode": "incremental"|"full", "added", "removed", "reason", "ok", "error", "seconds"}
+        with self._lock, tracer.span("rehash", "rehash") as span:
+            started = time.perf_counter()
+            result = self._incremental()
+            if result is None or not result["ok"]:
+                reason = result["reason"] if result else self._full_reason
+                ok, error = self.run_full_rehash()
+                try: self._adopt()
+                except OSError: pass
+                result = {"mode": "full", "added": None, "removed": None, "reason": reason, "ok": ok, "error": error}
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            span.set(mode=result["mode"], reason=result["reason"])
+            self.last_result = result
+            return result
+
+    def _incremental(self): # None (with _full_reason set) when only a full rehash will do
+        self._full_reason = None
+        if os.environ.get("PYENV_GUI_REHASH", "").lower() == "full": self._full_reason = "PYENV_GUI_REHASH=full"; return None
+        manifest = self._load()
+        if manifest is None: self._full_reason = "no manifest yet"; return None
+        try:
+            listing = self._shim_listing()
+            if listing != set(manifest.get("shims", ())): self._full_reason = "shims changed outside the GUI"; return None
+            prototype, digest = self._prototype(listing)
+            if prototype is None or digest != manifest.get("prototype"): self._full_reason = "shim template changed"; return None
+            versions, _ = self._scan_versions(manifest.get("versions", {}))
+            provided = set(itertools.chain.from_iterable(v["executables"] for v in versions.values()))
+            expected = (provided - set(manifest.get("hidden", ()))) | set(manifest.get("extra", ()))
+            added, removed = sorted(expected - listing), sorted(listing - expected)
+            if added or removed:
+                if not self._acquire_pyenv_lock(): self._full_reason = "shims are locked by another rehash"; return None
+                try:
+                    for name in added:
+                        if not os.path.exists(os.path.join(self.shims_dir, name)): shutil.copy2(prototype, os.path.join(self.shims_dir, name))
+                    for name in removed:
+                        try: os.unlink(os.path.join(self.shims_dir, name))
+                        except FileNotFoundError: pass
+                finally:
+                    os.unlink(os.path.join(self.shims_dir, self.LOCK_NAME))
+            if self._shim_listing() != expected: return {"mode": "incremental", "ok": False, "reason": "shims did not end up as expected"}
+            self._save(dict(manifest, versions=versions, shims=sorted(expected)))
+            return {"mode": "incremental", "added": len(added), "removed": len(removed), "reason": None, "ok": True, "error": None}
+        except OSError as e:
+            return {"mode": "incremental", "ok": False, "reason": f"incremental rehash failed: {e}"}
+
+class CatalogueRecord:
+    # One `pyenv install --list` entry split into what the catalogue view groups and sorts by:
+    #   3.13.0rc2             cpython, series 3.13, prerelease rc2
+    #   3.14t-dev             cpython, series 3.14, free-threaded development branch
+    #   pypy3.10-7.3.17       pypy, series 3.10 (the Python it implements), then its own 7.3.17
+    #   miniconda3-24.1.2-0   miniconda3, series 24.1
+    # version_key orders entries like a real version comparator: a < b < rc < final at the same patch level, a
+    # free-threaded build right after its regular one, and -dev/-latest branches after every release of their series.
+    __slots__ = ("name", "implementation", "series", "numbers", "prerelease", "dev", "freethreaded", "version_key")
+    NAME_RE = re.compile(r"^(?:(?P<impl>[a-z]+(?:\d(?=-))?)-?)?(?P<rest>.*)$")
+    VERSION_RE = re.compile(r"(?P<series>\d+(?:\.\d+)?)(?P<patch>(?:\.\d+)*)(?P<pre>(?:a|b|rc)\d+)?(?P<t>t)?(?P<tail>.*)$")
+    DEV_RE = re.compile(r"(?:^|-)(?:dev|latest)\b")
+    STAGES = {"a": 0, "b": 1, "rc": 2}
+
+    def __init__(self, name):
+        self.name = name
+        parts = self.NAME_RE.match(name.lower())
+        self.implementation = parts.group("impl") or "cpython"
+        rest = parts.group("rest")
+        version = self.VERSION_RE.search(rest)
+        if version is None:
+            self.series, series_numbers, self.numbers, self.prerelease, self.freethreaded, tail = "", (), (), None, False, rest
+        else:
+            self.series = version.group("series")
+            series_numbers = tuple(int(n) for n in self.series.split("."))
+            tail = version.group("tail")
+            self.numbers = tuple(int(n) for n in version.group("patch").split(".")[1:]) + tuple(int(n) for n in re.findall(r"\d+", tail))
+            self.prerelease = version.group("pre")
+            self.freethreaded = bool(version.group("t"))
+        self.dev = bool(self.DEV_RE.search(tail))
+        if self.prerelease:
+            stage = re.match(r"[a-z]+", self.prerelease).group(0)
+            release = (self.STAGES[stage], int(self.prerelease[len(stage):]))
+        else: release = (len(self.STAGES), 0)
+        self.version_key = (series_numbers, self.dev, self.numbers, release, self.freethreaded, name)
+
+def catalogue_records(versions):
+    # Records for the catalogue view: CPython first, then the other implementations by name, newest first within each
+    records = sorted((CatalogueRecord(v) for v in versions), key=operator.attrgetter("version_key"), reverse=True)
+    records.sort(key=lambda r: (r.implementation != "cpython", r.implementation))
+    return records
+
+class CatalogueIndex:
+    # Search index over the available-versions catalogue, built once per catalogue update.
+    # A query is whitespace-separated terms that must all match:
+    #   3.12          substring (case-insensitive), as the filter always behaved
+    #   pypy:         implementation (cpython for plain numeric versions), optionally `pypy:3.10` / `pypy:>=3.10`
+    #   >=3.10        comparison against the leading version number, truncated to the query's precision
+    COMPARISON_RE = re.compile(r"^(>=|<=|==|!=|>|<|=)(\d+(?:\.\d+)*)$")
+    COMPARISON_OPS = {">=": operator.ge, "<=": operator.le, "==": operator.eq, "=": operator.eq,
+                      "!=": operator.ne, ">": operator.gt, "<": operator.lt}
+
+    def __init__(self, versions, records=None):
+        self.versions = list(versions)
+        self.records = records # CatalogueRecord per version, in the same order, when the caller has them
+        self.lowered = [v.lower() for v in self.versions]
+        self.implementations, self.numbers = [], []
+        for lowered in self.lowered:
+            impl_match = re.match(r"[a-z]+", lowered)
+            self.implementations.append(impl_match.group(0) if impl_match else "cpython")
+            number_match = re.search(r"\d+(?:\.\d+)*", lowered[impl_match.end() if impl_match else 0:])
+            self.numbers.append(tuple(int(n) for n in number_match.group(0).split(".")) if number_match else None)
+        self._last_query, self._last_result = "", list(range(len(self.versions)))
+
+    def _is_plain(self, query):
+        return not any(c in query for c in ":<>=!")
+
+    def _matcher(self, term):
+        comparison = self.COMPARISON_RE.match(term)
+        if comparison:
+            op = self.COMPARISON_OPS[comparison.group(1)]
+            target = tuple(int(n) for n in comparison.group(2).split("."))
+            numbers = self.numbers
+            return lambda i: numbers[i] is not None and op(numbers[i][:len(target)], target)
+        if ":" in term:
+            impl, _, rest = term.partition(":")
+            rest_matcher = self._matcher(rest) if rest else None
+            implementations = self.implementations
+            return lambda i: implementations[i] == impl and (rest_matcher is None or rest_matcher(i))
+        lowered = self.lowered
+        return lambda i: term in lowered[i]
+
+    def search(self, query):
+        query = query.strip().lower()
+        # Typing ahead on a plain query can only remove matches, so only the previous result set is searched
+        if query.startswith(self._last_query) and self._is_plain(query) and self._is_plain(self._last_query):
+            candidates = self._last_result
+        else:
+            candidates = range(len(self.versions))
+        for term in query.split():
+            matcher = self._matcher(term)
+            candidates = [i for i in candidates if matcher(i)]
+        result = list(candidates)
+        self._last_query, self._last_result = query, result
+        return result
+
+def open_log_file(log_dir, prefix, label=None, keep=20):
+    # New log file `<prefix>-[<label>-]<timestamp>-<pid>.log` in log_dir; older ones with the same prefix beyond `keep` are deleted
+    os.makedirs(log_dir, exist_ok=True)
+    old_logs = sorted((f for f in os.listdir(log_dir) if f.startswith(prefix + "-") and f.endswith(".log")),
+                      key=lambda f: os.path.getmtime(os.path.join(log_dir, f)))
+    for name in old_logs[:max(0, len(old_logs) - keep + 1)]:
+        try: os.remove(os.path.join(log_dir, name))
+        except OSError: pass
+    label = re.sub(r"[^\w.+-]+", "_", label)[:60] if label else None
+    path = os.path.join(log_dir, f"{prefix}-{label + '-' if label else ''}{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_log_ids)}.log")
+    return path, open(path, "a", encoding="utf-8", errors="replace")
+
+_log_ids = itertools.count(1)
+
+class LogIndex:
+    # Line offset index over a log file that may still be growing, read through mmap so a 100 MB build log
+    # never has to be loaded (or decoded) as a whole. refresh() indexes at most INDEX_CHUNK_BYTES of new data
+    # per call and reports whether more is left, so a caller on the GUI thread can spread the work over ticks.
+    # offsets[i] is the byte offset where line i starts; the trailing partial line (no newline yet) counts as a line.
+    # refresh(), lines() and close() are serialized by a lock; search() may run on another thread as long as
+    # nothing refreshes or closes the index meanwhile.
+    INDEX_CHUNK_BYTES = 2 * 1024 * 1024
+    SEARCH_WINDOW_BYTES = 4 * 1024 * 1024
+    TAIL_BYTES = 64 # Last indexed bytes, compared on growth to catch a file rewritten in place and grown past the old size
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array.array("q", [0])
+        self.size = 0 # Bytes mapped
+        self.indexed = 0 # Bytes scanned for newlines
+        self.generation = 0 # Bumped whenever the file is reindexed from the start
+        self._file, self._map = None, None
+        self._identity, self._mtime_ns, self._tail = None, None, b"" # Of the file indexed so far
+        self._lock = threading.Lock()
+
+    def refresh(self, budget=None):
+        # Picks up growth and indexes the next chunk. A file that was replaced (another inode, e.g. rotation or a
+        # rerun), truncated or rewritten in place (same size but a new mtime, or different bytes where indexing stopped)
+        # is reindexed from the start.
+        try: st = os.stat(self.path)
+        except OSError: return False
+        with self._lock: return self._refresh(st, budget)
+
+    def _reset(self):
+        self.offsets, self.indexed, self._tail = array.array("q", [0]), 0, b""
+        self.generation += 1
+
+    def _refresh(self, st, budget):
+        if self._file is not None and ((st.st_dev, st.st_ino) != self._identity or st.st_size < self.size
+                                       or (st.st_size == self.size and st.st_mtime_ns != self._mtime_ns)):
+            self._close(); self._reset()
+        if self._file is None:
+            self._file = open(self.path, "rb")
+            st = os.fstat(self._file.fileno()) # The file actually opened, in case it was replaced after the stat
+            self._identity = (st.st_dev, st.st_ino)
+        self._mtime_ns, size = st.st_mtime_ns, st.st_size
+        if size != self.size:
+            if self._map is not None: self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else None
+            self.size = size
+        if self._tail and self._map[self.indexed - len(self._tail):self.indexed] != self._tail: self._reset()
+        end = min(self.size, self.indexed + (budget or self.INDEX_CHUNK_BYTES))
+        if end > self.indexed:
+            chunk = self._map[self.indexed:end]
+            base, offsets = self.indexed, self.offsets
+            position = chunk.find(b"\n")
+            while position != -1: # find() is C code; only newlines go through the loop
+                offsets.append(base + position + 1)
+                position = chunk.find(b"\n", position + 1)
+            self.indexed = end
+            self._tail = self._map[max(0, end - self.TAIL_BYTES):end]
+        return self.indexed < self.size
+
+    @property
+    def line_count(self):
+        # A final offset equal to the indexed size means the last line ended with a newline: no partial line after it
+        return len(self.offsets) - (self.offsets[-1] == self.indexed)
+
+    def lines(self, start, stop):
+        with self._lock:
+            stop = min(stop, self.line_count)
+            if start >= stop or self._map is None: return []
+            end = self.offsets[stop] if stop < len(self.offsets) else self.indexed
+            data = self._map[self.offsets[start]:end].decode("utf-8", errors="replace")
+        return data.split("\n")[:stop - start]
+
+    def line_at(self, offset):
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+    def search(self, pattern, start_line=0, backwards=False, ignore_case=True):
+        # Next (or previous) regex match from start_line, wrapping around: (line, first column, last column) or None.
+        # pattern is a compiled bytes regex or a str; matches never span lines.
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        if self._map is None or not self.line_count: return None
+        start_line = max(0, min(start_line, self.line_count - 1))
+        origin = self.offsets[start_line]
+        spans = [(origin, self.indexed), (0, origin)] if not backwards else [(0, origin), (origin, self.indexed)]
+        for low, high in spans:
+            match = self._search_backwards(pattern, low, high) if backwards else self._search_forwards(pattern, low, high)
+            if match is not None:
+                line = self.line_at(match[0])
+                line_start = self.offsets[line]
+                prefix = self._map[line_start:match[0]].decode("utf-8", errors="replace")
+                matched = self._map[match[0]:match[1]].decode("utf-8", errors="replace")
+                return line, len(prefix), len(prefix) + len(matched)
+        return None
+
+    def _search_forwards(self, pattern, low, high):
+        # Windowed, each window ending on a line boundary; a match is never looked for across a newline
+        while low < high:
+            window_end = min(high, low + self.SEARCH_WINDOW_BYTES)
+            if window_end < high: window_end = self._map.rfind(b"\n", low, window_end) + 1 or window_end
+            for match in pattern.finditer(self._map, low, window_end):
+                if b"\n" not in match.group(0): return match.start(), match.end()
+            low = window_end
+        return None
+
+    def _search_backwards(self, pattern, low, high):
+        # The last match below `high`, scanning windows from the end
+        while high > low:
+            window_start = max(low, high - self.SEARCH_WINDOW_BYTES)
+            if window_start > low:
+                aligned = self._map.find(b"\n", window_start, high) + 1
+                if 0 < aligned < high: window_start = aligned
+            last = None
+            for match in pattern.finditer(self._map, window_start, high):
+                if b"\n" not in match.group(0): last = match
+            if last is not None: return last.start(), last.end()
+            high = window_start
+        return None
+
+    def close(self):
+        with self._lock: self._close()
+
+    def _close(self):
+        if self._map is not None: self._map.close()
+        if self._file is not None: self._file.close()
+        self._file, self._map, self.size = None, None, 0
+
+def available_cpus():
+    # Cores this process can really use: the affinity mask and a cgroup v2 CPU quota (containers, CI runners)
+    # are often below os.cpu_count()
+    try: count = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError): count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f: quota, period = f.read().split()[:2]
+        if quota != "max": count = min(count, max(1, int(quota) // int(period)))
+    except (OSError, ValueError): pass
+    return max(1, count)
+
+# Build presets for `pyenv install`. "configure" and "cflags" are appended to the user's own PYTHON_CONFIGURE_OPTS
+# and CFLAGS after dropping the options in "drop"; make_jobs "all" gives the build every available core instead of
+# its share among the builds running side by side.
+BUILD_PROFILES = {
+    "default": {"description": "pyenv's defaults plus your own PYTHON_CONFIGURE_OPTS / CFLAGS", "configure": "", "cflags": "", "make_jobs": "share"},
+    "fast-build": {"description": "quickest build: no PGO training run (the test suite), light optimization, no debug info, every core",
+                   "configure": "", "cflags": "-O1 -g0", "make_jobs": "all", "drop": ("--enable-optimizations", "--with-lto")},
+    "production": {"description": "PGO and LTO: slow to build (PGO runs the test suite), fastest interpreter",
+                   "configure": "--enable-optimizations --with-lto", "cflags": "", "make_jobs": "share"},
+    "debug": {"description": "debug build (--with-pydebug) with assertions, unoptimized, full symbols",
+              "configure": "--with-pydebug", "cflags": "-O0 -g3", "make_jobs": "share", "drop": ("--enable-optimizations", "--with-lto")},
+}
+
+def apply_build_profile(env, profile):
+    # Adds a BUILD_PROFILES preset to a pyenv environment, in place. Its "drop" options are also taken out of
+    # CONFIGURE_OPTS, which python-build passes to configure as well.
+    preset = BUILD_PROFILES.get(profile)
+    if preset is None: raise ValueError(f"unknown build profile {profile!r} (choose from {', '.join(BUILD_PROFILES)})")
+    if not (preset["configure"] or preset["cflags"] or preset.get("drop")): return env
+    for name, extra in (("PYTHON_CONFIGURE_OPTS", preset["configure"]), ("CONFIGURE_OPTS", ""), ("CFLAGS", preset["cflags"])):
+        words = [word for word in env.get(name, "").split() if word.split("=")[0] not in preset.get("drop", ())]
+        value = " ".join(words + [word for word in extra.split() if word not in words])
+        if value: env[name] = value
+        else: env.pop(name, None)
+    return env
+
+class InstallJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, version, command_args, runner=None, kind="build", artifact_key=None, build_profile="default"):
+        self.id = next(InstallJob._ids)
+        self.version = version
+        self.command_args = command_args
+        self.runner = runner # Optional callable(job, emit) -> return code, used instead of running command_args
+        self.kind = kind
+        self.build_profile = build_profile # BUILD_PROFILES name
+        self.status = "queued" # queued -> running -> succeeded / failed / cancelled
+        self.return_code = None
+        self.process = None
+        self.cancel_requested = False
+        self.make_jobs = None
+        self.log_path = None
+        self.tracker = None # BuildProgressTracker, attached by PyenvEngine when a build starts
+        self.artifact_key = artifact_key # ArtifactCache key computed when submitting
+        self.build_options = ""
+        self.pyenv_root = None # The PYENV_ROOT it installs into, recorded by the scheduler
+        self.queued_at = time.time()
+        self.started_at = self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+class InstallScheduler:
+    # Runs `pyenv install` jobs concurrently, at most max_concurrent at a time. Each job gets a share of the
+    # available CPU cores (all of them for a "fast-build" profile) through MAKE_OPTS=-jN (unless the user already
+    # set a -j), its own log file and a cancel hook. env_factory(job) returns the job's environment. One scheduler is
+    # shared by every PYENV_ROOT (see PyenvRoots) so max_concurrent and the core split cover the whole machine; submit()
+    # takes the job's pyenv_root and that root engine's env_factory/on_event, defaulting to the scheduler's own.
+    # on_event(event, job, data) is called from worker threads with event in "queued", "started", "output", "finished".
+    CANCEL_GRACE_SECONDS = 10
+    LOGS_KEPT = 50 # Build logs kept in log_dir; the oldest are deleted as new jobs start
+
+    def __init__(self, env_factory, on_event, max_concurrent=2, log_dir=None, pyenv_root=None):
+        self.env_factory = env_factory
+        self.pyenv_root = pyenv_root
+        self.on_event = on_event
+        self.max_concurrent = max(1, max_concurrent)
+        self.log_dir = log_dir
+        self.jobs = []
+        self._pending = collections.deque()
+        self._running = set()
+        self._routes = {} # job -> (env_factory, on_event) of the root engine that submitted it
+        self._lock = threading.Lock()
+
+    def submit(self, version, command_args, runner=None, kind="build", artifact_key=None, build_profile="default",
+               pyenv_root=None, env_factory=None, on_event=None):
+        pyenv_root = pyenv_root or self.pyenv_root
+        with self._lock:
+            if any(j.active and j.version == version and j.pyenv_root == pyenv_root for j in self.jobs): return None
+            job = InstallJob(version, command_args, runner, kind, artifact_key, build_profile)
+            job.pyenv_root = pyenv_root
+            self._routes[job] = (env_factory or self.env_factory, on_event or self.on_event)
+            self.jobs.append(job); self._pending.append(job)
+        self._emit("queued", job, None)
+        self._dispatch()
+        return job
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, int(value))
+        self._dispatch()
+
+    def cancel(self, job):
+        # A queued job is dropped; a running one has its process group interrupted, and a runner job (a restore from
+        # the artifact cache) is expected to check job.cancel_requested itself
+        with self._lock:
+            job.cancel_requested = True
+            if job.status == "queued":
+                self._pending.remove(job)
+                job.status, job.finished_at = "cancelled", time.time()
+                cancelled_while_queued = True
+            else:
+                cancelled_while_queued = False
+        if cancelled_while_queued:
+            self._emit("finished", job, None)
+        elif job.process is not None and job.process.poll() is None:
+            threading.Thread(target=self._terminate, args=(job.process,), daemon=True).start()
+
+    def _emit(self, event, job, data):
+        _, on_event = self._routes.get(job, (None, self.on_event))
+        on_event(event, job, data)
+        if event == "finished": self._routes.pop(job, None)
+
+    def _terminate(self, process):
+        # SIGINT first: pyenv-install traps it and removes the half-built prefix
+        try:
+            if os.name == "posix": os.killpg(process.pid, signal.SIGINT)
+            else: process.terminate()
+            process.wait(timeout=self.CANCEL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            try:
+                if os.name == "posix": os.killpg(process.pid, signal.SIGKILL)
+                else: process.kill()
+            except OSError: pass
+        except OSError: pass
+
+    def _make_jobs_for_next(self, job):
+        # Cores are split across the builds expected to run side by side; jobs already running keep their -j
+        if BUILD_PROFILES.get(job.build_profile, {}).get("make_jobs") == "all": return available_cpus()
+        expected_parallel = max(1, min(self.max_concurrent, len(self._running) + len(self._pending)))
+        return max(1, available_cpus() // expected_parallel)
+
+    def _dispatch(self):
+        to_start = []
+        with self._lock:
+            while self._pending and len(self._running) < self.max_concurrent:
+                job = self._pending.popleft()
+                self._running.add(job)
+                job.make_jobs = self._make_jobs_for_next(job)
+                job.status, job.started_at = "running", time.time()
+                to_start.append(job)
+        for job in to_start:
+            threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+    def _job_env(self, job):
+        env_factory, _ = self._routes.get(job, (self.env_factory, None))
+        env = env_factory(job)
+        user_make_opts = env.get("MAKE_OPTS", "")
+        if not re.search(r"(^|\s)-j", user_make_opts) and not re.search(r"(^|\s)-j", env.get("MAKEFLAGS", "")):
+            env["MAKE_OPTS"] = f"{user_make_opts} -j{job.make_jobs}".strip()
+        return env
+
+    def _run_job(self, job):
+        with tracer.span("install job", "job", version=job.version, kind=job.kind) as span:
+            self._run_job_traced(job)
+            span.set(status=job.status, returncode=job.return_code)
+
+    def _run_job_traced(self, job):
+        self._emit("started", job, None)
+        log_file = None
+        try:
+            if self.log_dir:
+                job.log_path, log_file = open_log_file(self.log_dir, "install", job.version, keep=self.LOGS_KEPT)
+            last_flush = time.monotonic()
+            def emit(line):
+                nonlocal last_flush
+                if log_file:
+                    log_file.write(line)
+                    if time.monotonic() - last_flush > 0.5: log_file.flush(); last_flush = time.monotonic() # So the log viewer can follow it
+                self._emit("output", job, line)
+            if job.runner is not None:
+                job.return_code = job.runner(job, emit)
+            else:
+                job.process = subprocess.Popen(job.command_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                               env=self._job_env(job), start_new_session=(os.name == "posix"))
+                if job.cancel_requested: self._terminate(job.process) # Cancelled between dispatch and Popen
+                for line in iter(job.process.stdout.readline, ''): emit(line)
+                job.process.stdout.close()
+                job.return_code = job.process.wait()
+        except Exception as e:
+            self._emit("output", job, f"Error running {' '.join(job.command_args)}: {e}\n")
+            job.return_code = -1
+        finally:
+            if log_file: log_file.close()
+            with self._lock:
+                self._running.discard(job)
+                job.finished_at = time.time()
+                if job.cancel_requested: job.status = "cancelled"
+                else: job.status = "succeeded" if job.return_code == 0 else "failed"
+            self._emit("finished", job, None)
+            self._dispatch()
+
+class BuildProgressTracker:
+    # Turns the streamed `pyenv install -v` output into phases. Phases only ever move forward, so a stray
+    # match from an earlier phase (e.g. a compiler line during `make install`) is ignored.
+    PHASES = ("download", "extract", "configure", "compile", "install", "ensurepip")
+    PHASE_PATTERNS = (
+        ("download", re.compile(r"^(Downloading \S+\.\.\.|-> https?://)")),
+        ("extract", re.compile(r"^Installing \S+\.\.\.$")), # Printed once the tarball is unpacked; see feed()
+        ("configure", re.compile(r"^(checking |configure: |config\.status: )")),
+        ("compile", re.compile(r"^(\S*(gcc|clang|cc|c\+\+|g\+\+)|ccache|ar|ranlib|make(\[\d+\])?:?)\s|^(Compiling|Running Setup)")),
+        ("install", re.compile(r"^(Creating directory |(\S*/)?install -c |Listing ')")),
+        ("ensurepip", re.compile(r"(ensurepip|^Looking in links: |^Installing collected packages: |^Successfully installed (pip|setuptools))")),
+    )
+    DONE_PATTERN = re.compile(r"^Installed \S+ to ")
+
+    def __init__(self, estimate=None, now=None):
+        self.estimate = estimate or {} # phase -> expected seconds, from BuildHistory
+        self.phase = None
+        self.phase_started_at = None
+        self.phase_times = {} # phase -> seconds spent, for completed phases
+        self.started_at = now if now is not None else time.monotonic()
+        self._last_download_output_at = None
+        self.done = False
+
+    def _enter(self, phase, at):
+        if self.phase is not None:
+            self.phase_times[self.phase] = self.phase_times.get(self.phase, 0.0) + max(0.0, at - self.phase_started_at)
+        self.phase, self.phase_started_at = phase, at
+
+    def feed(self, line, now=None):
+        # Returns True when the line moved the build into a new phase
+        now = now if now is not None else time.monotonic()
+        line = line.strip()
+        if self.phase == "download" and line: self._last_download_output_at = now
+        if self.DONE_PATTERN.match(line):
+            self._enter(None, now); self.done = True
+            return True
+        current_index = self.PHASES.index(self.phase) if self.phase else -1
+        for phase, pattern in self.PHASE_PATTERNS:
+            index = self.PHASES.index(phase)
+            if index <= current_index or not pattern.search(line): continue
+            if phase == "extract":
+                # Unpacking is silent; charge the gap between the last download output and this line to it
+                if self.phase == "download" and self._last_download_output_at is not None:
+                    self._enter("extract", self._last_download_output_at)
+                else: # Cached tarball: no download output at all, so extraction started with the build
+                    self._enter("extract", self.started_at if self.phase is None else now)
+                return True
+            self._enter(phase, now)
+            return True
+        return False
+
+    def finish(self, now=None):
+        if self.phase is not None: self._enter(None, now if now is not None else time.monotonic())
+        return dict(self.phase_times)
+
+    def progress(self, now=None):
+        # (fraction 0..1, eta seconds) from the historical estimate, or (None, None) without history
+        if not self.estimate: return None, None
+        now = now if now is not None else time.monotonic()
+        total = sum(self.estimate.get(p, 0.0) for p in self.PHASES)
+        if total <= 0: return None, None
+        if self.done: return 1.0, 0.0
+        current_index = self.PHASES.index(self.phase) if self.phase else -1
+        done_estimate = sum(self.estimate.get(p, 0.0) for p in self.PHASES[:max(0, current_index)])
+        in_phase = 0.0
+        if self.phase:
+            expected = self.estimate.get(self.phase, 0.0)
+            in_phase = min(now - self.phase_started_at, expected * 0.99)
+        fraction = min(0.99, (done_estimate + in_phase) / total)
+        remaining = sum(self.estimate.get(p, 0.0) for p in self.PHASES[current_index + 1:])
+        if self.phase:
+            remaining += max(0.0, self.estimate.get(self.phase, 0.0) - (now - self.phase_started_at))
+        return fraction, remaining
+
+def machine_id():
+    return f"{platform.node()}|{sys.platform}|{platform.machine()}|{os.cpu_count()}"
+
+class BuildHistory:
+    # sqlite database of per-phase build timings, keyed by version, machine and the build options in effect,
+    # plus the post-install micro-benchmark results of each build
+    FILE_NAME = "build-history.sqlite3"
+    SAMPLES = 5 # Estimates use the median of this many most recent matching builds
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(user_cache_dir(), self.FILE_NAME)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute("CREATE TABLE IF NOT EXISTS builds (id INTEGER PRIMARY KEY, version TEXT, machine TEXT, build_options TEXT, "
+                           "started_at REAL, total_seconds REAL, success INTEGER)")
+        connection.execute("CREATE TABLE IF NOT EXISTS phases (build_id INTEGER, phase TEXT, seconds REAL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS benchmarks (version TEXT, machine TEXT, build_profile TEXT, build_options TEXT, "
+                           "measured_at REAL, name TEXT, seconds REAL)")
+        return connection
+
+    def record_benchmark(self, version, build_profile, build_options, results, machine=None, measured_at=None):
+        measured_at = measured_at or time.time()
+        with contextlib.closing(self._connect()) as connection, connection:
+            connection.executemany("INSERT INTO benchmarks (version, machine, build_profile, build_options, measured_at, name, seconds) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   [(version, machine or machine_id(), build_profile, build_options, measured_at, name, seconds) for name, seconds in results.items()])
+
+    def benchmark_runs(self, version, machine=None):
+        # Latest results per build options for a version on this machine: [(build_profile, build_options, measured_at, {name: seconds})]
+        runs = {}
+        with contextlib.closing(self._connect()) as connection:
+            for profile, options, measured_at, name, seconds in connection.execute(
+                    "SELECT build_profile, build_options, measured_at, name, seconds FROM benchmarks WHERE version = ? AND machine = ? ORDER BY measured_at",
+                    (version, machine or machine_id())):
+                run = runs.get(options)
+                if run is None or run[2] != measured_at: run = runs[options] = (profile, options, measured_at, {})
+                run[3][name] = seconds
+        return sorted(runs.values(), key=lambda run: run[2])
+
+    def record(self, version, phase_times, total_seconds, success, build_options="", machine=None, started_at=None):
+        with contextlib.closing(self._connect()) as connection, connection:
+            cursor = connection.execute("INSERT INTO builds (version, machine, build_options, started_at, total_seconds, success) VALUES (?, ?, ?, ?, ?, ?)",
+                                        (version, machine or machine_id(), build_options, started_at or time.time(), total_seconds, int(success)))
+            connection.executemany("INSERT INTO phases (build_id, phase, seconds) VALUES (?, ?, ?)",
+                                   [(cursor.lastrowid, phase, seconds) for phase, seconds in phase_times.items()])
+
+    def estimate(self, version, build_options="", machine=None):
+        # Most specific match wins: same options, same version, same minor series, then any build of the same
+        # implementation family on this machine (CPython, pypy, miniconda, graalpy...); {} if there is none
+        machine = machine or machine_id()
+        # The series is the name up to its minor number ("3.12", "pypy3.10", "miniconda3-4.7"); it must not run on into
+        # further digits, or 3.1 would pick up 3.10-3.19
+        series = re.search(r"\d+\.\d+", version)
+        queries = [("version = ? AND build_options = ?", (version, build_options)), ("version = ?", (version,))]
+        if series:
+            prefix = version[:series.end()]
+            queries.append(("(version = ? OR version GLOB ?)", (prefix, f"{prefix}[^0-9]*")))
+        family = re.match(r"[^0-9]*", version).group() # "" for CPython, "pypy", "miniconda", "graalpy-"...
+        if not re.search(r"[*?\[\]]", family):
+            queries.append(("version GLOB ?", (f"{family}[0-9]*",)))
+        try:
+            with contextlib.closing(self._connect()) as connection:
+                for where, params in queries:
+                    build_ids = [row[0] for row in connection.execute(
+                        f"SELECT id FROM builds WHERE success = 1 AND machine = ? AND {where} ORDER BY started_at DESC LIMIT ?",
+                        (machine, *params, self.SAMPLES))]
+                    if not build_ids: continue
+                    samples = collections.defaultdict(list)
+                    for phase, seconds in connection.execute(
+                            f"SELECT phase, seconds FROM phases WHERE build_id IN ({','.join('?' * len(build_ids))})", build_ids):
+                        samples[phase].append(seconds)
+                    return {phase: statistics.median(values) for phase, values in samples.items()}
+        except sqlite3.Error:
+            pass
+        return {}
+
+# Small pyperformance-style workloads (float arithmetic, calls, dicts, sorting, regex, json), run inside the
+# interpreter being measured. Kept Python 2 compatible; prints {workload: best seconds} as JSON.
+MICRO_BENCHMARK_SCRIPT = r"""
+import json, re, sys, time
+timer = getattr(time, "perf_counter", time.time)
+def float_math(n=60000):
+    x, y, z, vx, vy, vz = 0.1, 0.2, 0.3, 0.01, 0.02, 0.03
+    for i in range(n):
+        d = (x * x + y * y + z * z + 0.01) ** -1.5
+        vx -= x * d * 0.001; vy -= y * d * 0.001; vz -= z * d * 0.001
+        x += vx; y += vy; z += vz
+    return x
+def calls(n=25):
+    def fib(k): return k if k < 2 else fib(k - 1) + fib(k - 2)
+    return fib(n)
+def dicts(n=60000):
+    d = {}
+    for i in range(n): d["k%d" % i] = i
+    return sum(d["k%d" % i] for i in range(0, n, 3))
+def sort(n=60000):
+    seed, values = 1, []
+    for i in range(n):
+        seed = (seed * 1103515245 + 12345) & 0x7fffffff; values.append(seed)
+    return sorted(values)[n // 2]
+def regex(n=400):
+    pattern = re.compile(r"(\w+)@(\w+)\.com")
+    text = " ".join("user%d@host%d.com and some filler text" % (i, i) for i in range(50))
+    return sum(len(pattern.findall(text)) for i in range(n))
+def json_roundtrip(n=300):
+    doc = {"items": [{"id": i, "name": "item%d" % i, "tags": ["a", "b"], "price": i * 1.5} for i in range(50)]}
+    for i in range(n): doc = json.loads(json.dumps(doc))
+    return len(doc["items"])
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+results = {}
+for name, func in (("float", float_math), ("calls", calls), ("dict", dicts), ("sort", sort), ("regex", regex), ("json", json_roundtrip)):
+    best = None
+    for i in range(repeats):
+        start = timer(); func(); elapsed = timer() - start
+        if best is None or elapsed < best: best = elapsed
+    results[name] = best
+sys.stdout.write(json.dumps(results) + "\n")
+"""
+
+def run_micro_benchmark(python, repeats=5, timeout=600):
+    # {workload: best seconds} for an interpreter; raises RuntimeError if it can't run the script
+    proc = subprocess.run([python, "-E", "-c", MICRO_BENCHMARK_SCRIPT, str(repeats)], capture_output=True, text=True, timeout=timeout)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines: raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}")
+    try: return json.loads(lines[-1])
+    except ValueError: raise RuntimeError(f"unexpected output: {lines[-1][:200]}")
+
+def benchmark_speedup(results, baseline):
+    # Geometric mean over the shared workloads of baseline time / new time: above 1 means `results` is faster
+    ratios = [baseline[name] / results[name] for name in results if name in baseline and results[name] > 0 and baseline[name] > 0]
+    return statistics.geometric_mean(ratios) if ratios else None
+
+FICLONE = 0x40049409 # Linux ioctl for reflink (copy-on-write) copies on btrfs/xfs
+
+def clone_or_copy_file(src, dst):
+    # Reflink where the filesystem supports it, otherwise a regular copy
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return "reflink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+class RestoreCancelled(Exception):
+    pass
+
+def replicate_tree(src, dst, link_files=False, cancelled=None):
+    # Recreates src at dst: symlinks as symlinks, files hardlinked (link_files) or reflinked/copied.
+    # Returns (file count, total bytes, set of methods used). Raises RestoreCancelled once cancelled() is true
+    # (checked per directory); dst is left half-made for the caller to remove.
+    if cancelled is not None and cancelled(): raise RestoreCancelled(src)
+    files, size, methods = 0, 0, set()
+    os.makedirs(dst, exist_ok=True)
+    shutil.copystat(src, dst)
+    with os.scandir(src) as entries:
+        for entry in entries:
+            target = os.path.join(dst, entry.name)
+            if entry.is_symlink():
+                os.symlink(os.readlink(entry.path), target)
+            elif entry.is_dir():
+                sub_files, sub_size, sub_methods = replicate_tree(entry.path, target, link_files, cancelled)
+                files += sub_files; size += sub_size; methods |= sub_methods
+            else:
+                if link_files:
+                    try:
+                        os.link(entry.path, target); methods.add("hardlink")
+                    except OSError:
+                        methods.add(clone_or_copy_file(entry.path, target))
+                else:
+                    methods.add(clone_or_copy_file(entry.path, target))
+                files += 1; size += entry.stat(follow_symlinks=False).st_size
+    return files, size, methods
+
+def link_identical_files(src, dst, skip=(), max_errors=20):
+    # Replaces each regular file under dst whose counterpart under src has the same size, mode, owner and
+    # content with a hardlink to it, atomically (link to a temporary name, then rename over the file).
+    # Directories named in `skip` are not entered. Returns (files linked, bytes freed, error texts); stops
+    # after max_errors failures, e.g. when the two trees are on different filesystems.
+    linked = freed = 0
+    errors = []
+    for directory, dirnames, filenames in os.walk(dst):
+        dirnames[:] = [d for d in dirnames if d not in skip]
+        src_directory = os.path.normpath(os.path.join(src, os.path.relpath(directory, dst)))
+        for name in filenames:
+            dst_path, src_path = os.path.join(directory, name), os.path.join(src_directory, name)
+            try: dst_st, src_st = os.lstat(dst_path), os.lstat(src_path)
+            except OSError: continue
+            if not (stat.S_ISREG(dst_st.st_mode) and stat.S_ISREG(src_st.st_mode)): continue
+            if (dst_st.st_dev, dst_st.st_ino) == (src_st.st_dev, src_st.st_ino): continue # Already linked
+            if (dst_st.st_size, dst_st.st_mode, dst_st.st_uid) != (src_st.st_size, src_st.st_mode, src_st.st_uid): continue
+            tmp_path = f"{dst_path}.pyenv-gui-link"
+            try:
+                if not filecmp.cmp(src_path, dst_path, shallow=False): continue
+                os.link(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+            except OSError as e:
+                with contextlib.suppress(OSError): os.unlink(tmp_path)
+                errors.append(f"{dst_path}: {e}")
+                if len(errors) >= max_errors: return linked, freed, errors
+                continue
+            linked += 1
+            if dst_st.st_nlink == 1: freed += getattr(dst_st, "st_blocks", 0) * 512 or dst_st.st_size
+    return linked, freed, errors
+
+class ArtifactCache:
+    # Local build artifact cache with two kinds of entries, evicted together in LRU order once max_bytes is exceeded:
+    #   tarballs/  source tarballs, handed to python-build as PYTHON_BUILD_CACHE_PATH (python-build looks them up by
+    #              file name and verifies their checksum itself)
+    #   trees/     copies of successfully built $PYENV_ROOT/versions/<version> trees, keyed by a hash of the version,
+    #              the configure-affecting environment and the platform
+    # Lookups and restores don't rewrite manifest.json: hit/miss counts and last_used are kept in memory and go out with
+    # the next write (at most MANIFEST_SAVE_SECONDS later), and a restore touches the tree directory, whose mtime
+    # eviction also takes as a last use.
+    CONFIGURE_ENV_VARS = ("PYTHON_CONFIGURE_OPTS", "CONFIGURE_OPTS", "PYTHON_CFLAGS", "CFLAGS", "CPPFLAGS", "LDFLAGS")
+    # Text files that embed the install prefix and are rewritten when a tree is restored under a different prefix
+    RELOCATE_PATTERNS = (re.compile(r"^bin/"), re.compile(r"^lib/python[^/]+/_sysconfigdata[^/]*\.py$"),
+                         re.compile(r"^lib/python[^/]+/config-[^/]+/Makefile$"), re.compile(r"^lib/pkgconfig/[^/]+\.pc$"))
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+    MANIFEST_SAVE_SECONDS = 30
+    PREFIX_BOUND_CONFIG_ARGS = ("--enable-shared", "--enable-framework") # libpython's path ends up in RPATH / install names
+
+    def __init__(self, root_dir=None, max_bytes=None):
+        self.root_dir = root_dir or os.path.join(user_cache_dir(), "artifacts")
+        self.tarball_dir = os.path.join(self.root_dir, "tarballs")
+        self.trees_dir = os.path.join(self.root_dir, "trees")
+        self.manifest_path = os.path.join(self.root_dir, "manifest.json")
+        self.max_bytes = max_bytes if max_bytes is not None else self.DEFAULT_MAX_BYTES
+        self._lock = threading.RLock()
+        os.makedirs(self.tarball_dir, exist_ok=True); os.makedirs(self.trees_dir, exist_ok=True)
+        self._manifest = self._load_manifest()
+        self._saved_at, self._dirty = time.monotonic(), False
+        atexit.register(self.flush) # One instance per process: the primary engine's, shared by every root
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.setdefault("trees", {})
+        manifest.setdefault("tarballs", {})
+        manifest.setdefault("stats", {"tree_hits": 0, "tree_misses": 0, "tarball_hits": 0, "tarball_misses": 0})
+        return manifest
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+        self._saved_at, self._dirty = time.monotonic(), False
+
+    def _manifest_changed(self):
+        # For bookkeeping-only changes (counters, last_used): written with the next save, or now if the last was a while ago
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.MANIFEST_SAVE_SECONDS:
+            try: self._save_manifest()
+            except OSError: pass
+
+    def flush(self):
+        with self._lock:
+            if self._dirty: self._save_manifest()
+
+    def _last_used(self, key, entry):
+        try: return max(entry["last_used"], os.path.getmtime(os.path.join(self.trees_dir, key)))
+        except OSError: return entry["last_used"]
+
+    @classmethod
+    def is_prefix_bound(cls, tree_dir):
+        # Whether the built tree only works under the prefix it was built for: a shared libpython (its path is in
+        # the RPATH of bin/python) or a build configured with --enable-shared/--enable-framework, per its sysconfig data.
+        # Decided from the tree itself, so python-build's defaults and *_CONFIGURE_OPTS variants count too.
+        lib_dir = os.path.join(tree_dir, "lib")
+        try: names = os.listdir(lib_dir)
+        except OSError: return False
+        if any(n.startswith("libpython") and (".so" in n or n.endswith(".dylib")) for n in names): return True
+        for name in names:
+            if not name.startswith("python"): continue
+            try: sysconfig_files = [f for f in os.listdir(os.path.join(lib_dir, name)) if f.startswith("_sysconfigdata") and f.endswith(".py")]
+            except OSError: continue
+            for sysconfig_file in sysconfig_files:
+                config_args = cls._sysconfig_var(os.path.join(lib_dir, name, sysconfig_file), "CONFIG_ARGS") or ""
+                if any(option in config_args for option in cls.PREFIX_BOUND_CONFIG_ARGS): return True
+        return False
+
+    @staticmethod
+    def _sysconfig_var(path, name):
+        # A value from a _sysconfigdata module (`build_time_vars = {...}`), read without importing it
+        import ast
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f: tree = ast.parse(f.read())
+            for node in tree.body:
+                if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "build_time_vars" for t in node.targets):
+                    return ast.literal_eval(node.value).get(name)
+        except (OSError, SyntaxError, ValueError, AttributeError): pass
+        return None
+
+    def key_for(self, version, env):
+        parts = {"version": version, "platform": f"{sys.platform}-{platform.machine()}-{'-'.join(platform.libc_ver())}",
+                 "env": {name: env.get(name, "") for name in self.CONFIGURE_ENV_VARS}}
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+    def lookup(self, key, prefix=None):
+        # Counts a hit or miss. A prefix-bound tree (see is_prefix_bound) can only be reused under the prefix it was built for.
+        with self._lock:
+            entry = self._manifest["trees"].get(key)
+            tree_dir = os.path.join(self.trees_dir, key)
+            if entry and not os.path.isdir(tree_dir):
+                del self._manifest["trees"][key]; entry = None; self._dirty = True
+            if entry and "prefix_bound" not in entry: # Stored before this was recorded
+                entry["prefix_bound"] = self.is_prefix_bound(tree_dir)
+            if entry and prefix and entry["prefix"] != prefix and entry["prefix_bound"]:
+                entry = None
+            self._manifest["stats"]["tree_hits" if entry else "tree_misses"] += 1
+            self._manifest_changed()
+            return dict(entry) if entry else None
+
+    def store_tree(self, key, version, src_dir, configure=""):
+        tmp_dir = os.path.join(self.trees_dir, f".{key}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        files, size, _ = replicate_tree(src_dir, tmp_dir)
+        with self._lock:
+            final_dir = os.path.join(self.trees_dir, key)
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.rename(tmp_dir, final_dir)
+            self._manifest["trees"][key] = {"version": version, "prefix": src_dir, "configure": configure, "files": files,
+                                            "bytes": size, "created": time.time(), "last_used": time.time(), "hits": 0,
+                                            "prefix_bound": self.is_prefix_bound(final_dir)}
+            self._save_manifest()
+        self.evict()
+        return files, size
+
+    def restore_tree(self, key, dest_dir, link_files=False, cancelled=None):
+        # Restores into a sibling temp dir and renames, so a half-restored tree is never visible as a version.
+        # cancelled() is checked while copying and between the copy, relocation and rename steps; once it is true
+        # the temp dir is removed and RestoreCancelled raised.
+        # link_files hardlinks the files to the cached copy: fast, but anything later written in place in the
+        # installed tree (pip, an editor) changes the cached copy too. Files _relocate rewrites always get new inodes.
+        with self._lock:
+            entry = self._manifest["trees"][key]
+            entry["last_used"] = time.time(); entry["hits"] = entry.get("hits", 0) + 1
+            try: os.utime(os.path.join(self.trees_dir, key))
+            except OSError: pass
+            self._manifest_changed()
+        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(dest_dir)), f".pyenv-gui-restore-{os.path.basename(dest_dir)}-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            files, size, methods = replicate_tree(os.path.join(self.trees_dir, key), tmp_dir, link_files=link_files, cancelled=cancelled)
+            if entry["prefix"] != dest_dir:
+                if cancelled is not None and cancelled(): raise RestoreCancelled(key)
+                self._relocate(tmp_dir, entry["prefix"], dest_dir)
+            if cancelled is not None and cancelled(): raise RestoreCancelled(key)
+            os.rename(tmp_dir, dest_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return files, size, methods
+
+    def _relocate(self, tree_dir, old_prefix, new_prefix):
+        old_bytes, new_bytes = os.fsencode(old_prefix), os.fsencode(new_prefix)
+        for dirpath, _, filenames in os.walk(tree_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                relative = os.path.relpath(path, tree_dir).replace(os.sep, "/")
+                if os.path.islink(path) or not any(p.search(relative) for p in self.RELOCATE_PATTERNS): continue
+                with open(path, "rb") as f: content = f.read()
+                if b"\0" in content[:8192] or old_bytes not in content: continue # Binary, or nothing to rewrite
+                mode = os.stat(path).st_mode
+                os.unlink(path) # Breaks the hardlink so the cached copy keeps the original prefix
+                with open(path, "wb") as f: f.write(content.replace(old_bytes, new_bytes))
+                os.chmod(path, mode)
+
+    def note_tarball_use(self, version, downloaded):
+        # python-build only prints "Downloading ..." when the tarball wasn't reusable, which is how callers know
+        with self._lock:
+            self._manifest["stats"]["tarball_misses" if downloaded else "tarball_hits"] += 1
+            now = time.time()
+            for name in os.listdir(self.tarball_dir):
+                path = os.path.join(self.tarball_dir, name)
+                info = self._manifest["tarballs"].setdefault(name, {"bytes": os.path.getsize(path), "last_used": now})
+                if f"-{version}." in name or f"-{version}-" in name: info["last_used"] = now
+            self._save_manifest()
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            candidates = [(self._last_used(key, entry), "trees", key, entry["bytes"]) for key, entry in self._manifest["trees"].items()]
+            for name in os.listdir(self.tarball_dir):
+                path = os.path.join(self.tarball_dir, name)
+                info = self._manifest["tarballs"].setdefault(name, {"bytes": os.path.getsize(path), "last_used": os.path.getmtime(path)})
+                candidates.append((info["last_used"], "tarballs", name, info["bytes"]))
+            total = sum(c[3] for c in candidates)
+            evicted = []
+            for last_used, kind, name, size in sorted(candidates):
+                if total <= self.max_bytes: break
+                if kind == "trees": shutil.rmtree(os.path.join(self.trees_dir, name), ignore_errors=True)
+                else:
+                    try: os.remove(os.path.join(self.tarball_dir, name))
+                    except OSError: pass
+                self._manifest[kind].pop(name, None)
+                total -= size; evicted.append(name)
+            self._save_manifest()
+            return evicted
+
+    def stats(self):
+        with self._lock:
+            tarball_bytes = sum(os.path.getsize(os.path.join(self.tarball_dir, n)) for n in os.listdir(self.tarball_dir))
+            return dict(self._manifest["stats"], trees=len(self._manifest["trees"]),
+                        tree_bytes=sum(e["bytes"] for e in self._manifest["trees"].values()),
+                        tarballs=len(os.listdir(self.tarball_dir)), tarball_bytes=tarball_bytes, max_bytes=self.max_bytes,
+                        entries=[dict(e, key=k) for k, e in self._manifest["trees"].items()])
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.trees_dir, ignore_errors=True); shutil.rmtree(self.tarball_dir, ignore_errors=True)
+            os.makedirs(self.tarball_dir, exist_ok=True); os.makedirs(self.trees_dir, exist_ok=True)
+            self._manifest["trees"], self._manifest["tarballs"] = {}, {}
+            self._save_manifest()
+
+class CurrentVersionResolver:
+    # In-process equivalent of `pyenv global` / `pyenv local` / `pyenv version-name` precedence:
+    # PYENV_VERSION, then the nearest .python-version walking up from the cwd, then $PYENV_ROOT/version
+    # (and the legacy `global`/`default` files). Results are cached on the mtimes of every file consulted.
+    GLOBAL_FILE_NAMES = ("version", "global", "default")
+
+    def __init__(self, pyenv_root):
+        self.pyenv_root = pyenv_root
+        self._cache_key = None
+        self._cache_value = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def _local_candidates(self, cwd):
+        # Same walk as pyenv-version-file: cwd, then each parent up to /
+        candidates, directory = [], cwd
+        while True:
+            candidates.append(os.path.join(directory, ".python-version"))
+            parent = os.path.dirname(directory)
+            if parent == directory: break
+            directory = parent
+        return candidates
+
+    def _is_version_safe(self, version):
+        # Mirrors pyenv's CVE-2022-35861 guard for names that look like paths
+        if version != ".." and "/" not in version: return True
+        versions_dir = os.path.realpath(os.path.join(self.pyenv_root, "versions"))
+        target = os.path.realpath(os.path.join(versions_dir, version))
+        return os.path.isdir(target) and target.startswith(versions_dir + os.sep)
+
+    def read_version_file(self, path):
+        # Equivalent of `pyenv version-file-read`: first word of each non-comment line, up to 1024 bytes per line
+        try:
+            if os.path.getsize(path) == 0: return []
+            with open(path, "r", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        versions = []
+        for line in lines:
+            words = line[:1024].split()
+            if not words or words[0].startswith("#"): continue
+            if self._is_version_safe(words[0]): versions.append(words[0])
+        return versions
+
+    def resolve(self, env, cwd=None):
+        cwd = os.path.abspath(cwd or os.getcwd())
+        local_candidates = self._local_candidates(cwd)
+        global_candidates = [os.path.join(self.pyenv_root, name) for name in self.GLOBAL_FILE_NAMES]
+        shell_version = env.get("PYENV_VERSION", "")
+        key = (cwd, shell_version, tuple(self._stat_key(p) for p in local_candidates + global_candidates))
+        if key == self._cache_key:
+            self.cache_hits += 1
+            return dict(self._cache_value)
+        self.cache_misses += 1
+
+        global_versions, global_file = ["system"], global_candidates[0]
+        for path in global_candidates:
+            versions = self.read_version_file(path)
+            if versions:
+                global_versions, global_file = versions, path
+                break
+
+        local_versions, local_file = [], None
+        for path in local_candidates:
+            if os.path.isfile(path):
+                local_file = path
+                local_versions = self.read_version_file(path)
+                break
+
+        if shell_version: origin = "PYENV_VERSION environment variable"
+        elif local_file: origin = local_file
+        else: origin = global_file
+        # Formatted the same way the subprocess path formats `pyenv global` / `pyenv local` output
+        result = {
+            'global': "\n".join(global_versions),
+            'local': "\n".join(local_versions) if local_versions else "N/A",
+            'shell': shell_version or "N/A",
+            'origin': origin,
+        }
+        self._cache_key, self._cache_value = key, result
+        return dict(result)
+
+class RefreshCancelled(Exception):
+    pass
+
+class PyenvSession:
+    # Persistent bash coprocess for short pyenv commands, so they skip pyenv's front script (a bash start-up
+    # plus plugin/hook path discovery) and Python's fork of a large process. start() asks pyenv once for the
+    # environment it hands its subcommands, through a throwaway `pyenv gui-env` helper command, and starts bash
+    # with it. A request forks that bash and execs the resolved pyenv-<command> in the caller's cwd and
+    # PYENV_VERSION; stdout/stderr go to files in the session directory and bash answers with a frame line
+    # "\x1e<id> <status>". One request at a time: run() returns None when the session is busy, broken or the
+    # command needs the front script, and the caller spawns pyenv as before. A timeout or cancellation kills the
+    # session (and the command); the next run() starts a new one.
+    HELPER_NAME = "pyenv-gui-env"
+    HELPER_SCRIPT = '#!/usr/bin/env bash\nfor name in $(compgen -e); do printf \'%s=%s\\0\' "$name" "${!name}"; done\n'
+    PRELUDE = r"""
+__pyenv_gui_exec() {
+  cd -- "$1" || exit 125
+  export PYENV_DIR="$PWD"
+  if [ -n "$2" ]; then export PYENV_VERSION="${2#=}"; else unset PYENV_VERSION; fi
+  shift 2
+  exec "$@"
+}
+__pyenv_gui_run() {
+  local id="$1" merge="$2"; shift 2
+  if [ "$merge" = 1 ]; then (__pyenv_gui_exec "$@") </dev/null >"$__pyenv_gui_dir/out" 2>&1
+  else (__pyenv_gui_exec "$@") </dev/null >"$__pyenv_gui_dir/out" 2>"$__pyenv_gui_dir/err"; fi
+  printf '\036%s %s\n' "$id" "$?"
+}
+"""
+    START_TIMEOUT_SECONDS = 10
+    CANCEL_POLL_SECONDS = 0.05
+
+    def __init__(self, pyenv_executable, env_factory):
+        self.pyenv_executable, self.env_factory = pyenv_executable, env_factory
+        self.process = self.directory = self.prepared_env = None
+        self.disabled_reason = None # Set when a start fails; spawning is used from then on
+        self.counters = {"runs": 0, "fallbacks": 0, "busy": 0, "starts": 0, "failures": 0}
+        self._paths, self._env_key, self._buffer, self._next_id = {}, None, b"", 0
+        self._lock = threading.Lock()
+        self._atexit_registered = False # While a shell may be running; close() unregisters, so closed sessions don't pile up
+
+    @staticmethod
+    def current_env_key(): # A new session is started when these change under us
+        return (os.environ.get("PATH", ""), os.environ.get("HOME", ""), os.environ.get("PYENV_ROOT", ""))
+
+    def _start(self):
+        self._close()
+        self.directory = tempfile.mkdtemp(prefix="pyenv-gui-session-")
+        helper = os.path.join(self.directory, self.HELPER_NAME)
+        with open(helper, "w") as f: f.write(self.HELPER_SCRIPT)
+        os.chmod(helper, 0o700)
+        env = self.env_factory()
+        env["PATH"] = self.directory + os.pathsep + env.get("PATH", "")
+        proc = subprocess.run([self.pyenv_executable, "gui-env"], capture_output=True, env=env, timeout=self.START_TIMEOUT_SECONDS)
+        prepared = dict(item.split("=", 1) for item in proc.stdout.decode(errors="surrogateescape").split("\0") if "=" in item)
+        if proc.returncode != 0 or "PYENV_ROOT" not in prepared:
+            raise OSError(f"`pyenv gui-env` did not report pyenv's environment ({proc.stderr.decode(errors='replace').strip() or proc.returncode})")
+        prepared["PATH"] = os.pathsep.join(p for p in prepared.get("PATH", "").split(os.pathsep) if p != self.directory)
+        for name in ("PYENV_DIR", "PYENV_VERSION", "SHLVL", "_", "OLDPWD", "PWD"): prepared.pop(name, None)
+        bash = shutil.which("bash", path=prepared["PATH"])
+        if not bash: raise OSError("bash not found")
+        self.process = subprocess.Popen([bash, "--noprofile", "--norc"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, env=prepared, start_new_session=True)
+        self.process.stdin.write(f"__pyenv_gui_dir={shlex.quote(self.directory)}\n{self.PRELUDE}".encode())
+        self.process.stdin.flush()
+        self.prepared_env, self._paths, self._buffer, self._env_key = prepared, {}, b"", self.current_env_key()
+        self.counters["starts"] += 1
+        if not self._atexit_registered: atexit.register(self.close); self._atexit_registered = True
+
+    def _ensure_started(self): # Under _lock; False if the session can't be used
+        if self.disabled_reason: return False
+        if self.process is not None and self.process.poll() is None and self._env_key == self.current_env_key(): return True
+        try:
+            with tracer.span("pyenv session start", "subprocess"): self._start()
+            return True
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            self.counters["failures"] += 1
+            self.disabled_reason = str(e)
+            self._close()
+            return False
+
+    def warm(self): # Starts the shell ahead of the first request (from a background thread)
+        if self._lock.acquire(blocking=False):
+            try: self._ensure_started()
+            finally: self._lock.release()
+
+    def resolve(self, args):
+        # The pyenv-<command> the front script would exec for args, or None where only the front script will do
+        if not args or "--help" in args[1:2] or (args[0].startswith("-") and args[0] not in ("--version", "-v")): return None
+        name = "pyenv---version" if args[0] in ("--version", "-v") else f"pyenv-{args[0]}"
+        if name not in self._paths: self._paths[name] = shutil.which(name, path=self.prepared_env.get("PATH", ""))
+        return self._paths[name]
+
+    def run(self, args, timeout=None, cancelled=None, merge_stderr=False):
+        # args without the leading "pyenv". A CompletedProcess (text), or None to spawn instead. Raises
+        # subprocess.TimeoutExpired like subprocess.run, and RefreshCancelled once `cancelled` (an Event) is set.
+        if self.disabled_reason: return None
+        if not self._lock.acquire(blocking=False):
+            self.counters["busy"] += 1; return None
+        try:
+            if not self._ensure_started(): return None
+            path = self.resolve(args)
+            if path is None:
+                self.counters["fallbacks"] += 1; return None
+            self._next_id += 1
+            version = os.environ.get("PYENV_VERSION")
+            words = [str(self._next_id), "1" if merge_stderr else "0", os.getcwd(), "" if version is None else "=" + version, path]
+            words += [] if args[0] in ("--version", "-v") else list(args[1:])
+            try:
+                self.process.stdin.write(("__pyenv_gui_run " + " ".join(shlex.quote(w) for w in words) + "\n").encode(errors="surrogateescape"))
+                self.process.stdin.flush()
+                status = self._wait_for_frame(self._next_id, timeout, cancelled)
+                with open(os.path.join(self.directory, "out"), encoding="utf-8", errors="replace") as f: stdout = f.read()
+                stderr = ""
+                if not merge_stderr:
+                    with open(os.path.join(self.directory, "err"), encoding="utf-8", errors="replace") as f: stderr = f.read()
+            except (OSError, ValueError): # The shell died or garbled a frame; this call spawns instead
+                self.counters["failures"] += 1
+                self._close()
+                return None
+            except (subprocess.TimeoutExpired, RefreshCancelled):
+                self._close() # Takes the running command down with the shell's process group
+                raise
+            self.counters["runs"] += 1
+            return subprocess.CompletedProcess([self.pyenv_executable] + list(args), status, stdout, stderr)
+        finally:
+            self._lock.release()
+
+    def _wait_for_frame(self, request_id, timeout, cancelled):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            if cancelled is not None and cancelled.is_set(): raise RefreshCancelled(None)
+            wait = self.CANCEL_POLL_SECONDS if cancelled is not None else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: raise subprocess.TimeoutExpired([self.pyenv_executable], timeout)
+                wait = remaining if wait is None else min(wait, remaining)
+            ready, _, _ = select.select([fd], [], [], wait)
+            if ready:
+                chunk = os.read(fd, 4096)
+                if not chunk: raise OSError("pyenv session exited")
+                self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        frame_id, status = line.lstrip(b"\x1e").split()
+        if not line.startswith(b"\x1e") or int(frame_id) != request_id: raise ValueError(f"unexpected frame {line!r}")
+        return int(status)
+
+    def _close(self):
+        if self.process is not None:
+            try: os.killpg(self.process.pid, signal.SIGKILL)
+            except (OSError, AttributeError): self.process.kill()
+            try: self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired: pass
+            for stream in (self.process.stdin, self.process.stdout):
+                try: stream.close()
+                except OSError: pass
+            self.process = None
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True); self.directory = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+            if self._atexit_registered: atexit.unregister(self.close); self._atexit_registered = False
+
+class RefreshFlight:
+    # One run of a RefreshCoordinator source. Fetches run their subprocesses through run() so a superseding
+    # request can terminate them, and so the coordinator can count how many pyenv commands each refresh ran
+    # (commands answered by the persistent session are counted through ran_in_session()).
+    def __init__(self, source, generation):
+        self.source, self.generation = source, generation
+        self.cancelled = threading.Event()
+        self.process = None
+        self.processes = 0
+        self._lock = threading.Lock()
+
+    def run(self, command, env=None, timeout=None): # Like subprocess.run(capture_output=True, text=True)
+        with self._lock:
+            if self.cancelled.is_set(): raise RefreshCancelled(self.source)
+            process = self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+            self.processes += 1
+        try:
+            with tracer.span(command_span_name(command), "subprocess", command=" ".join(command), refresh=self.source) as span:
+                stdout, stderr = process.communicate(timeout=timeout)
+                span.set(returncode=process.returncode, cancelled=self.cancelled.is_set())
+        except subprocess.TimeoutExpired:
+            process.kill(); process.communicate()
+            raise
+        finally: self.process = None
+        if self.cancelled.is_set(): raise RefreshCancelled(self.source)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    def ran_in_session(self):
+        with self._lock: self.processes += 1
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+            if self.process is not None and self.process.poll() is None:
+                try: self.process.terminate()
+                except OSError: pass
+
+class RefreshCoordinator:
+    # Single-flight refreshes of named data sources. request(source) runs fetch(flight) on a worker thread and
+    # hands the outcome to deliver(result, error), with at most one flight per source at any time:
+    #   - the first request for a source starts at once; later ones wait debounce_seconds, and every request
+    #     made while a run is pending is merged into it, so a burst costs a single run;
+    #   - a request made while a flight is running supersedes it: the flight is cancelled (its subprocess
+    #     terminated), its result dropped, and one fresh run follows once it has exited.
+    # stats() exposes per-source counters (requests, merges, runs, subprocesses spawned, ...).
+    def __init__(self, debounce_seconds=0.15):
+        self.debounce_seconds = debounce_seconds
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    def register(self, source, fetch, deliver):
+        self._sources[source] = {'fetch': fetch, 'deliver': deliver, 'timer': None, 'flight': None, 'rerun': False,
+                                 'last_start': None, 'generation': 0, 'delivered_generation': 0,
+                                 'deliver_lock': threading.Lock(), 'counters': collections.Counter()}
+
+    def request(self, source):
+        with self._lock:
+            state = self._sources[source]
+            state['counters']['requested'] += 1
+            if state['timer'] is not None or state['rerun']:
+                state['counters']['merged'] += 1
+            elif state['flight'] is not None:
+                state['flight'].cancel(); state['rerun'] = True
+                state['counters']['superseded'] += 1
+            else:
+                self._launch(source, state, 0 if state['last_start'] is None else self.debounce_seconds)
+
+    def _launch(self, source, state, wait=0): # Called with _lock held
+        if wait > 0:
+            state['timer'] = threading.Timer(wait, self._timer_fired, (source,))
+            state['timer'].daemon = True; state['timer'].start()
+            return
+        state['generation'] += 1
+        flight = state['flight'] = RefreshFlight(source, state['generation'])
+        state['last_start'] = time.monotonic()
+        state['counters']['started'] += 1
+        threading.Thread(target=self._run, args=(state, flight), daemon=True).start()
+
+    def _timer_fired(self, source):
+        with self._lock:
+            state = self._sources[source]
+            state['timer'] = None
+            self._launch(source, state)
+
+    def _run(self, state, flight):
+        result = error = None
+        with tracer.span(f"refresh {flight.source}", "refresh", generation=flight.generation) as span:
+            try: result = state['fetch'](flight)
+            except RefreshCancelled: pass
+            except Exception as e: error = e
+            span.set(superseded=flight.cancelled.is_set(), failed=error is not None)
+        with self._lock:
+            state['flight'] = None
+            counters = state['counters']
+            counters['processes'] += flight.processes
+            stale = flight.cancelled.is_set()
+            counters['discarded' if stale else 'failed' if error is not None else 'delivered'] += 1
+            if state['rerun']:
+                state['rerun'] = False
+                self._launch(flight.source, state)
+        if stale: return
+        with state['deliver_lock']: # A later flight may have finished first; never let an older result overwrite it
+            if flight.generation < state['delivered_generation']: return
+            state['delivered_generation'] = flight.generation
+            state['deliver'](result, error)
+
+    def stats(self):
+        with self._lock:
+            return {source: dict(state['counters']) for source, state in self._sources.items()}
+
+AVAILABLE_VERSION_PREFIXES = ("jython", "ironpython", "graalpython", "micropython", "pypy", "stackless", "anaconda", "miniconda", "miniforge", "mambaforge")
+
+def parse_install_list(lines):
+    # Keeps the version lines of `pyenv install --list` output, dropping headers and notices
+    processed_versions = []
+    for v_line in lines:
+        v_stripped = v_line.strip()
+        if v_stripped and not v_stripped.lower().startswith("available versions:") and not v_stripped.startswith(("Fetching", "Latest", "Only", "Usage:", "==", "-")):
+            if v_stripped[0].isdigit() or v_stripped.startswith(AVAILABLE_VERSION_PREFIXES):
+                processed_versions.append(v_stripped)
+    return processed_versions
+
+def detect_pyenv_executable():
+    return shutil.which("pyenv")
+
+def detect_pyenv_root(pyenv_executable):
+    # `pyenv root` is just $PYENV_ROOT or ~/.pyenv, so check those first; the subprocess (5s timeout) is
+    # only asked when neither exists, e.g. for pyenv-win, whose root lives elsewhere
+    pyenv_root_env = os.environ.get('PYENV_ROOT')
+    if pyenv_root_env: return pyenv_root_env.rstrip("/\\") or pyenv_root_env
+    default_root = os.path.expanduser("~/.pyenv")
+    if os.path.isdir(os.path.join(default_root, "versions")): return default_root
+    if pyenv_executable:
+        try:
+            with tracer.span("pyenv root", "subprocess"):
+                proc = subprocess.run([pyenv_executable, "root"], capture_output=True, text=True, check=True, timeout=5)
+            pyenv_root_from_cmd = proc.stdout.strip()
+            if pyenv_root_from_cmd: return pyenv_root_from_cmd
+        except Exception: pass
+    return default_root
+
+class PyenvEngine:
+    # Everything the GUI does short of drawing it. Blocking methods are safe to call from worker threads;
+    # the async_* methods wrap them (and the install scheduler) for asyncio callers such as the headless CLI.
+    # Install job events go to every listener added with add_job_listener as listener(event, job, data), where
+    # event is "queued", "started", "output", "message" (informational text) or "finished". An engine for another
+    # PYENV_ROOT is given the primary engine, whose build history, artifact cache and install scheduler it shares.
+
+    def __init__(self, pyenv_executable_path=None, pyenv_root_path=None, primary=None):
+        self.pyenv_executable_path = pyenv_executable_path or detect_pyenv_executable()
+        self.pyenv_root_path = pyenv_root_path or detect_pyenv_root(self.pyenv_executable_path)
+        self.pyenv_version_string = ""
+        self._probe_lock, self._probe_result = threading.Lock(), None
+        # "session" (default): short commands go through a persistent PyenvSession; "spawn" starts pyenv every time
+        self.command_mode = os.environ.get("PYENV_GUI_COMMAND_MODE", "session").lower()
+        self.session = (PyenvSession(self.pyenv_executable_path, self.get_env)
+                        if self.command_mode == "session" and self.pyenv_executable_path and sys.platform != "win32" else None)
+        # "native" (default), "subprocess" (always ask pyenv) or "verify" (native, cross-checked against pyenv)
+        self.version_resolver_mode = os.environ.get("PYENV_GUI_VERSION_RESOLVER", "native").lower()
+        self.version_resolver = CurrentVersionResolver(self.pyenv_root_path)
+        self.cache_dir = root_cache_dir(self.pyenv_root_path) # Per-root caches; build history, artifacts and logs are shared
+        self.install_list_cache = InstallListCache(self.pyenv_root_path, self.pyenv_executable_path, self.cache_dir)
+        # "pyenv" runs `pyenv install --list` on a cache miss; "definitions" reads share/python-build directly
+        self.catalogue_source = os.environ.get("PYENV_GUI_CATALOGUE_SOURCE", "pyenv").lower()
+        self.catalogue_key = None
+        self.version_scanner = InstalledVersionScanner(self.pyenv_root_path, self.cache_dir)
+        self.shim_rehasher = ShimRehasher(self.pyenv_root_path, self._full_rehash, self.cache_dir)
+        if primary is not None:
+            self.build_history, self.artifact_cache = primary.build_history, primary.artifact_cache
+        else:
+            self.build_history = BuildHistory()
+            try:
+                self.artifact_cache = ArtifactCache(max_bytes=int(float(os.environ.get("PYENV_GUI_ARTIFACT_CACHE_MAX_GB", "10")) * 1024 ** 3))
+            except OSError:
+                self.artifact_cache = None
+        self._job_listeners = []
+        self.log_dir = os.path.join(user_cache_dir(), "logs") # Build, command and console logs
+        # Preset for builds that don't name one (see BUILD_PROFILES); PYENV_GUI_POST_INSTALL_BENCHMARK=1 benchmarks every new build
+        self.build_profile = os.environ.get("PYENV_GUI_BUILD_PROFILE", "default")
+        if self.build_profile not in BUILD_PROFILES: self.build_profile = "default"
+        self.post_install_benchmark = os.environ.get("PYENV_GUI_POST_INSTALL_BENCHMARK", "") not in ("", "0")
+        if primary is not None:
+            self.install_scheduler = primary.install_scheduler
+        else:
+            try: max_parallel_builds = int(os.environ.get("PYENV_GUI_MAX_PARALLEL_BUILDS", 2))
+            except ValueError: max_parallel_builds = 2
+            self.install_scheduler = InstallScheduler(self._job_env, self._on_job_event, max_concurrent=max_parallel_builds,
+                                                      log_dir=self.log_dir, pyenv_root=self.pyenv_root_path)
+
+    # --- Environment and commands ---
+    def get_env(self, build_profile=None):
+        # build_profile adds that preset's PYTHON_CONFIGURE_OPTS / CFLAGS, for install jobs and their cache keys
+        shims_path = os.path.join(self.pyenv_root_path, "shims")
+        current_env = os.environ.copy()
+        current_env["PATH"] = shims_path + os.pathsep + current_env.get("PATH", "")
+        current_env["PYENV_ROOT"] = self.pyenv_root_path
+        if "PYENV_SHELL" not in current_env:
+            current_env["PYENV_SHELL"] = os.path.basename(os.environ.get("SHELL", "bash"))
+        # Let python-build reuse downloaded tarballs, unless the user already has a cache (pyenv uses $PYENV_ROOT/cache if it exists)
+        if self.artifact_cache and "PYTHON_BUILD_CACHE_PATH" not in current_env and not os.path.isdir(os.path.join(self.pyenv_root_path, "cache")):
+            current_env["PYTHON_BUILD_CACHE_PATH"] = self.artifact_cache.tarball_dir
+        if build_profile: apply_build_profile(current_env, build_profile)
+        return current_env
+
+    def command(self, command_args):
+        if command_args and command_args[0] == "pyenv":
+            if not self.pyenv_executable_path: raise ValueError("pyenv_executable_path is not set")
+            return [self.pyenv_executable_path] + list(command_args[1:])
+        return list(command_args)
+
+    def is_pyenv_installed(self):
+        if not self.pyenv_executable_path: return False
+        if not os.path.exists(self.pyenv_executable_path) or not os.access(self.pyenv_executable_path, os.X_OK): return False
+        try:
+            with tracer.span("pyenv --version", "subprocess"):
+                proc = subprocess.run([self.pyenv_executable_path, "--version"], capture_output=True, text=True, env=self.get_env(), timeout=10)
+            self.pyenv_version_string = proc.stdout.strip() # Part of the install --list cache key
+            return proc.returncode == 0 and "pyenv" in proc.stdout.lower()
+        except Exception:
+            return False
+
+    def capture(self, command_args, timeout, flight=None):
+        # subprocess.run(capture_output=True, text=True) in the pyenv environment; through a RefreshFlight if given
+        full_command = self.command(command_args)
+        if self.session and command_args and command_args[0] == "pyenv":
+            with tracer.span(command_span_name(command_args), "subprocess", command=" ".join(full_command), session=True) as span:
+                try: proc = self.session.run(command_args[1:], timeout=timeout, cancelled=flight.cancelled if flight else None)
+                except RefreshCancelled: raise RefreshCancelled(flight.source)
+                if proc is not None:
+                    span.set(returncode=proc.returncode)
+                    if flight is not None: flight.ran_in_session()
+                    return proc
+                span.set(fallback=True)
+        if flight is not None: return flight.run(full_command, env=self.get_env(), timeout=timeout)
+        with tracer.span(command_span_name(command_args), "subprocess", command=" ".join(full_command)) as span:
+            proc = subprocess.run(full_command, capture_output=True, text=True, env=self.get_env(), timeout=timeout)
+            span.set(returncode=proc.returncode)
+        return proc
+
+    def probe(self):
+        # is_pyenv_installed(), run once; later (and concurrent) callers get the first answer.
+        # Also fills in pyenv_version_string, which the catalogue cache key needs.
+        with self._probe_lock:
+            if self._probe_result is None:
+                self._probe_result = self.is_pyenv_installed()
+                if self._probe_result and self.session: threading.Thread(target=self.session.warm, daemon=True).start()
+            return self._probe_result
+
+    SESSION_STREAM_TIMEOUT_SECONDS = 300
+
+    def stream_command(self, command_args, on_line=None, timeout=None):
+        # Runs a pyenv command with stdout+stderr merged, passing each line to on_line. Returns the exit code.
+        # Short commands run in the session and report their lines when they finish; installs always stream.
+        # A session command that outlives timeout (default SESSION_STREAM_TIMEOUT_SECONDS) is killed with its
+        # shell and raises subprocess.TimeoutExpired, like capture(), rather than holding the session forever.
+        full_command = self.command(command_args)
+        if self.session and command_args[:1] == ["pyenv"] and command_args[1:2] != ["install"]:
+            with tracer.span(command_span_name(command_args), "subprocess", command=" ".join(full_command), session=True) as span:
+                proc = self.session.run(command_args[1:], timeout=timeout or self.SESSION_STREAM_TIMEOUT_SECONDS, merge_stderr=True)
+                if proc is not None:
+                    for line in proc.stdout.splitlines(keepends=True):
+                        if on_line: on_line(line)
+                    span.set(returncode=proc.returncode)
+                    return proc.returncode
+        with tracer.span(command_span_name(command_args), "subprocess", command=" ".join(full_command)) as span:
+            process = subprocess.Popen(full_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, bufsize=1, env=self.get_env())
+            for line in iter(process.stdout.readline, ''):
+                if on_line: on_line(line)
+            process.stdout.close()
+            span.set(returncode=process.wait())
+        return process.returncode
+
+    # --- Installed and current versions ---
+    def installed_versions(self, flight=None):
+        # A directory read replaces `pyenv versions --bare`; the subprocess is only a fallback when versions/ is unreadable
+        try:
+            return scan_installed_versions(self.pyenv_root_path)
+        except OSError:
+            return self.installed_versions_via_pyenv(flight)
+
+    def installed_versions_via_pyenv(self, flight=None):
+        proc = self.capture(["pyenv", "versions", "--bare"], timeout=60, flight=flight)
+        if proc.returncode != 0:
+            raise RuntimeError(f"pyenv versions failed (Code: {proc.returncode}):\nSTDERR: {proc.stderr}\nSTDOUT: {proc.stdout}")
+        return [line.replace("*", "").replace(">", "").strip().split(" ")[0] for line in proc.stdout.split("\n") if line.strip()]
+
+    def scan_installed(self, force=False, on_result=None, flight=None):
+        # {version: disk usage and health record}; see InstalledVersionScanner
+        return self.version_scanner.scan(self.installed_versions(flight), force=force, on_result=on_result, flight=flight)
+
+    def current_versions_native(self):
+        return self.version_resolver.resolve(self.get_env())
+
+    def current_versions_via_pyenv(self, flight=None):
+        pyenv_env = self.get_env()
+        versions = {}
+        global_ver_proc = self.capture(["pyenv", "global"], timeout=5, flight=flight)
+        versions['global'] = global_ver_proc.stdout.strip() if global_ver_proc.returncode == 0 and global_ver_proc.stdout.strip() else ("N/A (or system)" if global_ver_proc.stdout.strip() != "system" else "system")
+        local_ver_proc = self.capture(["pyenv", "local"], timeout=5, flight=flight)
+        versions['local'] = local_ver_proc.stdout.strip() if local_ver_proc.returncode == 0 and local_ver_proc.stdout.strip() else "N/A"
+        versions['shell'] = pyenv_env.get("PYENV_VERSION") or "N/A"
+        return versions
+
+    def current_versions(self, mode=None, flight=None):
+        # Honours version_resolver_mode. In "verify" mode pyenv's answer wins and disagreements are listed under 'mismatches'.
+        mode = mode or self.version_resolver_mode
+        native = None
+        if mode != "subprocess":
+            native = self.current_versions_native()
+            if mode != "verify": return native
+        versions = self.current_versions_via_pyenv(flight)
+        if native is not None:
+            versions['mismatches'] = [f"{key}: in-process {native.get(key)!r}, pyenv {versions[key]!r}"
+                                      for key in ('global', 'local') if native.get(key) != versions[key]]
+        return versions
+
+    # --- Available versions catalogue ---
+    def cached_catalogue(self):
+        # (cache key, raw install --list lines) from disk, or (None, None)
+        return self.install_list_cache.load()
+
+    def refresh_catalogue(self, cached_key=None, on_message=None, flight=None):
+        # Raw install --list lines if the cache key changed (rebuilding and storing them), None if cached_key is current.
+        # catalogue_key is the key the returned (or still current) lines belong to.
+        self.probe()
+        key = self.catalogue_key = self.install_list_cache.compute_key(self.pyenv_version_string)
+        if key == cached_key: return None
+        if self.catalogue_source == "definitions" and self.install_list_cache.definition_dirs():
+            lines = self.install_list_cache.read_definitions()
+        else:
+            full_command = self.command(["pyenv", "install", "--list"])
+            if on_message: on_message(f"Fetching: {' '.join(full_command)}\n")
+            proc = self.capture(["pyenv", "install", "--list"], timeout=60, flight=flight)
+            if proc.returncode != 0:
+                raise RuntimeError(f"Error fetching data with {' '.join(full_command)} (Code: {proc.returncode}):\nSTDERR: {proc.stderr}\nSTDOUT: {proc.stdout}")
+            lines = proc.stdout.strip().split('\n')
+        try: self.install_list_cache.store(key, lines)
+        except OSError as e:
+            if on_message: on_message(f"Could not write install list cache: {e}\n")
+        return lines
+
+    def available_versions(self):
+        cached_key, cached_lines = self.cached_catalogue()
+        lines = self.refresh_catalogue(cached_key)
+        return parse_install_list(lines if lines is not None else cached_lines)
+
+    # --- Install jobs ---
+    def add_job_listener(self, listener):
+        self._job_listeners.append(listener)
+
+    def remove_job_listener(self, listener):
+        if listener in self._job_listeners: self._job_listeners.remove(listener)
+
+    def _emit(self, event, job, data):
+        for listener in list(self._job_listeners): listener(event, job, data)
+
+    def submit_install(self, version, build_profile=None):
+        # Queues a build, or a restore from the artifact cache on a hit. Returns None if the version is already queued/running.
+        build_profile = build_profile or self.build_profile
+        env = self.get_env(build_profile=build_profile) # The profile's flags are part of the artifact key
+        command = self.command(["pyenv", "install", "-v", version]) # -v for verbose
+        key, runner, kind = None, None, "build"
+        destination = os.path.join(self.pyenv_root_path, "versions", version)
+        if self.artifact_cache and not os.path.exists(destination):
+            key = self.artifact_cache.key_for(version, env)
+            if self.artifact_cache.lookup(key, prefix=destination):
+                runner, kind = self._restore_from_artifact_cache, "restore"
+        return self.install_scheduler.submit(version, command, runner=runner, kind=kind, artifact_key=key, build_profile=build_profile,
+                                             pyenv_root=self.pyenv_root_path, env_factory=self._job_env, on_event=self._on_job_event)
+
+    def _job_env(self, job):
+        return self.get_env(build_profile=job.build_profile)
+
+    def _restore_from_artifact_cache(self, job, emit): # Scheduler runner for cache hits
+        destination = os.path.join(self.pyenv_root_path, "versions", job.version)
+        link_files = os.environ.get("PYENV_GUI_ARTIFACT_RESTORE", "copy").lower() == "link"
+        emit(f"Restoring {job.version} from the artifact cache ({job.artifact_key})...\n")
+        started = time.monotonic()
+        try:
+            files, size, methods = self.artifact_cache.restore_tree(job.artifact_key, destination, link_files=link_files,
+                                                                    cancelled=lambda: job.cancel_requested)
+        except RestoreCancelled:
+            emit("Restore cancelled; nothing was installed.\n")
+            return 1
+        except (OSError, KeyError) as e:
+            emit(f"Restore failed: {e}\n")
+            return 1
+        emit(f"Restored {files} files ({size / 1024 ** 2:.1f} MiB) via {', '.join(sorted(methods)) or 'copy'} in {time.monotonic() - started:.1f}s.\n")
+        rehash = self.rehash()
+        emit(self.describe_rehash(rehash))
+        return 0 if rehash["ok"] else 1
+
+    def _store_build_artifact(self, job):
+        source = os.path.join(self.pyenv_root_path, "versions", job.version)
+        try:
+            files, size = self.artifact_cache.store_tree(job.artifact_key, job.version, source,
+                                                         configure=self.get_env(build_profile=job.build_profile).get("PYTHON_CONFIGURE_OPTS", ""))
+            self._emit("message", job, f"Cached build tree ({files} files, {size / 1024 ** 2:.1f} MiB) for reuse.\n")
+        except OSError as e:
+            self._emit("message", job, f"Could not cache build tree: {e}\n")
+
+    def build_options_key(self, job):
+        # Part of the build history key, so timings of differently configured builds aren't mixed
+        return self.configure_options(job.build_profile) + f" -j{job.make_jobs}"
+
+    def configure_options(self, build_profile=None):
+        env = self.get_env(build_profile=build_profile)
+        return " ".join(f"{name}={env.get(name, '')}" for name in ("PYTHON_CONFIGURE_OPTS", "CFLAGS"))
+
+    MICRO_BENCHMARK_PEERS = 3 # Other installed versions of the same series measured alongside a new build
+
+    def benchmark_build(self, version, build_profile=None, on_message=None, repeats=5):
+        # Runs MICRO_BENCHMARK_SCRIPT in an installed version and compares it with the newest other installed
+        # versions of its series (measured now, under the same conditions) and with earlier builds of the same
+        # version under other options (from the build history). build_profile labels the result; None means
+        # the options it was built with are unknown.
+        def say(text):
+            if on_message: on_message(text)
+        python = self._interpreter_path(version)
+        if python is None: raise RuntimeError(f"{version} has no bin/python to benchmark")
+        say(f"Benchmarking {version} ({build_profile or 'unknown'} build)...\n")
+        with tracer.span("micro-benchmark", "subprocess", version=version):
+            results = run_micro_benchmark(python, repeats=repeats)
+        options = self.configure_options(build_profile) if build_profile else "unknown"
+        earlier = [run for run in self.build_history.benchmark_runs(version) if run[1] != options]
+        try: self.build_history.record_benchmark(version, build_profile or "unknown", options, results)
+        except sqlite3.Error as e: say(f"Could not record benchmark results: {e}\n")
+        record, peers = CatalogueRecord(version), []
+        for other in reversed(scan_installed_versions(self.pyenv_root_path)): # Newest first; virtualenvs and aliases aren't builds
+            if other == version or "/" in other or os.path.islink(os.path.join(self.pyenv_root_path, "versions", other)): continue
+            other_record = CatalogueRecord(other)
+            if record.series and (other_record.implementation, other_record.series) == (record.implementation, record.series) and self._interpreter_path(other):
+                peers.append(other)
+        comparisons = []
+        for peer in peers[:self.MICRO_BENCHMARK_PEERS]:
+            try:
+                with tracer.span("micro-benchmark", "subprocess", version=peer):
+                    comparisons.append({"against": peer, "kind": "installed", "results": run_micro_benchmark(self._interpreter_path(peer), repeats=repeats)})
+            except (RuntimeError, OSError, subprocess.TimeoutExpired) as e: say(f"Could not benchmark {peer}: {e}\n")
+        for profile, run_options, measured_at, run_results in earlier:
+            comparisons.append({"against": f"{version} ({profile} build, {time.strftime('%Y-%m-%d', time.localtime(measured_at))})",
+                                "kind": "recorded", "build_options": run_options, "results": run_results})
+        say("  " + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in results.items()) + "\n")
+        for comparison in comparisons:
+            comparison["speedup"] = benchmark_speedup(results, comparison["results"])
+            if comparison["speedup"]: say(f"  {comparison['speedup']:.2f}x the speed of {comparison['against']}\n")
+        if not comparisons: say(f"  Nothing to compare with yet: no other {record.series or version} build installed or recorded.\n")
+        return {"version": version, "build_profile": build_profile, "build_options": options, "results": results, "comparisons": comparisons}
+
+    def _interpreter_path(self, version):
+        for name in ("python", "python3", "pypy3", "pypy"):
+            path = os.path.join(self.pyenv_root_path, "versions", version, "bin", name)
+            if os.access(path, os.X_OK): return path
+        return None
+
+    def _on_job_event(self, event, job, data): # Called from scheduler threads
+        if event == "started" and job.kind == "build":
+            job.build_options = self.build_options_key(job)
+            job.tracker = BuildProgressTracker(self.build_history.estimate(job.version, job.build_options))
+        elif event == "output" and job.tracker is not None:
+            phase_changed = job.tracker.feed(data)
+            self._emit(event, job, data)
+            if phase_changed: self._emit("progress", job, job.tracker.phase)
+            return
+        elif event == "finished" and job.tracker is not None and job.started_at is not None:
+            phase_times = job.tracker.finish()
+            if phase_times:
+                summary = ", ".join(f"{phase} {format_duration(phase_times[phase])}" for phase in BuildProgressTracker.PHASES if phase in phase_times)
+                self._emit("message", job, f"Phase times: {summary}\n")
+            if job.status != "cancelled":
+                try: self.build_history.record(job.version, phase_times, job.finished_at - job.started_at, job.status == "succeeded",
+                                               build_options=job.build_options, started_at=job.started_at)
+                except sqlite3.Error as e: self._emit("message", job, f"Could not record build timings: {e}\n")
+            if job.status == "succeeded": # `pyenv install` ran a full rehash; record it so the next incremental one trusts the shims
+                try: self.shim_rehasher.adopt()
+                except OSError: pass
+            if job.status == "succeeded" and self.artifact_cache:
+                try: self.artifact_cache.note_tarball_use(job.version, downloaded="download" in phase_times)
+                except OSError: pass
+                if job.artifact_key: threading.Thread(target=self._store_build_artifact, args=(job,), daemon=True).start()
+        self._emit(event, job, data)
+
+    # --- Other operations ---
+    def _full_rehash(self): # ShimRehasher's fallback
+        proc = self.capture(["pyenv", "rehash"], timeout=None)
+        return proc.returncode == 0, (proc.stderr.strip() or proc.stdout.strip())
+
+    def rehash(self):
+        return self.shim_rehasher.rehash()
+
+    @staticmethod
+    def describe_rehash(result):
+        if not result["ok"]: return f"Warning: `pyenv rehash` failed: {result['error']}\n"
+        if result["mode"] == "full": return f"Rehashed shims ({result['reason']}; full rehash) in {result['seconds']:.1f}s.\n"
+        return f"Rehashed shims incrementally (+{result['added']} -{result['removed']}) in {result['seconds']:.2f}s.\n"
+
+    def uninstall(self, version, on_line=None):
+        return self.stream_command(["pyenv", "uninstall", "-f", version], on_line)
+
+    TRASH_DIR_NAME = ".pyenv-gui-trash" # In $PYENV_ROOT, so trees move out of versions/ with a same-filesystem rename
+
+    def _sweep_trash(self, trash_dir):
+        # Deletes run directories (<pid>-*) left by processes that have exited; live runs, ours included, are left alone
+        try:
+            with os.scandir(trash_dir) as entries: names = [e.name for e in entries if e.is_dir(follow_symlinks=False)]
+        except OSError: return
+        for name in names:
+            pid = name.split("-", 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or os.name != "posix": continue # No safe liveness probe on Windows
+            try: os.kill(int(pid), 0); continue
+            except ProcessLookupError: pass
+            except OSError: continue # Alive, owned by someone else
+            shutil.rmtree(os.path.join(trash_dir, name), ignore_errors=True)
+
+    def _version_path(self, version):
+        versions_dir = os.path.join(self.pyenv_root_path, "versions")
+        path = os.path.normpath(os.path.join(versions_dir, version))
+        if not version or ".." in version.split("/") or not path.startswith(versions_dir + os.sep):
+            raise ValueError(f"not an installed version name: {version!r}")
+        return path
+
+    def uninstall_many(self, versions, on_message=None, max_workers=4):
+        # Removes several versions side by side; returns one result dict per version. By default each goes through
+        # `pyenv uninstall -f`, so plugin uninstall hooks (e.g. pyenv-virtualenv's) and pyenv's rehash run.
+        # PYENV_GUI_UNINSTALL_METHOD=direct skips pyenv: the trees are renamed into this run's own directory under the
+        # trash directory, so they leave `versions/` (and the installed list) at once, then deleted concurrently and
+        # rehashed once at the end. No uninstall hooks run; pyenv-virtualenv aliases left dangling are unlinked.
+        from concurrent.futures import ThreadPoolExecutor
+        def message(text):
+            if on_message: on_message(text)
+        started = time.perf_counter()
+        records = self.version_scanner.cached()
+        results = {version: {"version": version, "removed": False, "error": None, "bytes": (records.get(version) or {}).get("bytes")}
+                   for version in dict.fromkeys(versions)}
+        if os.environ.get("PYENV_GUI_UNINSTALL_METHOD", "pyenv").lower() != "direct":
+            def run_pyenv(result):
+                with tracer.span("uninstall version", "uninstall", version=result["version"], method="pyenv"):
+                    proc = self.capture(["pyenv", "uninstall", "-f", result["version"]], timeout=None)
+                result["removed"] = proc.returncode == 0
+                if not result["removed"]: result["error"] = (proc.stderr.strip() or proc.stdout.strip() or f"exit code {proc.returncode}")
+                message(f"{'Removed' if result['removed'] else 'Failed to remove'} {result['version']}.\n")
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="uninstall") as pool:
+                list(pool.map(run_pyenv, results.values()))
+            try: self.shim_rehasher.adopt() # pyenv uninstall rehashed
+            except OSError: pass
+            return list(results.values())
+        trash_dir = os.path.join(self.pyenv_root_path, self.TRASH_DIR_NAME)
+        self._sweep_trash(trash_dir) # Leftovers of interrupted runs
+        run_dir = None # Created on the first rename; other runs, here or in another process, have their own
+        to_delete, removed_paths = [], []
+        for index, result in enumerate(results.values()):
+            try:
+                path = self._version_path(result["version"])
+                if os.path.islink(path):
+                    os.unlink(path); result["removed"] = True; continue
+                if not os.path.isdir(path): raise FileNotFoundError(f"{result['version']} is not installed")
+                try:
+                    if run_dir is None:
+                        os.makedirs(trash_dir, exist_ok=True)
+                        run_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=trash_dir)
+                    target = os.path.join(run_dir, f"{index}-{result['version'].replace('/', '_')}")
+                    os.rename(path, target)
+                except OSError: target = path # Not renameable (e.g. a mount point); delete in place
+                to_delete.append((result, target)); removed_paths.append(path)
+            except (OSError, ValueError) as e:
+                result["error"] = str(e)
+        def delete(item):
+            result, target = item
+            with tracer.span("uninstall version", "uninstall", version=result["version"], method="direct"):
+                errors = []
+                if sys.version_info >= (3, 12): # onerror is deprecated from 3.12
+                    shutil.rmtree(target, onexc=lambda function, path, exc: errors.append(f"{path}: {exc}"))
+                else:
+                    shutil.rmtree(target, onerror=lambda function, path, exc_info: errors.append(f"{path}: {exc_info[1]}"))
+            result["removed"] = not os.path.exists(target)
+            if errors and not result["removed"]: result["error"] = errors[0]
+            message(f"{'Removed' if result['removed'] else 'Failed to remove'} {result['version']}.\n")
+        message(f"Removing {len(to_delete)} version tree(s)...\n")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="uninstall") as pool:
+            list(pool.map(delete, to_delete))
+        for directory in (run_dir, trash_dir): # The trash directory only goes once no other run is using it
+            try:
+                if directory: os.rmdir(directory)
+            except OSError: pass
+        versions_dir = os.path.join(self.pyenv_root_path, "versions")
+        try: # pyenv-virtualenv aliases (versions/<name> -> <version>/envs/<name>) that now point nowhere
+            with os.scandir(versions_dir) as entries:
+                for entry in entries:
+                    if entry.is_symlink() and not os.path.exists(entry.path) and any(
+                            os.path.realpath(entry.path).startswith(path + os.sep) for path in removed_paths):
+                        os.unlink(entry.path); message(f"Removed alias {entry.name}.\n")
+        except OSError: pass
+        if any(r["removed"] for r in results.values()): message(self.describe_rehash(self.rehash()))
+        message(f"Uninstall finished in {time.perf_counter() - started:.1f}s.\n")
+        return list(results.values())
+
+    PRUNE_VERSION_RE = re.compile(r"^(?P<prefix>[A-Za-z][\w.]*-)?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)(?P<pre>(?:a|b|rc)\d+)?(?P<t>t)?$")
+
+    def version_last_used(self, version):
+        # Newest atime of the version's python executables: shims exec them, so this moves when it is used.
+        # On noatime mounts it stays at install time, which makes everything look unused.
+        bin_dir = os.path.join(self.pyenv_root_path, "versions", version, "bin")
+        times = []
+        try:
+            with os.scandir(bin_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith(("python", "pypy")):
+                        try: times.append(os.stat(entry.path).st_atime)
+                        except OSError: pass
+        except OSError: pass
+        return max(times) if times else None
+
+    def prune_candidates(self, keep_latest_patch=True, unused_days=None):
+        # Preview of a prune policy. Versions in use (global/local/shell), hosting virtualenvs or aliased are
+        # never candidates. Returns {"candidates": [{version, reasons, bytes, last_used}], "protected": {version: why}, "bytes": total}.
+        versions = scan_installed_versions(self.pyenv_root_path)
+        records = self.version_scanner.cached()
+        versions_dir = os.path.join(self.pyenv_root_path, "versions")
+        protected = {}
+        try: current = self.current_versions_native()
+        except Exception: current = {}
+        for key in ("global", "local", "shell"):
+            for name in re.split(r"[:\s]+", str(current.get(key) or "")):
+                if name in versions: protected.setdefault(name, f"{key} version")
+        for version in versions:
+            path = os.path.join(versions_dir, version)
+            if "/envs/" in version or os.path.islink(path):
+                protected.setdefault(version, "virtualenv or alias")
+                if os.path.islink(path): protected.setdefault(os.path.relpath(os.path.realpath(path), versions_dir).split(os.sep + "envs" + os.sep)[0], "aliased")
+            elif any(v.startswith(version + "/envs/") for v in versions): protected.setdefault(version, "has virtualenvs")
+        reasons = collections.defaultdict(list)
+        if keep_latest_patch:
+            series = collections.defaultdict(list)
+            for version in versions:
+                match = self.PRUNE_VERSION_RE.match(version)
+                if not match: continue
+                series[(match["prefix"] or "", match["major"], match["minor"], bool(match["t"]))].append(
+                    ((int(match["patch"]), match["pre"] is None, version_sort_key(match["pre"] or "")), version))
+            for members in series.values():
+                # A prerelease never supersedes a final release; it only replaces older prereleases and finals
+                finals = [member for member in members if member[0][1]]
+                newest_key, newest = max(finals or members)
+                for key, version in members:
+                    if key < newest_key: reasons[version].append(f"superseded by {newest}")
+        now = time.time()
+        last_used = {}
+        if unused_days is not None:
+            for version in versions:
+                if "/envs/" in version: continue
+                last_used[version] = self.version_last_used(version)
+                if last_used[version] is not None and now - last_used[version] > unused_days * 86400:
+                    reasons[version].append(f"unused for {int((now - last_used[version]) // 86400)} days")
+        candidates = [{"version": version, "reasons": reasons[version], "bytes": (records.get(version) or {}).get("bytes"),
+                       "last_used": last_used.get(version, self.version_last_used(version) if version in reasons else None)}
+                      for version in versions if reasons.get(version) and version not in protected]
+        return {"candidates": candidates, "protected": {v: why for v, why in protected.items() if reasons.get(v)},
+                "bytes": sum(c["bytes"] or 0 for c in candidates)}
+
+    def set_global(self, version, on_line=None):
+        return self.stream_command(["pyenv", "global", version], on_line)
+
+    def set_local(self, version, on_line=None):
+        return self.stream_command(["pyenv", "local", version], on_line)
+
+    # --- asyncio API ---
+    async def async_installed_versions(self):
+        import asyncio
+        return await asyncio.to_thread(self.installed_versions)
+
+    async def async_scan_installed(self, force=False):
+        import asyncio
+        return await asyncio.to_thread(self.scan_installed, force)
+
+    async def async_benchmark_build(self, version, build_profile=None, on_message=None, repeats=5):
+        import asyncio
+        return await asyncio.to_thread(self.benchmark_build, version, build_profile, on_message, repeats)
+
+    async def async_uninstall_many(self, versions, on_message=None):
+        import asyncio
+        return await asyncio.to_thread(self.uninstall_many, versions, on_message)
+
+    async def async_rehash(self):
+        import asyncio
+        return await asyncio.to_thread(self.rehash)
+
+    async def async_current_versions(self):
+        import asyncio
+        return await asyncio.to_thread(self.current_versions)
+
+    async def async_available_versions(self):
+        import asyncio
+        return await asyncio.to_thread(self.available_versions)
+
+    async def async_run(self, command_args, on_line=None):
+        # (exit code, combined output) of a pyenv command, streamed without a helper thread
+        import asyncio
+        full_command = self.command(command_args)
+        with tracer.span(command_span_name(command_args), "subprocess", command=" ".join(full_command)) as span:
+            process = await asyncio.create_subprocess_exec(*full_command, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT, env=self.get_env())
+            output = []
+            async for raw_line in process.stdout:
+                line = raw_line.decode(errors="replace")
+                output.append(line)
+                if on_line: on_line(line)
+            span.set(returncode=await process.wait())
+        return process.returncode, "".join(output)
+
+    async def async_install(self, versions, max_concurrent=None, on_event=None, build_profile=None):
+        # Installs versions through the shared scheduler and returns the finished InstallJob objects, in order.
+        # Versions already queued or running elsewhere are reported as None.
+        import asyncio
+        if max_concurrent: self.install_scheduler.set_max_concurrent(max_concurrent)
+        loop = asyncio.get_running_loop()
+        pending = {}
+        def listener(event, job, data):
+            if on_event: loop.call_soon_threadsafe(on_event, event, job, data)
+            if event == "finished" and job.id in pending:
+                loop.call_soon_threadsafe(lambda: pending[job.id].done() or pending[job.id].set_result(job))
+        self.add_job_listener(listener)
+        try:
+            jobs = []
+            for version in versions:
+                job = self.submit_install(version, build_profile=build_profile)
+                if job is not None:
+                    pending[job.id] = loop.create_future()
+                    if not job.active: pending[job.id].set_result(job) # Finished before we started listening
+                jobs.append(job)
+            return [await pending[job.id] if job is not None else None for job in jobs]
+        finally:
+            self.remove_job_listener(listener)
+
+class PyenvRoots:
+    # The PYENV_ROOTs the GUI manages: the detected one (primary), any listed in PYENV_GUI_ROOTS (os.pathsep-separated)
+    # and those added from the GUI, which are remembered in roots.json in the cache directory. Each root gets its own
+    # PyenvEngine on first use, so its own per-root caches and session (the install scheduler, build history and artifact
+    # cache are the primary's); that engine runs the root's own bin/pyenv when it has one, otherwise the primary pyenv
+    # with PYENV_ROOT pointed at the root.
+    # scan() lists and measures every root at once on a thread pool. A version installed under the same name in several
+    # roots whose interpreter binaries (bin/python and any libpython) hash the same is a duplicate build, and
+    # link_duplicates() hardlinks the identical files of the later copies to the first root's.
+    FILE_NAME = "roots.json"
+    LINK_SKIP = ("site-packages", "envs") # Changed in place by pip and per-root environments; left as separate copies
+
+    def __init__(self, primary, max_workers=None):
+        self.primary = primary
+        self.path = os.path.join(user_cache_dir(), self.FILE_NAME)
+        self.max_workers = max_workers or min(8, available_cpus() * 2)
+        self.roots, self.registered = [primary.pyenv_root_path], []
+        self._engines = {self.key(primary.pyenv_root_path): primary}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        for root in os.environ.get("PYENV_GUI_ROOTS", "").split(os.pathsep):
+            if root and os.path.isdir(os.path.expanduser(root)): self.add(root, remember=False)
+        for root in self._load():
+            if os.path.isdir(root) and self.find(root) is None: self.roots.append(root); self.registered.append(root)
+
+    @staticmethod
+    def key(root):
+        return os.path.realpath(os.path.expanduser(root))
+
+    def label(self, root):
+        home = os.path.expanduser("~")
+        return "~" + root[len(home):] if root == home or root.startswith(home + os.sep) else root
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return [root for root in json.load(f)["roots"] if isinstance(root, str)]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"roots": self.registered}, f)
+            os.replace(tmp_path, self.path)
+        except OSError: pass
+
+    def find(self, root): # The registered root that is the same directory as root, or None
+        key = self.key(root)
+        return next((r for r in self.roots if self.key(r) == key), None)
+
+    def add(self, root, remember=True):
+        # Registers a root (any directory: versions/ is created by its first install) and returns it as registered
+        root = os.path.abspath(os.path.expanduser(root))
+        if not os.path.isdir(root): raise ValueError(f"{root} is not a directory")
+        with self._lock:
+            existing = self.find(root)
+            if existing is not None: return existing
+            self.roots.append(root)
+            if remember: self.registered.append(root); self._save()
+        return root
+
+    def remove(self, root):
+        # Forgets a root (its files are left alone). The primary root can't be removed.
+        with self._lock:
+            root = self.find(root)
+            if root is None or root == self.primary.pyenv_root_path: return False
+            self.roots.remove(root)
+            if root in self.registered: self.registered.remove(root); self._save()
+            engine = self._engines.pop(self.key(root), None)
+        if engine is not None and engine.session: engine.session.close()
+        return True
+
+    def engine(self, root):
+        with self._lock:
+            key = self.key(root)
+            engine = self._engines.get(key)
+            if engine is None:
+                own_pyenv = os.path.join(root, "bin", "pyenv")
+                executable = own_pyenv if os.access(own_pyenv, os.X_OK) else self.primary.pyenv_executable_path
+                engine = self._engines[key] = PyenvEngine(executable, root, primary=self.primary)
+            return engine
+
+    def scan(self, force=False, on_root=None):
+        # {root: {"records": {version: record} or None, "error": text or None, "seconds": s}}, in root order. The roots
+        # are scanned concurrently, each through its own InstalledVersionScanner and per-root cache (ignored with force);
+        # on_root(root, result) is called from the pool as each one finishes.
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        roots = list(self.roots)
+        def scan_root(root):
+            started = time.perf_counter()
+            try:
+                with tracer.span("scan root", "scan", root=root):
+                    result = {"records": self.engine(root).scan_installed(force=force), "error": None}
+            except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+                result = {"records": None, "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - started, 3)
+            return root, result
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(len(roots), self.max_workers), thread_name_prefix="root-scan") as pool:
+            for future in as_completed([pool.submit(scan_root, root) for root in roots]):
+                root, result = future.result()
+                results[root] = result
+                if on_root: on_root(root, result)
+        return {root: results[root] for root in roots}
+
+    def fingerprint(self, root, version):
+        # sha1 over the version's interpreter binary and shared libpython, remembered per (path, inode, mtime, size);
+        # None without a bin/python
+        prefix = os.path.join(root, "versions", version)
+        paths = [os.path.join(prefix, "bin", "python")]
+        try:
+            with os.scandir(os.path.join(prefix, "lib")) as entries:
+                paths += sorted(e.path for e in entries if e.name.startswith("libpython") and (".so" in e.name or e.name.endswith(".dylib")))
+        except OSError: pass
+        digest = hashlib.sha1()
+        for path in dict.fromkeys(os.path.realpath(p) for p in paths):
+            try: st = os.stat(path)
+            except OSError:
+                if path == os.path.realpath(paths[0]): return None
+                continue
+            key = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+            if key not in self._fingerprints:
+                file_digest = hashlib.sha1()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""): file_digest.update(chunk)
+                self._fingerprints[key] = file_digest.hexdigest()
+            digest.update(self._fingerprints[key].encode())
+        return digest.hexdigest()
+
+    def duplicates(self, results):
+        # [{"version", "fingerprint", "roots", "same_filesystem"}] for each build more than one root holds an identical
+        # copy of (environments and aliases left out), roots in root order. Only same-named versions are hashed.
+        from concurrent.futures import ThreadPoolExecutor
+        holders = collections.defaultdict(list)
+        for root, result in results.items():
+            for version, record in (result["records"] or {}).items():
+                if "/" not in version and not record.get("alias_of"): holders[version].append(root)
+        candidates = [(version, root) for version, roots in holders.items() if len(roots) > 1 for root in roots]
+        if not candidates: return []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="root-fingerprint") as pool:
+            fingerprints = list(pool.map(lambda candidate: self.fingerprint(candidate[1], candidate[0]), candidates))
+        groups = collections.defaultdict(list)
+        for (version, root), fingerprint in zip(candidates, fingerprints):
+            if fingerprint: groups[version, fingerprint].append(root)
+        duplicates = []
+        for (version, fingerprint), roots in sorted(groups.items(), key=lambda item: version_sort_key(item[0][0])):
+            if len(roots) < 2: continue
+            try: devices = {os.stat(os.path.join(root, "versions", version)).st_dev for root in roots}
+            except OSError: continue
+            duplicates.append({"version": version, "fingerprint": fingerprint, "roots": roots, "same_filesystem": len(devices) == 1})
+        return duplicates
+
+    def merged(self, results, duplicates=()):
+        # One row per installed version per root, by version and then root order: the scan record plus "root" and
+        # "duplicate_of", the root holding the first copy of an identical build (None for that first copy and for others)
+        first_copy = {(d["version"], root): d["roots"][0] for d in duplicates for root in d["roots"][1:]}
+        rows = []
+        for index, (root, result) in enumerate(results.items()):
+            for version, record in (result["records"] or {}).items():
+                row = {k: v for k, v in record.items() if k != "key"}
+                row.update(root=root, duplicate_of=first_copy.get((version, root)))
+                rows.append((version_sort_key(version), index, row))
+        return [row for _, _, row in sorted(rows, key=lambda item: item[:2])]
+
+    def link_duplicates(self, duplicates, on_message=None):
+        # Hardlinks every later copy of each duplicate build to the first root's copy, file by file and only where the
+        # contents match (see link_identical_files; LINK_SKIP is left alone), several copies at once on the thread pool.
+        # Builds spread over filesystems are skipped. Returns [{"version", "root", "into", "files", "bytes", "errors"}].
+        from concurrent.futures import ThreadPoolExecutor
+        def link(version, keep, other):
+            with tracer.span("link duplicate", "dedupe", version=version, root=other):
+                files, freed, errors = link_identical_files(os.path.join(keep, "versions", version),
+                                                            os.path.join(other, "versions", version), skip=self.LINK_SKIP)
+            if on_message:
+                on_message(f"{version}: hardlinked {files} files of {self.label(other)} to {self.label(keep)}, "
+                           f"{freed / 1024 ** 2:.1f} MiB freed{f', {len(errors)} errors' if errors else ''}.\n")
+            return {"version": version, "root": other, "into": keep, "files": files, "bytes": freed, "errors": errors}
+        pairs = [(d["version"], d["roots"][0], other) for d in duplicates if d["same_filesystem"] for other in d["roots"][1:]]
+        if not pairs: return []
+        with ThreadPoolExecutor(max_workers=min(len(pairs), self.max_workers), thread_name_prefix="root-link") as pool:
+            return list(pool.map(lambda pair: link(*pair), pairs))
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 60}m{seconds % 60:02d}s" if seconds >= 60 else f"{seconds}s"
+
+def job_result(job, version=None):
+    if job is None: return {"version": version, "status": "skipped", "reason": "already queued or running"}
+    return {"version": job.version, "kind": job.kind, "status": job.status, "return_code": job.return_code,
+            "seconds": round(job.finished_at - job.started_at, 3) if job.started_at and job.finished_at else None,
+            "phase_times": job.tracker.phase_times if job.tracker else {}, "log_path": job.log_path, "build_profile": job.build_profile,
+            "make_jobs": job.make_jobs, "pyenv_root": job.pyenv_root}
+
+async def run_headless(args):
+    import asyncio
+    roots = PyenvRoots(PyenvEngine())
+    try: engine = roots.engine(roots.add(args.root, remember=False)) if args.root else roots.primary
+    except ValueError as e: return 2, {"error": str(e)}
+    if not engine.probe():
+        return 2, {"error": "pyenv was not found or is not working", "pyenv": engine.pyenv_executable_path}
+    def log(text):
+        if args.verbose: sys.stderr.write(text); sys.stderr.flush()
+    if args.command == "list":
+        result = {"pyenv_root": engine.pyenv_root_path, "installed": await engine.async_installed_versions(),
+                  "current": await engine.async_current_versions()}
+        if args.available:
+            available = await engine.async_available_versions()
+            if args.filter: available = [CatalogueIndex(available).versions[i] for i in CatalogueIndex(available).search(args.filter)]
+            result["available"] = available
+        return 0, result
+    if args.command == "current":
+        return 0, await engine.async_current_versions()
+    if args.command == "scan":
+        entries = await engine.async_scan_installed(force=args.force)
+        records = [{k: v for k, v in entries[version].items() if k != "key"} for version in sorted(entries, key=version_sort_key)]
+        return 0, {"pyenv_root": engine.pyenv_root_path, "versions": records, "total_bytes": sum(r["bytes"] or 0 for r in records),
+                   "scan": engine.version_scanner.last_scan}
+    if args.command == "install":
+        def on_event(event, job, data):
+            if event in ("output", "message"): log(f"[{job.version}] {data}")
+            elif event in ("started", "finished"): log(f"[{job.version}] {event} ({job.status})\n")
+        jobs = await engine.async_install(args.versions, max_concurrent=args.jobs, on_event=on_event, build_profile=args.profile)
+        results = [job_result(job, version) for job, version in zip(jobs, args.versions)]
+        for job, result in zip(jobs, results):
+            if args.benchmark and job is not None and job.status == "succeeded":
+                try: result["benchmark"] = await engine.async_benchmark_build(job.version, job.build_profile, on_message=log)
+                except (RuntimeError, OSError, subprocess.TimeoutExpired) as e: result["benchmark"] = {"error": str(e)}
+        return (0 if all(r["status"] in ("succeeded", "skipped") for r in results) else 1), {"install": results}
+    if args.command == "benchmark":
+        results = []
+        for version in args.versions:
+            try: results.append(await engine.async_benchmark_build(version, args.profile, on_message=log, repeats=args.repeats))
+            except (RuntimeError, OSError, subprocess.TimeoutExpired) as e: results.append({"version": version, "error": str(e)})
+        return (0 if all("error" not in r for r in results) else 1), {"benchmark": results}
+    if args.command == "uninstall":
+        results = await engine.async_uninstall_many(args.versions, on_message=log)
+        return (0 if all(r["removed"] for r in results) else 1), {"uninstall": results}
+    if args.command == "rehash":
+        if args.full: os.environ["PYENV_GUI_REHASH"] = "full"
+        result = await engine.async_rehash()
+        return (0 if result["ok"] else 1), {"rehash": result}
+    if args.command == "prune":
+        if not args.latest_patch and args.unused_days is None:
+            return 2, {"error": "choose a policy: --latest-patch and/or --unused-days N"}
+        preview = engine.prune_candidates(keep_latest_patch=args.latest_patch, unused_days=args.unused_days)
+        if not args.apply: return 0, {"prune": preview, "applied": False}
+        results = await engine.async_uninstall_many([c["version"] for c in preview["candidates"]], on_message=log)
+        return (0 if all(r["removed"] for r in results) else 1), {"prune": preview, "applied": True, "uninstall": results}
+    if args.command == "roots":
+        try:
+            for root in args.add: roots.add(root)
+        except ValueError as e: return 2, {"error": str(e)}
+        for root in args.remove: roots.remove(root)
+        results = await asyncio.to_thread(roots.scan, args.force)
+        duplicates = await asyncio.to_thread(roots.duplicates, results)
+        result = {"roots": [{"root": root, "versions": len(r["records"] or {}), "error": r["error"], "seconds": r["seconds"],
+                             "total_bytes": sum(record["bytes"] or 0 for record in (r["records"] or {}).values()),
+                             "cache_dir": roots.engine(root).cache_dir} for root, r in results.items()],
+                  "installed": roots.merged(results, duplicates), "duplicates": duplicates}
+        if args.link_duplicates: result["linked"] = await asyncio.to_thread(roots.link_duplicates, duplicates, log)
+        return (0 if not any(r["error"] for r in result["roots"]) else 1), result
+    if args.command in ("global", "local"):
+        code, output = await engine.async_run(["pyenv", args.command, *args.versions], on_line=log)
+        return (0 if code == 0 else 1), {args.command: args.versions, "return_code": code, "output": output,
+                                          "current": await engine.async_current_versions()}
+    return 2, {"error": f"unknown command {args.command}"}
+
+def build_arg_parser():
+    import argparse
+    parser = argparse.ArgumentParser(prog="pyenv_tkinter_gui.py --headless", description="Headless pyenv manager with JSON output.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="stream command output to stderr")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace-event JSON file of the run")
+    parser.add_argument("--root", metavar="PATH", help="PYENV_ROOT to act on instead of the detected one")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="installed (and optionally available) versions")
+    list_parser.add_argument("--available", action="store_true", help="include the install --list catalogue")
+    list_parser.add_argument("--filter", help="filter query for --available, same syntax as the GUI filter")
+    subparsers.add_parser("current", help="global/local/shell versions")
+    scan_parser = subparsers.add_parser("scan", help="disk usage and interpreter health of installed versions")
+    scan_parser.add_argument("--force", action="store_true", help="ignore cached results and rescan every version")
+    install_parser = subparsers.add_parser("install", help="install one or more versions concurrently")
+    install_parser.add_argument("versions", nargs="+")
+    install_parser.add_argument("-j", "--jobs", type=int, help="maximum concurrent builds")
+    install_parser.add_argument("--profile", choices=list(BUILD_PROFILES), help="build preset (default: $PYENV_GUI_BUILD_PROFILE or default)")
+    install_parser.add_argument("--benchmark", action="store_true", help="micro-benchmark each new build against other builds of its series")
+    benchmark_parser = subparsers.add_parser("benchmark", help="micro-benchmark installed versions against other builds of their series")
+    benchmark_parser.add_argument("versions", nargs="+")
+    benchmark_parser.add_argument("--profile", choices=list(BUILD_PROFILES), help="the preset the versions were built with, to label the results")
+    benchmark_parser.add_argument("--repeats", type=int, default=5, help="runs per workload; the best is kept (default 5)")
+    uninstall_parser = subparsers.add_parser("uninstall", help="uninstall one or more versions concurrently")
+    uninstall_parser.add_argument("versions", nargs="+")
+    subparsers.add_parser("rehash", help="update the shims (incrementally when the manifest allows)").add_argument(
+        "--full", action="store_true", help="run a full `pyenv rehash` and rebuild the manifest")
+    prune_parser = subparsers.add_parser("prune", help="preview (or --apply) a prune policy")
+    prune_parser.add_argument("--latest-patch", action="store_true", help="keep only the latest patch release of each minor series")
+    prune_parser.add_argument("--unused-days", type=int, metavar="N", help="remove versions whose interpreter was not run for N days")
+    prune_parser.add_argument("--apply", action="store_true", help="uninstall the candidates instead of only listing them")
+    roots_parser = subparsers.add_parser("roots", help="installed versions of every registered PYENV_ROOT, scanned concurrently")
+    roots_parser.add_argument("--add", action="append", default=[], metavar="PATH", help="register a root (remembered for later runs)")
+    roots_parser.add_argument("--remove", action="append", default=[], metavar="PATH", help="forget a registered root")
+    roots_parser.add_argument("--force", action="store_true", help="ignore cached results and rescan every version")
+    roots_parser.add_argument("--link-duplicates", action="store_true", help="hardlink identical builds found in several roots")
+    for name in ("global", "local"):
+        subparsers.add_parser(name, help=f"set the {name} version(s)").add_argument("versions", nargs="+")
+    return parser
+
+def main(argv=None):
+    import asyncio
+    args = build_arg_parser().parse_args(argv)
+    if args.trace: tracer.enabled = True
+    exit_code, result = asyncio.run(run_headless(args))
+    if args.trace or tracer.export_path: tracer.export(args.trace or tracer.export_path)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
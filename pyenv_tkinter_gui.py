@@ -1,19 +1,156 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, filedialog
-import subprocess
+import time
+_SCRIPT_START = time.perf_counter() # Taken before the imports below; --startup-profile measures from here
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext, filedialog, font as tkfont
+except ImportError: # Hosts without Tk can still run --headless
+    tk = None
 import threading
 import queue
 import os
+import re
 import sys
-import shutil
-import re # For parsing progress if we attempt it later
+import traceback
+from pyenv_engine import (PyenvEngine, VersionsDirWatcher, CatalogueIndex, catalogue_records, RefreshCoordinator, SessionCache, LogIndex, tracer,
+                          BUILD_PROFILES, available_cpus, PyenvRoots,
+                          version_sort_key, parse_install_list, user_cache_dir, open_log_file, format_duration,
+                          main as engine_main)
+
+class WakeupQueue(queue.Queue):
+    # queue.Queue that also makes a pipe readable when something is put, so the Tk loop can sleep until
+    # there is work (see PyenvGUI._start_queue_processing). At most one byte is outstanding at a time.
+    def __init__(self):
+        super().__init__()
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False); os.set_blocking(self.write_fd, False)
+        self._signalled = False
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if not self._signalled:
+            self._signalled = True
+            try: os.write(self.write_fd, b"\0")
+            except (BlockingIOError, OSError): pass
+
+    def clear_wakeup(self):
+        # Must run before the consumer drains the queue, so a put racing with the drain re-signals
+        self._signalled = False
+        try:
+            while os.read(self.read_fd, 4096): pass
+        except (BlockingIOError, OSError): pass
+
+class StartupProfile:
+    # --startup-profile: milestones from process start (interpreter start-up included where /proc tells us
+    # when the process was created, to ~10 ms) to the first interactive frame, printed to stderr by report().
+    # Milestones reached after the report (background probe, fresh data) are printed as they happen.
+    def __init__(self, script_start, enabled=True):
+        self.enabled, self.origin = enabled, script_start
+        self.marks, self.reported = [], False
+        self._lock = threading.Lock()
+        age = self.process_age() if enabled else None
+        if age is not None:
+            self.origin -= max(0.0, age - (time.perf_counter() - script_start))
+            self.marks.append(("interpreter start-up", script_start))
+
+    @staticmethod
+    def process_age(): # Seconds since this process was created, or None off Linux
+        try:
+            with open("/proc/self/stat") as f: start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as f: uptime = float(f.read().split()[0])
+            return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    def mark(self, name, once=False):
+        if not self.enabled: return
+        with self._lock:
+            if once and any(n == name for n, _ in self.marks): return
+            previous = self.marks[-1][1] if self.marks else self.origin
+            self.marks.append((name, time.perf_counter()))
+            if self.reported: self._write(name, self.marks[-1][1], previous)
+
+    def _write(self, name, at, previous):
+        sys.stderr.write(f"  {name:<28} {(at - self.origin) * 1000:8.1f} ms  (+{(at - previous) * 1000:.1f})\n")
+
+    def report(self):
+        if not self.enabled: return
+        with self._lock:
+            if self.reported: return
+            self.reported = True
+            sys.stderr.write("Startup profile (since process start):\n")
+            previous = self.origin
+            for name, at in self.marks:
+                self._write(name, at, previous); previous = at
+            sys.stderr.flush()
+
+class StallMonitor:
+    # Main-loop stall tracing while the tracer is on: a Tk heartbeat that should fire every `interval`, and a
+    # watchdog thread that grabs the main thread's stack once a beat is overdue by the threshold. A late beat
+    # becomes a "main-loop stall" span covering the time the loop was blocked, with that stack attached.
+    # Each beat also samples the GUI queue depth. PYENV_GUI_STALL_MS sets the threshold (default 100).
+    STACK_FRAMES = 8
+
+    def __init__(self, master, gui_queue, threshold_ms=None):
+        if threshold_ms is None:
+            try: threshold_ms = float(os.environ.get("PYENV_GUI_STALL_MS", 100))
+            except ValueError: threshold_ms = 100.0
+        self.master, self.gui_queue = master, gui_queue
+        self.threshold = max(1.0, threshold_ms) / 1000
+        self.interval = min(0.05, self.threshold / 2)
+        self.main_thread_id = threading.get_ident()
+        self.stalls, self.worst_stall = 0, 0.0
+        self.running = False
+        self._due = None
+        self._stack = None # (due, formatted stack) taken by the watchdog for the beat that is late
+        self._after_id = None
+        self._stopped = threading.Event() # One per run, so a quick stop/start never leaves two watchdogs going
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self._stopped = threading.Event()
+        self._due = time.perf_counter() + self.interval
+        self._after_id = self.master.after(int(self.interval * 1000), self._beat)
+        threading.Thread(target=self._watch, args=(self._stopped,), name="stall-watchdog", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self._stopped.set()
+        if self._after_id is not None:
+            try: self.master.after_cancel(self._after_id)
+            except tk.TclError: pass
+            self._after_id = None
+
+    def _beat(self):
+        now, due = time.perf_counter(), self._due
+        late = now - due
+        if late > self.threshold:
+            self.stalls += 1; self.worst_stall = max(self.worst_stall, late)
+            stack = self._stack[1] if self._stack and self._stack[0] == due else "(not captured)"
+            tracer.complete("main-loop stall", due, now, "gui", {"late_ms": round(late * 1000, 1), "stack": stack})
+        tracer.counter("gui_queue depth", self.gui_queue.qsize())
+        if not self.running: return
+        self._due = time.perf_counter() + self.interval
+        self._after_id = self.master.after(int(self.interval * 1000), self._beat)
+
+    def _watch(self, stopped):
+        while not stopped.wait(self.threshold / 2):
+            due = self._due
+            if due is None or time.perf_counter() - due <= self.threshold or (self._stack and self._stack[0] == due): continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is not None:
+                self._stack = (due, "".join(traceback.format_list(traceback.extract_stack(frame)[-self.STACK_FRAMES:])))
 
 class PyenvGUI:
-    def __init__(self, master):
+    def __init__(self, master, startup_profile=None):
         self.master = master
         self.is_successfully_initialized = False
+        self.startup_profile = startup_profile or StartupProfile(_SCRIPT_START, enabled=False)
 
-        self.gui_queue = queue.Queue()
+        self.gui_queue = WakeupQueue()
+        self._queue_wakeup_mode = "poll" # Becomes "event" if Tk can watch the queue's pipe
+        self._queue_poll_interval_ms = self.QUEUE_POLL_MIN_MS
+        self._open_console_log() # Full console history lives here; the Text widget only keeps the tail
         self.animating = False # For text-based status animation
         self.animation_index = 0
         self.ANIMATION_CHARS = ["⢿", "⣻", "⣽", "⣾", "⣷", "⣯", "⣟", "⡿"]
@@ -36,17 +173,46 @@ class PyenvGUI:
         self.style.configure("Small.TLabel", font=('Helvetica', 9))
         self.style.configure("Error.TLabel", foreground="red", font=('Helvetica', 9))
 
-        # Determine pyenv paths
-        self.pyenv_executable_path = self._determine_pyenv_executable_path()
-        self.pyenv_root_path = self._determine_pyenv_root_path()
+        # Determine pyenv paths; everything pyenv-related lives in the engine, the GUI only renders it
+        self.engine = PyenvEngine()
+        self.pyenv_executable_path = self.engine.pyenv_executable_path
+        self.pyenv_root_path = self.engine.pyenv_root_path
+        self.install_scheduler = self.engine.install_scheduler
+        self.engine.add_job_listener(self._on_install_job_event)
+        # Other registered PYENV_ROOTs; the main window shows one of them at a time (the target of installs and sets)
+        self.roots = PyenvRoots(self.engine)
+        self._job_progress_ticking = False
+        # Every data reload goes through here: one flight per source, bursts merged, stale fetches cancelled
+        self.refresh = RefreshCoordinator(debounce_seconds=self.REFRESH_DEBOUNCE_SECONDS)
+        self.refresh.register("installed", self._fetch_installed_versions, self._deliver_installed_versions)
+        self.refresh.register("current", self._fetch_current_versions, self._deliver_current_versions)
+        self.refresh.register("available", self._fetch_available_versions, self._deliver_available_versions)
+        self.refresh.register("scan", self._fetch_installed_details, self._deliver_installed_details)
+        self._shown_catalogue_key = None
+        self.session_cache = SessionCache(self.pyenv_root_path, self.engine.cache_dir)
+        self._pyenv_broken = False
+        self.startup_profile.mark("engine")
 
-        if not self.pyenv_executable_path or not self.is_pyenv_installed():
-            # Error message box is shown by is_pyenv_installed or the check above
+        # `pyenv --version` (and every fetch) waits until the window is up; see _finish_startup
+        if not self.pyenv_executable_path or not os.access(self.pyenv_executable_path, os.X_OK):
             return
 
         master.title("Pyenv Manager")
         master.geometry("950x750") # Slightly larger default size
 
+        self.stall_monitor = StallMonitor(master, self.gui_queue)
+        self.tracing_var = tk.BooleanVar(value=tracer.enabled)
+        menubar = tk.Menu(master)
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        tools_menu.add_checkbutton(label="Enable Tracing", variable=self.tracing_var, command=self._on_tracing_toggled)
+        tools_menu.add_command(label="Performance Stats...", command=self.show_performance_panel)
+        tools_menu.add_command(label="Export Trace...", command=self.export_trace)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Open Log...", command=self.browse_logs)
+        tools_menu.add_command(label="All Roots...", command=self.show_roots_panel)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        master.config(menu=menubar)
+
         # --- Main Application Frame ---
         main_app_frame = ttk.Frame(master, padding=(10, 10, 10, 10))
         main_app_frame.pack(fill=tk.BOTH, expand=True)
@@ -55,6 +221,14 @@ class PyenvGUI:
         self.top_bar_frame = ttk.Frame(main_app_frame, padding=(0, 0, 0, 10))
         self.top_bar_frame.pack(fill=tk.X)
 
+        root_frame = ttk.Frame(self.top_bar_frame, padding=0)
+        root_frame.pack(side=tk.LEFT, padx=(0,10))
+        ttk.Label(root_frame, text="Root:", style="Small.TLabel").pack(side=tk.LEFT, padx=(0,5))
+        self.root_combobox = ttk.Combobox(root_frame, state="readonly", width=24)
+        self.root_combobox.pack(side=tk.LEFT)
+        self.root_combobox.bind("<<ComboboxSelected>>", self._on_root_selected)
+        self._update_root_choices()
+
         self.current_versions_frame = ttk.Frame(self.top_bar_frame)
         self.current_versions_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
@@ -62,6 +236,8 @@ class PyenvGUI:
         self.current_global_label.pack(side=tk.LEFT, padx=(0,10))
         self.current_local_label = ttk.Label(self.current_versions_frame, text="Local: N/A", style="Small.TLabel")
         self.current_local_label.pack(side=tk.LEFT, padx=(0,10))
+        self.current_shell_label = ttk.Label(self.current_versions_frame, text="Shell: N/A", style="Small.TLabel")
+        self.current_shell_label.pack(side=tk.LEFT, padx=(0,10))
 
         self.refresh_all_button = ttk.Button(self.top_bar_frame, text="Refresh All", command=self.refresh_all_data, style="Accent.TButton")
         self.refresh_all_button.pack(side=tk.RIGHT, padx=(5,0))
@@ -85,14 +261,32 @@ class PyenvGUI:
         self.paned_window.add(self.versions_pane, weight=2) # Give it a weight
 
         # Installed versions
-        installed_frame = ttk.LabelFrame(self.versions_pane, text="Installed Versions")
+        installed_frame = self.installed_frame = ttk.LabelFrame(self.versions_pane, text="Installed Versions")
         installed_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        installed_lists_frame = ttk.Frame(installed_frame, padding=0)
+        installed_lists_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.installed_versions_list = tk.Listbox(installed_frame, height=12, exportselection=False, relief=tk.SOLID, borderwidth=1)
+        self.installed_versions_list = tk.Listbox(installed_lists_frame, height=12, width=18, exportselection=False, relief=tk.SOLID, borderwidth=1, selectmode=tk.EXTENDED)
         self.installed_versions_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5,0), pady=5)
-        installed_scrollbar = ttk.Scrollbar(installed_frame, orient=tk.VERTICAL, command=self.installed_versions_list.yview)
-        installed_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0,5), pady=5)
+        installed_scrollbar = ttk.Scrollbar(installed_lists_frame, orient=tk.VERTICAL, command=self.installed_versions_list.yview)
+        installed_scrollbar.pack(side=tk.LEFT, fill=tk.Y, pady=5)
         self.installed_versions_list.config(yscrollcommand=installed_scrollbar.set)
+        self.installed_versions_list.bind("<<ListboxSelect>>", self._on_installed_list_select)
+
+        # Disk usage and health per version, filled in by the background scan; click a heading to sort
+        self.installed_details_tree = ttk.Treeview(installed_lists_frame, columns=self.INSTALLED_DETAIL_COLUMNS, show="headings", height=12, selectmode=tk.EXTENDED)
+        for column, heading, width in (("version", "Version", 110), ("size", "Size", 75), ("files", "Files", 60),
+                                       ("python", "Python", 70), ("ssl", "ssl", 40), ("sqlite3", "sqlite3", 55)):
+            self.installed_details_tree.heading(column, text=heading, command=lambda c=column: self._sort_installed_details(c, toggle=True))
+            self.installed_details_tree.column(column, width=width, anchor=tk.W if column == "version" else tk.E, stretch=column == "version")
+        self.installed_details_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5,0), pady=5)
+        details_scrollbar = ttk.Scrollbar(installed_lists_frame, orient=tk.VERTICAL, command=self.installed_details_tree.yview)
+        details_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0,5), pady=5)
+        self.installed_details_tree.config(yscrollcommand=details_scrollbar.set)
+        self.installed_details_tree.bind("<<TreeviewSelect>>", self._on_installed_details_select)
+        self._scan_records = {} # version -> InstalledVersionScanner record
+        self._installed_details_sort = ("size", True) # (column, descending)
+        self._scan_force = False
         
         installed_actions_frame = ttk.Frame(installed_frame, padding=(5,5,5,0))
         installed_actions_frame.pack(fill=tk.X)
@@ -102,6 +296,12 @@ class PyenvGUI:
         self.set_global_button.pack(side=tk.LEFT, padx=3)
         self.set_local_button = ttk.Button(installed_actions_frame, text="Set Local", command=self.set_local_selected_version)
         self.set_local_button.pack(side=tk.LEFT, padx=3)
+        self.rescan_button = ttk.Button(installed_actions_frame, text="Rescan Sizes", command=lambda: self.load_installed_details(force=True))
+        self.rescan_button.pack(side=tk.RIGHT)
+        self.prune_button = ttk.Button(installed_actions_frame, text="Prune...", command=self.show_prune_dialog)
+        self.prune_button.pack(side=tk.RIGHT, padx=3)
+        ttk.Button(installed_actions_frame, text="All Roots...", command=self.show_roots_panel).pack(side=tk.RIGHT, padx=3)
+        self._bulk_uninstall_running = False
 
         # Available versions
         available_frame = ttk.LabelFrame(self.versions_pane, text="Available for Installation")
@@ -111,25 +311,64 @@ class PyenvGUI:
         filter_controls_frame.pack(fill=tk.X)
         ttk.Label(filter_controls_frame, text="Filter:", style="Small.TLabel").pack(side=tk.LEFT, padx=(0,5), pady=(0,5))
         self.filter_var = tk.StringVar()
-        self.filter_var.trace_add("write", self.filter_available_versions)
+        self.filter_var.trace_add("write", self._on_filter_changed)
         filter_entry = ttk.Entry(filter_controls_frame) # Removed textvariable for now, will set it after style
         filter_entry.configure(textvariable=self.filter_var) # Set after potential style applied by theme
         filter_entry.pack(fill=tk.X, expand=True, side=tk.LEFT, pady=(0,5))
 
-        self.available_versions_list = tk.Listbox(available_frame, height=15, exportselection=False, relief=tk.SOLID, borderwidth=1)
-        self.available_versions_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5,0), pady=5)
-        available_scrollbar = ttk.Scrollbar(available_frame, orient=tk.VERTICAL, command=self.available_versions_list.yview)
+        # Grouped by implementation and series; a group's rows are only inserted once it is expanded
+        self.available_versions_tree = ttk.Treeview(available_frame, show="tree", height=15, selectmode=tk.EXTENDED)
+        self.available_versions_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5,0), pady=5)
+        available_scrollbar = ttk.Scrollbar(available_frame, orient=tk.VERTICAL, command=self.available_versions_tree.yview)
         available_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0,5), pady=5)
-        self.available_versions_list.config(yscrollcommand=available_scrollbar.set)
+        self.available_versions_tree.config(yscrollcommand=available_scrollbar.set)
+        self.available_versions_tree.tag_configure("prerelease", foreground="gray40")
+        self.available_versions_tree.bind("<<TreeviewOpen>>", self._on_available_tree_open)
+        self.available_versions_tree.bind("<<TreeviewClose>>", self._on_available_tree_close)
         
         self.install_button = ttk.Button(available_frame, text="Install Selected", command=self.install_selected_version, style="Accent.TButton")
         self.install_button.pack(fill=tk.X, padx=5, pady=(5,5))
 
         self._all_available_versions = []
+        self._available_index = CatalogueIndex([])
+        self._shown_available_indices = [] # Catalogue indices currently grouped in available_versions_tree, in order
+        self._available_groups = {} # implementation -> {series -> catalogue indices} for the shown matches
+        self._available_pending = set() # Group nodes whose children are not inserted yet
+        self._available_open_nodes = set() # Group nodes the user expanded; kept open across filter changes
+        self._filter_after_id = None
+
+        # Right Pane: Build Jobs above the Output Console
+        self.right_pane = ttk.Frame(self.paned_window, padding=0)
+        self.paned_window.add(self.right_pane, weight=3) # Give it more weight
+
+        self.jobs_frame = ttk.LabelFrame(self.right_pane, text="Build Jobs")
+        self.jobs_frame.pack(fill=tk.X, pady=(0, 10))
+        jobs_controls_frame = ttk.Frame(self.jobs_frame, padding=(5,0,5,0))
+        jobs_controls_frame.pack(fill=tk.X)
+        ttk.Label(jobs_controls_frame, text="Parallel builds:", style="Small.TLabel").pack(side=tk.LEFT, padx=(0,5))
+        self.max_parallel_builds_var = tk.IntVar(value=self.install_scheduler.max_concurrent)
+        ttk.Spinbox(jobs_controls_frame, from_=1, to=available_cpus(), width=4, textvariable=self.max_parallel_builds_var,
+                    command=self._on_max_parallel_builds_changed).pack(side=tk.LEFT)
+        ttk.Label(jobs_controls_frame, text="Profile:", style="Small.TLabel").pack(side=tk.LEFT, padx=(10,5))
+        self.build_profile_var = tk.StringVar(value=self.engine.build_profile)
+        profile_combobox = ttk.Combobox(jobs_controls_frame, textvariable=self.build_profile_var, values=list(BUILD_PROFILES), state="readonly", width=11)
+        profile_combobox.pack(side=tk.LEFT)
+        profile_combobox.bind("<<ComboboxSelected>>", self._on_build_profile_changed)
+        self.benchmark_after_install_var = tk.BooleanVar(value=self.engine.post_install_benchmark)
+        ttk.Checkbutton(jobs_controls_frame, text="Benchmark", variable=self.benchmark_after_install_var).pack(side=tk.LEFT, padx=(5,0))
+        self._benchmark_job_ids = set() # Jobs to micro-benchmark once they succeed
+        ttk.Button(jobs_controls_frame, text="Clear Finished", command=self.clear_finished_jobs).pack(side=tk.RIGHT)
+        ttk.Button(jobs_controls_frame, text="Artifact Cache", command=self.show_artifact_cache_panel).pack(side=tk.RIGHT, padx=(0,5))
+        self.jobs_rows_frame = ttk.Frame(self.jobs_frame, padding=(5,0,5,0))
+        self.jobs_rows_frame.pack(fill=tk.X)
+        self._job_rows = {} # job.id -> dict of that job's row widgets
 
-        # Right Pane: Output Console
-        self.output_console_frame = ttk.LabelFrame(self.paned_window, text="Output Console")
-        self.paned_window.add(self.output_console_frame, weight=3) # Give it more weight
+        self.output_console_frame = ttk.LabelFrame(self.right_pane, text="Output Console")
+        self.output_console_frame.pack(fill=tk.BOTH, expand=True)
+        console_controls_frame = ttk.Frame(self.output_console_frame, padding=(5,0,5,0))
+        console_controls_frame.pack(fill=tk.X)
+        ttk.Button(console_controls_frame, text="Open Log...", command=self.browse_logs).pack(side=tk.RIGHT)
+        ttk.Button(console_controls_frame, text="Full Console Log", command=self.show_console_log).pack(side=tk.RIGHT, padx=(0,5))
 
         self.output_text = scrolledtext.ScrolledText(self.output_console_frame, wrap=tk.WORD, height=10, relief=tk.SOLID, borderwidth=1, state=tk.DISABLED,
                                                      font=('Monaco', 10) if sys.platform == 'darwin' else ('Consolas', 10)) # Monospaced font
@@ -143,10 +382,43 @@ class PyenvGUI:
              self.style.map("Accent.TButton", background=[('active', '#005fcc'), ('!disabled', '#007bff')], foreground=[('!disabled', 'white')])
 
 
-        self.refresh_all_data()
-        self.process_gui_queue()
+        self.startup_profile.mark("widgets")
+
+        self._paint_last_session()
+        self._start_queue_processing() # Drains the cached state right here, so the first frame already shows it
+        self.startup_profile.mark("last session painted")
+        self._startup_finished = False
+        self.versions_watcher = None
+        self.master.bind("<Map>", self._on_first_map, add="+")
         self.is_successfully_initialized = True
 
+    def _paint_last_session(self):
+        # Queues what the previous session showed plus the cached catalogue; fresh data replaces it once fetched
+        session = self.session_cache.load()
+        if "current" in session: self.gui_queue.put(("update_current_versions", session["current"]))
+        if "installed" in session: self.gui_queue.put(("update_installed_list", session["installed"]))
+        scan_records = self.engine.version_scanner.cached()
+        if scan_records: self.gui_queue.put(("installed_scan_done", (self.pyenv_root_path, scan_records)))
+        cached_key, cached_lines = self.engine.cached_catalogue()
+        if cached_lines is not None:
+            self._shown_catalogue_key = cached_key
+            self.gui_queue.put(("update_available_list", cached_lines))
+
+    def _on_first_map(self, event):
+        if event.widget is self.master and not self._startup_finished:
+            self.master.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        if self._startup_finished: return
+        self._startup_finished = True
+        self.master.update_idletasks() # Let the pending redraws land first
+        self.startup_profile.mark("first interactive frame")
+        self.startup_profile.report()
+        if tracer.enabled: self.stall_monitor.start()
+        threading.Thread(target=lambda: self.gui_queue.put(("pyenv_probe_done", self.engine.probe())), daemon=True).start()
+        self.refresh_all_data()
+        self._watch_versions_dir()
+
 
     # --- Progress Bar Control Methods ---
     def start_progress_indeterminate(self):
@@ -161,58 +433,6 @@ class PyenvGUI:
             self.progress_bar.pack_forget()
             self.status_label.pack(side=tk.RIGHT, padx=5) # Re-show text status
 
-    # ... (Methods _determine_pyenv_executable_path, _determine_pyenv_root_path, _get_pyenv_env, is_pyenv_installed
-    #      _get_command_with_absolute_path, start_animation, stop_animation, _animate, _run_pyenv_command_threaded
-    #      _execute_command_worker, _fetch_data_worker, load_current_versions, process_gui_queue, set_ui_state,
-    #      _start_fetch_op, _end_fetch_op, load_installed_versions, load_available_versions, refresh_all_data,
-    #      filter_available_versions, and action handlers like install_selected_version etc.
-    #      should be taken from your last working version, with modifications to _execute_command_worker
-    #      for progress bar calls)
-
-    def _determine_pyenv_executable_path(self):
-        pyenv_exe = shutil.which("pyenv")
-        return pyenv_exe
-
-    def _determine_pyenv_root_path(self):
-        pyenv_root_env = os.environ.get('PYENV_ROOT')
-        if self.pyenv_executable_path:
-            try:
-                proc = subprocess.run([self.pyenv_executable_path, "root"],
-                                      capture_output=True, text=True, check=True, timeout=5)
-                pyenv_root_from_cmd = proc.stdout.strip()
-                if pyenv_root_from_cmd: return pyenv_root_from_cmd
-            except Exception: pass
-        if pyenv_root_env: return pyenv_root_env
-        return os.path.expanduser("~/.pyenv")
-
-    def _get_pyenv_env(self):
-        shims_path = os.path.join(self.pyenv_root_path, "shims")
-        current_env = os.environ.copy()
-        current_env["PATH"] = shims_path + os.pathsep + current_env.get("PATH", "")
-        current_env["PYENV_ROOT"] = self.pyenv_root_path
-        if "PYENV_SHELL" not in current_env:
-            current_env["PYENV_SHELL"] = os.path.basename(os.environ.get("SHELL", "bash"))
-        return current_env
-
-    def is_pyenv_installed(self):
-        if not self.pyenv_executable_path: return False
-        pyenv_env = self._get_pyenv_env()
-        if not os.path.exists(self.pyenv_executable_path) or not os.access(self.pyenv_executable_path, os.X_OK): return False
-        try:
-            command = [self.pyenv_executable_path, "--version"]
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       text=True, universal_newlines=True, env=pyenv_env)
-            stdout, _ = process.communicate(timeout=10)
-            return process.returncode == 0 and "pyenv" in stdout.lower()
-        except Exception:
-            return False
-
-    def _get_command_with_absolute_path(self, command_args):
-        if command_args and command_args[0] == "pyenv":
-            if not self.pyenv_executable_path: raise ValueError("pyenv_executable_path is not set")
-            return [self.pyenv_executable_path] + command_args[1:]
-        return command_args
-
     def start_animation(self): # Text spinner
         if not self.animating:
             self.animating = True; self.animation_index = 0
@@ -250,9 +470,7 @@ class PyenvGUI:
         # Determine if this is an install command for progress bar
         is_install_command = "install" in final_command_args and "--list" not in final_command_args
         
-        if not is_install_command: # Only use text spinner if not an install command
-            self.start_animation()
-        self.set_ui_state(tk.DISABLED)
+        self._start_fetch_op() # Spinner and UI lock until the worker's fetch_op_done
         
         thread = threading.Thread(target=self._execute_command_worker,
                                   args=(final_command_args, success_message, error_message, on_complete_action, 
@@ -263,22 +481,23 @@ class PyenvGUI:
 
     def _execute_command_worker(self, command_args, success_msg, error_msg, on_complete_action, 
                                 data_for_complete_action=None, is_install_command=False): # Added is_install_command
-        pyenv_env = self._get_pyenv_env()
-        full_command = self._get_command_with_absolute_path(command_args)
+        full_command = self.engine.command(command_args)
 
         if is_install_command:
             self.gui_queue.put(("progress_start_indeterminate", None))
         
+        log_path = log_file = None # Each command's output also goes to its own log, which the console trims and Refresh All wipes
+        try:
+            log_path, log_file = open_log_file(self.engine.log_dir, "command", command_args[1] if len(command_args) > 1 else None)
+            log_file.write(f"$ {' '.join(full_command)}\n")
+        except OSError: pass
+        def on_line(line):
+            if log_file: log_file.write(line)
+            self.gui_queue.put(("append_output", line))
         try:
             self.gui_queue.put(("append_output", f"Executing: {' '.join(full_command)}\n"))
-            process = subprocess.Popen(full_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                       text=True, universal_newlines=True, bufsize=1, env=pyenv_env)
-            for line in iter(process.stdout.readline, ''):
-                if not line and process.poll() is not None: break
-                self.gui_queue.put(("append_output", line))
-                # Later: Add regex parsing here for install progress percentage and send to queue
-            process.stdout.close()
-            return_code = process.wait()
+            return_code = self.engine.stream_command(command_args, on_line=on_line)
+            if log_file: log_file.write(f"\n[exit code {return_code}]\n")
             if return_code == 0:
                 if success_msg: self.gui_queue.put(("append_output", f"\n{success_msg}\n"))
                 if on_complete_action:
@@ -287,6 +506,7 @@ class PyenvGUI:
             else:
                 err_output = f"\nError: Command failed with code {return_code}.\n"
                 if error_msg: err_output += f"{error_msg}\n"
+                if log_path: err_output += f"Full output: {log_path}\n"
                 self.gui_queue.put(("append_output", err_output))
                 if on_complete_action:
                     payload = (data_for_complete_action, False) if data_for_complete_action is not None else False
@@ -296,93 +516,137 @@ class PyenvGUI:
         except Exception as e:
             self.gui_queue.put(("append_output", f"An unexpected error occurred executing {' '.join(full_command)}: {e}\n"))
         finally:
+            if log_file: log_file.close()
             if is_install_command:
                 self.gui_queue.put(("progress_stop", None))
+            self.gui_queue.put(("fetch_op_done", None))
             self.gui_queue.put(("task_done", None)) # General task cleanup signal
 
-    def _fetch_data_worker(self, command_args, queue_message_type):
-        pyenv_env = self._get_pyenv_env()
-        full_command = self._get_command_with_absolute_path(command_args)
-        try:
-            self.gui_queue.put(("append_output", f"Fetching: {' '.join(full_command)}\n"))
-            process = subprocess.Popen(full_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       text=True, universal_newlines=True, env=pyenv_env)
-            stdout, stderr = process.communicate(timeout=60)
-            if process.returncode == 0:
-                lines = stdout.strip().split('\n')
-                if queue_message_type == "update_available_list": # Debug output for GUI console
-                    self.gui_queue.put(("append_output", f"DEBUG (GUI): `install --list` raw lines received: {len(lines)}\n"))
-                    # if lines: # Only show if there are lines, to reduce noise if it's empty
-                    #     self.gui_queue.put(("append_output", f"DEBUG (GUI): First 10 raw lines from `install --list`:\n{chr(10).join(lines[:10])}\n"))
-                if queue_message_type == "update_installed_list":
-                    cleaned_lines = [line.replace("*", "").replace(">", "").strip().split(" ")[0] for line in lines if line.strip()]
-                    self._last_installed_versions_data = cleaned_lines
-                    self.gui_queue.put((queue_message_type, cleaned_lines))
-                else:
-                    self.gui_queue.put((queue_message_type, lines))
-            else:
-                self.gui_queue.put(("append_output", f"Error fetching data with {' '.join(full_command)} (Code: {process.returncode}):\nSTDERR: {stderr}\nSTDOUT: {stdout}\n"))
-                self.gui_queue.put((queue_message_type, []))
-        except Exception as e:
-            self.gui_queue.put(("append_output", f"Error during data fetch ({' '.join(full_command)}): {e}\n"))
-            self.gui_queue.put((queue_message_type, []))
-        finally:
-            self.gui_queue.put(("fetch_op_done", queue_message_type))
-
     def load_current_versions(self):
-        self._start_fetch_op()
-        pyenv_env = self._get_pyenv_env()
-        pyenv_exe = self.pyenv_executable_path
-        if not pyenv_exe:
-            self.gui_queue.put(("append_output", "Error: Pyenv executable path not determined for load_current_versions.\n"))
-            self.gui_queue.put(("fetch_op_done", "update_current_versions"))
-            return
-        def worker():
-            versions = {}
-            try:
-                cmd_global = [pyenv_exe, "global"]; global_ver_proc = subprocess.run(cmd_global, capture_output=True, text=True, check=False, env=pyenv_env, timeout=5)
-                versions['global'] = global_ver_proc.stdout.strip() if global_ver_proc.returncode == 0 and global_ver_proc.stdout.strip() else ("N/A (or system)" if global_ver_proc.stdout.strip() != "system" else "system")
-                cmd_local = [pyenv_exe, "local"]; local_ver_proc = subprocess.run(cmd_local, capture_output=True, text=True, check=False, env=pyenv_env, timeout=5)
-                versions['local'] = local_ver_proc.stdout.strip() if local_ver_proc.returncode == 0 and local_ver_proc.stdout.strip() else "N/A"
-                self.gui_queue.put(("update_current_versions", versions))
+        self.refresh.request("current")
+
+    def _fetch_current_versions(self, flight): # Refresh worker thread
+        # The in-process resolver answers directly; the pyenv subprocesses ("subprocess"/"verify" modes,
+        # or as a fallback) lock the UI while they run
+        mode = self.engine.version_resolver_mode
+        if mode == "native":
+            try: return self.engine.current_versions_native()
             except Exception as e:
-                self.gui_queue.put(("append_output", f"Error fetching current versions: {e}\n")); self.gui_queue.put(("update_current_versions", {'global': 'Error', 'local': 'Error'}))
-            finally: self.gui_queue.put(("fetch_op_done", "update_current_versions"))
-        threading.Thread(target=worker, daemon=True).start()
+                self.gui_queue.put(("append_output", f"In-process version resolution failed ({e}); falling back to pyenv.\n"))
+                mode = "subprocess"
+        self.gui_queue.put(("fetch_op_start", "update_current_versions"))
+        try: return self.engine.current_versions(mode, flight=flight)
+        finally: self.gui_queue.put(("fetch_op_done", "update_current_versions"))
+
+    def _deliver_current_versions(self, versions, error):
+        if error is not None:
+            self.gui_queue.put(("append_output", f"Error fetching current versions: {error}\n")); self.gui_queue.put(("update_current_versions", {'global': 'Error', 'local': 'Error'}))
+            return
+        for mismatch in versions.pop('mismatches', []):
+            self.gui_queue.put(("append_output", f"Version resolver mismatch for {mismatch}\n"))
+        self.gui_queue.put(("update_current_versions", versions))
+        self.session_cache.update(current=versions)
+        self.startup_profile.mark("current versions fetched", once=True)
+
+    QUEUE_TIME_BUDGET_SECONDS = 0.05 # Per wakeup; leftover messages are picked up on an immediate follow-up tick
+    OUTPUT_MAX_LINES = 5000 # The console keeps this many lines; everything goes to the on-disk log
+    CONSOLE_LOGS_KEPT = 20
+
+    def _open_console_log(self):
+        try:
+            self.console_log_path, self._console_log = open_log_file(os.path.join(user_cache_dir(), "logs"), "console", keep=self.CONSOLE_LOGS_KEPT)
+        except OSError:
+            self.console_log_path, self._console_log = None, None
+
+    def _flush_output(self, chunks):
+        # One insert per tick no matter how many append_output messages were drained
+        if not chunks: return
+        text = "".join(chunks); chunks.clear()
+        if self._console_log is not None:
+            try: self._console_log.write(text); self._console_log.flush()
+            except OSError: pass
+        if not self.output_text.winfo_exists(): return
+        if text.count("\n") > self.OUTPUT_MAX_LINES: # No point inserting lines that are trimmed straight away
+            text = "\n".join(text.split("\n")[-(self.OUTPUT_MAX_LINES + 1):])
+        with tracer.span("console insert", "gui", chars=len(text)):
+            self.output_text.config(state=tk.NORMAL)
+            self.output_text.insert(tk.END, text)
+            line_count = int(self.output_text.index("end-1c").split(".")[0])
+            if line_count > self.OUTPUT_MAX_LINES:
+                self.output_text.delete("1.0", f"{line_count - self.OUTPUT_MAX_LINES + 1}.0")
+                self.output_text.insert("1.0", f"[... earlier output trimmed; full log: {self.console_log_path or 'unavailable'}]\n")
+            self.output_text.see(tk.END); self.output_text.config(state=tk.DISABLED)
+
+    QUEUE_POLL_MIN_MS = 10 # Adaptive polling fallback: back off from this...
+    QUEUE_POLL_MAX_MS = 500 # ...to this while the queue stays idle
+
+    def _start_queue_processing(self):
+        # Prefer waking up only when a worker puts a message; Windows Tk (and some builds) lack file handlers
+        try:
+            self.master.tk.createfilehandler(self.gui_queue.read_fd, tk.READABLE, self._on_queue_wakeup)
+            self._queue_wakeup_mode = "event"
+        except (AttributeError, RuntimeError, tk.TclError):
+            self._queue_wakeup_mode = "poll"
+        self.process_gui_queue()
+
+    def _on_queue_wakeup(self, fd, mask):
+        self.gui_queue.clear_wakeup()
+        self.process_gui_queue()
+
+    def _schedule_queue_processing(self, processed_any, budget_exhausted): # processed_any: messages handled this tick
+        if budget_exhausted:
+            self.master.after(1, self.process_gui_queue)
+        elif self._queue_wakeup_mode == "poll":
+            self._queue_poll_interval_ms = self.QUEUE_POLL_MIN_MS if processed_any else min(self._queue_poll_interval_ms * 2, self.QUEUE_POLL_MAX_MS)
+            self.master.after(self._queue_poll_interval_ms, self.process_gui_queue)
+        # In "event" mode the next put() wakes us through the file handler
 
     def process_gui_queue(self):
+        output_chunks = []
+        tick_start = time.perf_counter()
+        deadline = time.monotonic() + self.QUEUE_TIME_BUDGET_SECONDS
+        budget_exhausted, processed = False, 0
+        if tracer.enabled: tracer.counter("gui_queue depth", self.gui_queue.qsize())
         try:
             while True:
                 if not self.master.winfo_exists(): return
+                if time.monotonic() > deadline:
+                    budget_exhausted = True; break
                 message_type, data = self.gui_queue.get_nowait()
+                processed += 1
 
                 if message_type == "append_output":
-                    if self.output_text.winfo_exists():
-                        self.output_text.config(state=tk.NORMAL); self.output_text.insert(tk.END, data); self.output_text.see(tk.END); self.output_text.config(state=tk.DISABLED)
-                
-                elif message_type == "update_installed_list":
+                    output_chunks.append(data); continue
+                self._flush_output(output_chunks) # Keep console output ordered relative to other messages
+
+                if message_type == "update_installed_list":
+                    self._last_installed_versions_data = list(data)
                     if self.installed_versions_list.winfo_exists():
-                        self.installed_versions_list.delete(0, tk.END)
-                        current_global = getattr(self, '_current_global_version_cache', '')
-                        current_local = getattr(self, '_current_local_version_cache', '')
-                        for version in data:
-                            prefix = ""
-                            if version == current_global: prefix += "*"
-                            if version == current_local: prefix += ">"
-                            self.installed_versions_list.insert(tk.END, f"{prefix}{' ' if prefix else ''}{version}")
+                        with tracer.span("installed listbox redraw", "gui", rows=len(data)):
+                            self.installed_versions_list.delete(0, tk.END)
+                            for version in data:
+                                self.installed_versions_list.insert(tk.END, self._format_installed_entry(version))
+
+                elif message_type == "installed_versions_delta":
+                    self._apply_installed_versions_delta(*data)
+                elif message_type == "installed_scan_result":
+                    root, record = data # Tagged with the scanned root: rows from a scan of the previous root are dropped
+                    if root == self.pyenv_root_path:
+                        self._scan_records[record["version"]] = record
+                        self._update_installed_details_row(record)
+                elif message_type == "installed_scan_done":
+                    root, records = data
+                    if root == self.pyenv_root_path:
+                        self._scan_records = dict(records)
+                        self._render_installed_details()
                 
                 elif message_type == "update_available_list":
-                    # self.gui_queue.put(("append_output", f"DEBUG (GUI): process_gui_queue processing 'update_available_list'. Raw data items: {len(data)}\n"))
-                    processed_versions = []
-                    for v_line in data:
-                        v_stripped = v_line.strip()
-                        if v_stripped and not v_stripped.lower().startswith("available versions:") and not v_stripped.startswith(("Fetching", "Latest", "Only", "Usage:", "==", "-")):
-                            if v_stripped and (v_stripped[0].isdigit() or any(v_stripped.startswith(p) for p in ["jython", "ironpython", "graalpython", "micropython", "pypy", "stackless", "anaconda", "miniconda", "miniforge", "mambaforge"])):
-                                processed_versions.append(v_stripped)
-                    self._all_available_versions = processed_versions
-                    # self.gui_queue.put(("append_output", f"DEBUG (GUI): process_gui_queue after filtering, {len(self._all_available_versions)} versions.\n"))
-                    # if self._all_available_versions: self.gui_queue.put(("append_output", f"DEBUG (GUI): First 5 processed available versions:\n{chr(10).join(self._all_available_versions[:5])}\n"))
-                    # else: self.gui_queue.put(("append_output", "DEBUG (GUI): No available versions found after filtering.\n"))
+                    with tracer.span("catalogue load", "gui", lines=len(data)):
+                        records = catalogue_records(parse_install_list(data))
+                        processed_versions = [record.name for record in records]
+                        self._all_available_versions = processed_versions
+                        self._available_index = CatalogueIndex(processed_versions, records)
+                    self._shown_available_indices = None # Indices refer to the old catalogue; force a full redraw
                     self.filter_available_versions()
                 
                 elif message_type == "update_current_versions":
@@ -390,6 +654,7 @@ class PyenvGUI:
                     self._current_local_version_cache = data.get('local', 'N/A')
                     if self.current_global_label.winfo_exists(): self.current_global_label.config(text=f"Global: {self._current_global_version_cache}")
                     if self.current_local_label.winfo_exists(): self.current_local_label.config(text=f"Local: {self._current_local_version_cache}")
+                    if self.current_shell_label.winfo_exists(): self.current_shell_label.config(text=f"Shell: {data.get('shell', 'N/A')}")
                     if hasattr(self, '_last_installed_versions_data') and self.installed_versions_list.winfo_exists():
                          self.gui_queue.put(("update_installed_list", self._last_installed_versions_data))
                 
@@ -404,8 +669,19 @@ class PyenvGUI:
                         self.progress_bar.pack_forget()
                         self.status_label.pack(side=tk.RIGHT, padx=5)
                 
+                elif message_type == "job_update": self._update_job_row(data)
+                elif message_type == "bulk_uninstall_complete": self._on_bulk_uninstall_complete(data)
                 elif message_type == "task_done": pass
+                elif message_type == "fetch_op_start": self._start_fetch_op()
+                elif message_type == "pyenv_probe_done":
+                    self.startup_profile.mark("pyenv probe")
+                    if not data:
+                        self._pyenv_broken = True
+                        self.gui_queue.put(("append_output", f"Error: `{self.pyenv_executable_path} --version` failed; pyenv does not seem to work.\n"))
+                        self.set_ui_state(tk.DISABLED)
+                        messagebox.showerror("pyenv Not Working", f"`{self.pyenv_executable_path} --version` failed.\nCheck your pyenv installation and restart.")
                 elif message_type == "fetch_op_done": self._end_fetch_op()
+                elif message_type == "root_switch_ready": self._apply_root_switch(*data)
                 
                 # Installation/Uninstallation/Set Version complete messages
                 elif message_type in ["installation_complete", "uninstallation_complete", "set_version_complete"]:
@@ -418,20 +694,61 @@ class PyenvGUI:
                         log_msg = f"{action_verb.capitalize()} of {item} {'successful' if success else 'failed'}.\n"
                     
                     self.gui_queue.put(("append_output", log_msg))
+                    # Several jobs finishing together collapse into one refresh per source
                     self.load_installed_versions(); self.load_current_versions()
-                    if message_type == "installation_complete" and success: # Refresh available if install was successful
+                    if message_type == "installation_complete" and success: # Cheap now: only rebuilt if definitions changed
                         self.load_available_versions()
 
 
         except queue.Empty: pass
         finally:
-            if self.master.winfo_exists(): self.master.after(100, self.process_gui_queue)
+            if self.master.winfo_exists():
+                self._flush_output(output_chunks)
+                self._schedule_queue_processing(processed > 0, budget_exhausted)
+                if processed and tracer.enabled:
+                    tracer.complete("gui_queue tick", tick_start, time.perf_counter(), "gui", {"messages": processed, "budget_exhausted": budget_exhausted})
+            elif self._queue_wakeup_mode == "event":
+                try: self.master.tk.deletefilehandler(self.gui_queue.read_fd)
+                except tk.TclError: pass
+
+    def _format_installed_entry(self, version):
+        prefix = ""
+        if version == getattr(self, '_current_global_version_cache', ''): prefix += "*"
+        if version == getattr(self, '_current_local_version_cache', ''): prefix += ">"
+        return f"{prefix}{' ' if prefix else ''}{version}"
+
+    def _on_versions_dir_change(self, added, removed, current): # Called from the watcher thread
+        self.gui_queue.put(("installed_versions_delta", (added, removed, current)))
+
+    def _apply_installed_versions_delta(self, added, removed, current):
+        listbox = self.installed_versions_list
+        if not listbox.winfo_exists(): return
+        shown = list(getattr(self, '_last_installed_versions_data', []))
+        # Listbox ignores insert/delete while disabled, and the watcher fires mid-install when the UI is locked
+        previous_state = listbox.cget("state")
+        listbox.config(state=tk.NORMAL)
+        for version in removed:
+            if version in shown:
+                index = shown.index(version)
+                shown.pop(index); listbox.delete(index)
+        order = {v: i for i, v in enumerate(current)}
+        for version in added:
+            if version in shown or version not in order: continue
+            index = sum(1 for v in shown if order.get(v, -1) < order[version])
+            shown.insert(index, version); listbox.insert(index, self._format_installed_entry(version))
+        listbox.config(state=previous_state)
+        self._last_installed_versions_data = shown
+        if shown != current: # Out of step with the scan (e.g. a missed event); redraw from scratch
+            self.gui_queue.put(("update_installed_list", current))
+        self.load_installed_details() # Only the added versions are measured; everything else comes from the scan cache
+        for version in added: self.gui_queue.put(("append_output", f"Detected new version: {version}\n"))
+        for version in removed: self.gui_queue.put(("append_output", f"Detected removed version: {version}\n"))
 
     def set_ui_state(self, state):
         widgets_to_toggle = [
             self.refresh_all_button, self.uninstall_button, self.set_global_button,
-            self.set_local_button, self.install_button,
-            self.installed_versions_list, self.available_versions_list]
+            self.set_local_button, self.install_button, self.rescan_button, self.prune_button,
+            self.installed_versions_list, self.available_versions_tree]
         if self.versions_pane.winfo_exists():
             available_frame = next((c for c in self.versions_pane.winfo_children() if isinstance(c, ttk.LabelFrame) and "Available" in c.cget("text")), None)
             if available_frame:
@@ -441,7 +758,11 @@ class PyenvGUI:
                     if filter_entry_widget: widgets_to_toggle.append(filter_entry_widget)
         for widget in widgets_to_toggle:
             try:
-                if widget.winfo_exists(): widget.config(state=state)
+                if not widget.winfo_exists(): continue
+                if isinstance(widget, ttk.Treeview): # No -state option; its class bindings ignore the disabled flag, so also stop selection
+                    widget.state(["disabled"] if state == tk.DISABLED else ["!disabled"])
+                    widget.config(selectmode=tk.NONE if state == tk.DISABLED else tk.EXTENDED)
+                else: widget.config(state=state)
             except tk.TclError: pass
 
     _fetch_ops_pending = 0
@@ -468,57 +789,705 @@ class PyenvGUI:
             if self._fetch_ops_pending == 0:
                 if self.master.winfo_exists(): 
                     self.stop_animation() # Stop text spinner
-                    self.set_ui_state(tk.NORMAL)
+                    if not self._pyenv_broken: self.set_ui_state(tk.NORMAL)
+
+    REFRESH_DEBOUNCE_SECONDS = 0.15
 
     def load_installed_versions(self):
-        self._start_fetch_op()
-        threading.Thread(target=self._fetch_data_worker, args=(["pyenv", "versions", "--bare"], "update_installed_list"), daemon=True).start()
+        self.refresh.request("installed")
+
+    def _fetch_installed_versions(self, flight): # Refresh worker thread
+        return self.engine.installed_versions(flight)
+
+    def _deliver_installed_versions(self, versions, error):
+        if error is not None:
+            self.gui_queue.put(("append_output", f"Error during data fetch (pyenv versions --bare): {error}\n"))
+            versions = []
+        else:
+            self.session_cache.update(installed=versions)
+            self.startup_profile.mark("installed versions fetched", once=True)
+            self.load_installed_details()
+        self.gui_queue.put(("update_installed_list", versions))
+
+    INSTALLED_DETAIL_COLUMNS = ("version", "size", "files", "python", "ssl", "sqlite3")
+
+    def load_installed_details(self, force=False):
+        if force: self._scan_force = True
+        self.refresh.request("scan")
+
+    def _fetch_installed_details(self, flight): # Refresh worker thread
+        force, self._scan_force = self._scan_force, False
+        engine = self.engine # The flight's root, even if the user switches roots while it runs
+        root = engine.pyenv_root_path
+        try:
+            return engine, engine.scan_installed(force=force, flight=flight,
+                                                 on_result=lambda record: self.gui_queue.put(("installed_scan_result", (root, record))))
+        except BaseException:
+            if force: self._scan_force = True # Superseded or failed; the next run still has to ignore the cache
+            raise
+
+    def _deliver_installed_details(self, result, error):
+        if error is not None:
+            self.gui_queue.put(("append_output", f"Error while scanning installed versions: {error}\n")); return
+        engine, entries = result
+        stats = engine.version_scanner.last_scan
+        if stats.get("rescanned"):
+            self.gui_queue.put(("append_output", f"Scanned {stats['rescanned']} installed version(s) in {stats['seconds']:.1f}s ({stats['cached']} unchanged).\n"))
+        self.gui_queue.put(("installed_scan_done", (engine.pyenv_root_path, entries)))
+
+    @staticmethod
+    def _format_size(size):
+        if size is None: return ""
+        for unit in ("B", "KiB", "MiB"):
+            if size < 1024: return f"{size:.0f} {unit}"
+            size /= 1024
+        return f"{size:.1f} GiB"
+
+    def _installed_details_values(self, record):
+        if record.get("alias_of"): return (record["version"], "", "", f"-> {record['alias_of']}", "", "")
+        flag = lambda value: "" if value is None else ("yes" if value else "NO")
+        python = record.get("python_version") if record.get("python") == "ok" else (record.get("python") or "")
+        return (record["version"], self._format_size(record.get("bytes")), "" if record.get("files") is None else record["files"],
+                python, flag(record.get("ssl")), flag(record.get("sqlite3")))
+
+    def _installed_details_sort_key(self, column, record):
+        if column == "size": return record.get("bytes") or 0
+        if column == "files": return record.get("files") or 0
+        if column == "python": return version_sort_key(record.get("python_version") or "")
+        if column in ("ssl", "sqlite3"): return {None: 0, True: 1, False: 2}[record.get(column)] # Broken ones sort together
+        return version_sort_key(record["version"])
+
+    def _update_installed_details_row(self, record): # One version finished scanning; sorted properly once the scan ends
+        tree = self.installed_details_tree
+        if not tree.winfo_exists(): return
+        values = self._installed_details_values(record)
+        if tree.exists(record["version"]): tree.item(record["version"], values=values)
+        else: tree.insert("", tk.END, iid=record["version"], values=values)
+
+    def _render_installed_details(self):
+        tree = self.installed_details_tree
+        if not tree.winfo_exists(): return
+        installed = set(getattr(self, '_last_installed_versions_data', None) or self._scan_records)
+        tree.delete(*[iid for iid in tree.get_children() if iid not in self._scan_records or iid not in installed])
+        for version, record in self._scan_records.items():
+            if version in installed: self._update_installed_details_row(record)
+        self._sort_installed_details(*self._installed_details_sort)
+        shown = [r for v, r in self._scan_records.items() if v in installed]
+        total = sum(r.get("bytes") or 0 for r in shown)
+        self.installed_frame.config(text=f"Installed Versions ({len(shown)}, {self._format_size(total)})" if shown else "Installed Versions")
+
+    def _sort_installed_details(self, column, descending=None, toggle=False):
+        tree = self.installed_details_tree
+        if toggle: # Clicking the sorted column flips it; a new column starts with the biggest/newest first
+            previous_column, previous_descending = self._installed_details_sort
+            descending = not previous_descending if column == previous_column else column != "version"
+        self._installed_details_sort = (column, descending)
+        rows = [iid for iid in tree.get_children() if iid in self._scan_records]
+        rows.sort(key=lambda iid: self._installed_details_sort_key(column, self._scan_records[iid]), reverse=descending)
+        for position, iid in enumerate(rows): tree.move(iid, "", position)
+        for name in self.INSTALLED_DETAIL_COLUMNS:
+            label = tree.heading(name, "text").rstrip(" ▲▼")
+            tree.heading(name, text=f"{label} {'▼' if descending else '▲'}" if name == column else label)
+
+    def _on_installed_details_select(self, event): # Keep the listbox selection, which the actions use, in step
+        shown = getattr(self, '_last_installed_versions_data', [])
+        indices = tuple(sorted(shown.index(v) for v in self.installed_details_tree.selection() if v in shown))
+        if self.installed_versions_list.curselection() == indices: return
+        self.installed_versions_list.selection_clear(0, tk.END)
+        for index in indices: self.installed_versions_list.selection_set(index)
+        if indices: self.installed_versions_list.see(indices[0])
+
+    def _on_installed_list_select(self, event):
+        shown = getattr(self, '_last_installed_versions_data', [])
+        versions = [shown[i] for i in self.installed_versions_list.curselection() if i < len(shown)]
+        versions = tuple(v for v in versions if self.installed_details_tree.exists(v))
+        if set(self.installed_details_tree.selection()) == set(versions): return
+        self.installed_details_tree.selection_set(versions)
+        if versions: self.installed_details_tree.see(versions[0])
 
     def load_available_versions(self):
-        self._start_fetch_op() # This will show text spinner
-        if self.master.winfo_exists():
+        self.refresh.request("available")
+
+    def _fetch_available_versions(self, flight): # Refresh worker thread
+        # Show the cached catalogue straight away; it is only rebuilt if the cache key changed.
+        # With nothing cached the UI is locked as before, otherwise the rebuild happens in the background.
+        cached_key, cached_lines = self.engine.cached_catalogue()
+        if cached_lines is not None and cached_key != self._shown_catalogue_key:
+            self._shown_catalogue_key = cached_key
+            self.gui_queue.put(("update_available_list", cached_lines))
+        holds_fetch_op = cached_lines is None
+        if holds_fetch_op:
+            self.gui_queue.put(("fetch_op_start", "update_available_list")) # This will show text spinner
             self.gui_queue.put(("append_output", "Fetching available versions (this may take a moment)...\n"))
-        threading.Thread(target=self._fetch_data_worker, args=(["pyenv", "install", "--list"], "update_available_list"), daemon=True).start()
+        try:
+            lines = self.engine.refresh_catalogue(cached_key, on_message=lambda text: self.gui_queue.put(("append_output", text)), flight=flight)
+        finally:
+            if holds_fetch_op: self.gui_queue.put(("fetch_op_done", "update_available_list"))
+        return self.engine.catalogue_key, lines, holds_fetch_op
+
+    def _deliver_available_versions(self, result, error):
+        if error is not None:
+            self.gui_queue.put(("append_output", f"Error during data fetch (install --list): {error}\n"))
+            if self._shown_catalogue_key is None: self.gui_queue.put(("update_available_list", []))
+            return
+        key, lines, was_cold = result
+        self.startup_profile.mark("catalogue checked", once=True)
+        if lines is None: return # Cache still current
+        if not was_cold: self.gui_queue.put(("append_output", "Python build definitions changed; refreshed available versions.\n"))
+        self._shown_catalogue_key = key
+        self.gui_queue.put(("update_available_list", lines))
 
     def refresh_all_data(self):
         if not self.master.winfo_exists() or not self.output_text.winfo_exists(): return
-        self.output_text.config(state=tk.NORMAL); self.output_text.delete(1.0, tk.END); self.output_text.config(state=tk.DISABLED)
+        self.output_text.config(state=tk.NORMAL); self.output_text.delete(1.0, tk.END)
+        if self.console_log_path: self.output_text.insert(tk.END, f"[Console cleared; earlier output: {self.console_log_path}]\n")
+        self.output_text.config(state=tk.DISABLED)
         self.gui_queue.put(("append_output", "Refreshing all data...\n"))
         self.load_current_versions(); self.load_installed_versions(); self.load_available_versions()
 
-    def filter_available_versions(self, *args): # This populates the listbox based on _all_available_versions and filter
-        if not self.available_versions_list.winfo_exists(): return
-        filter_text = self.filter_var.get().lower()
-        self.available_versions_list.delete(0, tk.END)
-        items_added = 0
-        if not filter_text:
-            for version in self._all_available_versions:
-                self.available_versions_list.insert(tk.END, version); items_added+=1
+    def _update_root_choices(self):
+        self.root_combobox.config(values=[self.roots.label(root) for root in self.roots.roots])
+        self.root_combobox.current(self.roots.roots.index(self.pyenv_root_path))
+
+    def _on_root_selected(self, event=None):
+        index = self.root_combobox.current()
+        if 0 <= index < len(self.roots.roots): self.switch_root(self.roots.roots[index])
+
+    def switch_root(self, root):
+        # Points the main window (lists, installs, Set Global/Local, per-root caches) at another registered root.
+        # Its engine is created and probed on a worker; the swap happens once that reports back.
+        if root == self.pyenv_root_path: return
+        self.gui_queue.put(("append_output", f"Switching to PYENV_ROOT {root}...\n"))
+        def worker():
+            engine = self.roots.engine(root)
+            self.gui_queue.put(("root_switch_ready", (engine, engine.probe())))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _apply_root_switch(self, engine, working):
+        if not working:
+            self.gui_queue.put(("append_output", f"Error: pyenv does not work for {engine.pyenv_root_path}; staying on {self.pyenv_root_path}.\n"))
+            self._update_root_choices(); return
+        if self.versions_watcher is not None: self.versions_watcher.stop()
+        self.engine, self.install_scheduler = engine, engine.install_scheduler
+        self.pyenv_executable_path, self.pyenv_root_path = engine.pyenv_executable_path, engine.pyenv_root_path
+        engine.remove_job_listener(self._on_install_job_event); engine.add_job_listener(self._on_install_job_event)
+        self.session_cache = SessionCache(self.pyenv_root_path, engine.cache_dir)
+        self._shown_catalogue_key = None
+        self._update_root_choices()
+        self.gui_queue.put(("append_output", f"Now managing {self.pyenv_root_path} (pyenv: {self.pyenv_executable_path}).\n"))
+        self.gui_queue.put(("update_installed_list", [])); self.gui_queue.put(("installed_scan_done", (self.pyenv_root_path, {})))
+        self._paint_last_session()
+        self.load_current_versions(); self.load_installed_versions(); self.load_available_versions()
+        self._watch_versions_dir()
+
+    def _watch_versions_dir(self):
+        # Keeps the installed list in sync with $PYENV_ROOT/versions without re-running `pyenv versions`;
+        # changes reported after a switch to another root are dropped
+        root = self.pyenv_root_path
+        self.versions_watcher = VersionsDirWatcher(root, lambda *change: root == self.pyenv_root_path and self._on_versions_dir_change(*change))
+        self.versions_watcher.start()
+
+    FILTER_DEBOUNCE_MS = 120
+    AVAILABLE_AUTO_OPEN_MATCHES = 60 # A filter down to this many versions shows them all expanded
+    IMPLEMENTATION_LABELS = {"cpython": "CPython", "pypy": "PyPy", "graalpy": "GraalPy", "micropython": "MicroPython"}
+
+    def _on_filter_changed(self, *args): # Keystrokes are debounced; the filter runs once typing pauses
+        if self._filter_after_id is not None: self.master.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.master.after(self.FILTER_DEBOUNCE_MS, self.filter_available_versions)
+
+    def filter_available_versions(self, *args): # This populates the tree based on _all_available_versions and filter
+        self._filter_after_id = None
+        if not self.available_versions_tree.winfo_exists(): return
+        with tracer.span("available tree filter", "gui", query=self.filter_var.get()) as span:
+            indices = self._available_index.search(self.filter_var.get())
+            self._render_available_tree(indices)
+            span.set(rows=len(indices))
+
+    def _render_available_tree(self, indices):
+        # Only the implementation rows (plus whatever is open) go into the tree, so a redraw is a few dozen inserts
+        if indices == self._shown_available_indices: return
+        records, tree = self._available_index.records, self.available_versions_tree
+        groups = {}
+        for i in indices: groups.setdefault(records[i].implementation, {}).setdefault(records[i].series, []).append(i)
+        selected = tree.selection()
+        tree.delete(*tree.get_children())
+        self._available_groups, self._available_pending = groups, set()
+        open_all = len(indices) <= self.AVAILABLE_AUTO_OPEN_MATCHES and bool(self.filter_var.get().strip())
+        for implementation, series_groups in groups.items():
+            count = sum(len(items) for items in series_groups.values())
+            node = self._insert_available_group("", f"impl:{implementation}", f"{self.IMPLEMENTATION_LABELS.get(implementation, implementation)}  ({count})")
+            if not (open_all or node in self._available_open_nodes): continue
+            self._populate_available_node(node); tree.item(node, open=True)
+            for child in tree.get_children(node):
+                if child in self._available_pending and (open_all or child in self._available_open_nodes):
+                    self._populate_available_node(child); tree.item(child, open=True)
+        kept = [iid for iid in selected if tree.exists(iid)]
+        if kept: tree.selection_set(kept)
+        self._shown_available_indices = indices
+
+    def _insert_available_group(self, parent, iid, text):
+        tree = self.available_versions_tree
+        tree.insert(parent, tk.END, iid=iid, text=text, open=False)
+        tree.insert(iid, tk.END, iid=f"{iid}/pending", text="") # Placeholder so the node can be expanded
+        self._available_pending.add(iid)
+        return iid
+
+    def _populate_available_node(self, iid):
+        if iid not in self._available_pending: return
+        self._available_pending.discard(iid)
+        tree = self.available_versions_tree
+        tree.delete(*tree.get_children(iid))
+        kind, _, rest = iid.partition(":")
+        if kind == "impl":
+            series_groups = self._available_groups.get(rest, {})
+            for series, items in series_groups.items():
+                if series and len(series_groups) > 1: self._insert_available_group(iid, f"series:{rest}:{series}", f"{series}  ({len(items)})")
+                else: self._insert_available_versions(iid, items) # Unversioned names (and a lone series) sit under the implementation
         else:
-            for version in self._all_available_versions:
-                if filter_text in version.lower():
-                    self.available_versions_list.insert(tk.END, version); items_added+=1
-        # print(f"CONSOLE_DEBUG: filter_available_versions: Populated listbox with {items_added} items. Filter: '{filter_text}'")
+            implementation, _, series = rest.partition(":")
+            self._insert_available_versions(iid, self._available_groups.get(implementation, {}).get(series, []))
 
+    def _insert_available_versions(self, parent, indices):
+        tree, records = self.available_versions_tree, self._available_index.records
+        for i in indices:
+            record = records[i]
+            if tree.exists(f"version:{record.name}"): continue # pyenv never lists a name twice, but a cache might
+            tree.insert(parent, tk.END, iid=f"version:{record.name}", text=record.name,
+                        tags=("prerelease",) if record.prerelease or record.dev else ())
+
+    def _on_available_tree_open(self, event):
+        iid = self.available_versions_tree.focus() # Tk focuses the row it is about to open
+        self._available_open_nodes.add(iid)
+        with tracer.span("available tree expand", "gui", node=iid):
+            self._populate_available_node(iid)
+
+    def _on_available_tree_close(self, event):
+        self._available_open_nodes.discard(self.available_versions_tree.focus())
 
     def install_selected_version(self):
-        self._run_pyenv_command_threaded(
-            ["pyenv", "install", "-v", "version_placeholder"], # -v for verbose
-            success_message="Installation process completed.", error_message="Installation failed.",
-            on_complete_action="installation_complete", requires_selection_from=self.available_versions_list)
+        # Every selected version becomes a job; the scheduler runs them side by side and the UI stays usable
+        if not self.available_versions_tree.winfo_exists(): return
+        selected_versions = [iid[len("version:"):] for iid in self.available_versions_tree.selection() if iid.startswith("version:")]
+        if not selected_versions:
+            if self.master.winfo_exists(): messagebox.showwarning("Selection Required", "Please select a version from the list.")
+            return
+        build_profile = self.build_profile_var.get()
+        for version in selected_versions:
+            job = self.engine.submit_install(version, build_profile=build_profile)
+            if job is None:
+                self.gui_queue.put(("append_output", f"{version} is already queued or being installed.\n"))
+            elif self.benchmark_after_install_var.get(): self._benchmark_job_ids.add(job.id)
+
+    def _on_build_profile_changed(self, event=None):
+        profile = self.build_profile_var.get()
+        self.gui_queue.put(("append_output", f"Build profile: {profile} ({BUILD_PROFILES[profile]['description']}); "
+                                              f"{self.engine.configure_options(profile) or 'no extra options'}\n"))
+
+    def _benchmark_build(self, job): # Worker thread, after a build or restore succeeded
+        try: self.roots.engine(job.pyenv_root).benchmark_build(job.version, job.build_profile, on_message=lambda text: self.gui_queue.put(("append_output", f"[{job.version}] {text}")))
+        except Exception as e:
+            self.gui_queue.put(("append_output", f"[{job.version}] Benchmark failed: {e}\n"))
+
+    def show_artifact_cache_panel(self):
+        if not self.engine.artifact_cache:
+            messagebox.showinfo("Artifact Cache", "The artifact cache is unavailable (cache directory not writable)."); return
+        window = tk.Toplevel(self.master)
+        window.title("Artifact Cache")
+        window.geometry("640x360")
+        summary_label = ttk.Label(window, text="", style="Small.TLabel", justify=tk.LEFT, padding=5)
+        summary_label.pack(fill=tk.X)
+        tree = ttk.Treeview(window, columns=("version", "size", "hits", "last_used"), show="headings", height=10)
+        for column, heading, width in (("version", "Version", 160), ("size", "Size", 100), ("hits", "Hits", 60), ("last_used", "Last Used", 180)):
+            tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        def refresh():
+            stats = self.engine.artifact_cache.stats()
+            summary_label.config(text=(
+                f"Build trees: {stats['trees']} ({stats['tree_bytes'] / 1024 ** 2:.0f} MiB), hits {stats['tree_hits']} / misses {stats['tree_misses']}\n"
+                f"Source tarballs: {stats['tarballs']} ({stats['tarball_bytes'] / 1024 ** 2:.0f} MiB), reused {stats['tarball_hits']} / downloaded {stats['tarball_misses']}\n"
+                f"Limit: {stats['max_bytes'] / 1024 ** 3:.1f} GiB at {self.engine.artifact_cache.root_dir}"))
+            tree.delete(*tree.get_children())
+            for entry in sorted(stats["entries"], key=lambda e: e["last_used"], reverse=True):
+                tree.insert("", tk.END, values=(entry["version"], f"{entry['bytes'] / 1024 ** 2:.1f} MiB", entry.get("hits", 0),
+                                                time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))))
+        def clear():
+            if messagebox.askyesno("Clear Artifact Cache", "Delete all cached build trees and tarballs?", parent=window):
+                self.engine.artifact_cache.clear(); refresh()
+        buttons_frame = ttk.Frame(window)
+        buttons_frame.pack(fill=tk.X)
+        ttk.Button(buttons_frame, text="Refresh", command=refresh).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="Clear Cache", command=clear).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def _on_tracing_toggled(self):
+        tracer.enabled = self.tracing_var.get()
+        if tracer.enabled: self.stall_monitor.start()
+        else: self.stall_monitor.stop()
+        self.gui_queue.put(("append_output", f"Tracing {'enabled' if tracer.enabled else 'disabled'}.\n"))
+
+    def export_trace(self, parent=None):
+        path = filedialog.asksaveasfilename(parent=parent or self.master, title="Export Trace", defaultextension=".json",
+                                            initialfile=f"pyenv-gui-trace-{time.strftime('%Y%m%d-%H%M%S')}.json",
+                                            filetypes=[("Chrome trace", "*.json"), ("All files", "*")])
+        if not path: return
+        try: count = tracer.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Trace", f"Could not write the trace: {e}", parent=parent or self.master); return
+        self.gui_queue.put(("append_output", f"Wrote {count} trace events to {path} (open in chrome://tracing or ui.perfetto.dev).\n"))
+
+    def show_performance_panel(self):
+        window = tk.Toplevel(self.master)
+        window.title("Performance Stats")
+        window.geometry("720x420")
+        summary_label = ttk.Label(window, text="", style="Small.TLabel", justify=tk.LEFT, padding=5)
+        summary_label.pack(fill=tk.X)
+        tree = ttk.Treeview(window, columns=("name", "count", "avg", "max", "last", "total"), show="headings", height=12)
+        for column, heading, width in (("name", "Span", 240), ("count", "Count", 60), ("avg", "Avg ms", 80), ("max", "Max ms", 80),
+                                       ("last", "Last ms", 80), ("total", "Total ms", 90)):
+            tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.W if column == "name" else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        refresh_label = ttk.Label(window, text="", style="Small.TLabel", padding=5)
+        refresh_label.pack(fill=tk.X)
+        def refresh():
+            if not window.winfo_exists(): return
+            spans, counters, buffered = tracer.stats()
+            depth_last, depth_max = counters.get("gui_queue depth", (self.gui_queue.qsize(), 0))
+            summary_label.config(text=(
+                f"Tracing: {'on' if tracer.enabled else 'off (enable it from the Tools menu)'}, {buffered} events buffered\n"
+                f"GUI queue depth: {self.gui_queue.qsize()} now, {depth_max} max\n"
+                f"Main-loop stalls over {self.stall_monitor.threshold * 1000:.0f} ms: {self.stall_monitor.stalls}"
+                f" (worst {self.stall_monitor.worst_stall * 1000:.0f} ms)"))
+            tree.delete(*tree.get_children())
+            for name, (count, total, longest, last) in sorted(spans.items(), key=lambda item: item[1][1], reverse=True):
+                tree.insert("", tk.END, values=(name, count, f"{total / count * 1000:.1f}", f"{longest * 1000:.1f}",
+                                                f"{last * 1000:.1f}", f"{total * 1000:.0f}"))
+            totals = {}
+            for counters_by_name in self.refresh.stats().values():
+                for name, value in counters_by_name.items(): totals[name] = totals.get(name, 0) + value
+            refresh_label.config(text="Refreshes: " + ", ".join(f"{name} {value}" for name, value in totals.items()))
+            window.after(1000, refresh)
+        def reset():
+            tracer.reset(); self.stall_monitor.stalls, self.stall_monitor.worst_stall = 0, 0.0
+        buttons_frame = ttk.Frame(window)
+        buttons_frame.pack(fill=tk.X)
+        ttk.Button(buttons_frame, text="Reset", command=reset).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="Export Trace...", command=lambda: self.export_trace(parent=window)).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def _on_install_job_event(self, event, job, data): # Engine job listener, called from scheduler threads
+        if event in ("output", "message"):
+            self.gui_queue.put(("append_output", f"[{job.version}] {data}"))
+            return
+        self.gui_queue.put(("job_update", job))
+        if event == "started" and job.kind == "build":
+            self.gui_queue.put(("append_output", f"[{job.version}] Executing: {' '.join(job.command_args)} ({job.build_profile} profile, MAKE_OPTS -j{job.make_jobs})\n"))
+        elif event == "finished":
+            if job.status == "succeeded" and job.id in self._benchmark_job_ids:
+                threading.Thread(target=self._benchmark_build, args=(job,), daemon=True).start()
+            self._benchmark_job_ids.discard(job.id)
+            if job.status == "succeeded": self.gui_queue.put(("append_output", f"\n[{job.version}] Installation process completed.\n"))
+            elif job.status == "failed": self.gui_queue.put(("append_output", f"\n[{job.version}] Error: Command failed with code {job.return_code}.\nInstallation failed.\n"))
+            else: self.gui_queue.put(("append_output", f"\n[{job.version}] Installation cancelled.\n"))
+            self.gui_queue.put(("installation_complete", (job.version, job.status == "succeeded")))
+
+    def _tick_job_progress(self): # Refreshes ETAs once a second while any build is running
+        running = [row["job"] for row in self._job_rows.values() if row["job"].status == "running"]
+        for job in running: self._update_job_row(job)
+        self._job_progress_ticking = bool(running) and self.master.winfo_exists()
+        if self._job_progress_ticking: self.master.after(1000, self._tick_job_progress)
+
+    def _on_max_parallel_builds_changed(self):
+        try: self.install_scheduler.set_max_concurrent(self.max_parallel_builds_var.get())
+        except (tk.TclError, ValueError): pass
+
+    def _update_job_row(self, job):
+        row = self._job_rows.get(job.id)
+        if row is None:
+            if not self.jobs_rows_frame.winfo_exists(): return
+            frame = ttk.Frame(self.jobs_rows_frame, padding=0)
+            frame.pack(fill=tk.X, pady=1)
+            label = job.version if job.build_profile == "default" else f"{job.version} ({job.build_profile})"
+            if job.pyenv_root != self.roots.primary.pyenv_root_path: label += f" in {os.path.basename(job.pyenv_root)}"
+            ttk.Label(frame, text=label, style="Small.TLabel", width=22).pack(side=tk.LEFT)
+            status_label = ttk.Label(frame, text="", style="Small.TLabel", width=24)
+            status_label.pack(side=tk.LEFT)
+            bar = ttk.Progressbar(frame, orient='horizontal', mode='indeterminate', length=120)
+            bar.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+            cancel_button = ttk.Button(frame, text="Cancel", command=lambda: self.install_scheduler.cancel(job))
+            cancel_button.pack(side=tk.RIGHT, padx=(3,0))
+            ttk.Button(frame, text="Log", command=lambda: self.show_job_log(job)).pack(side=tk.RIGHT, padx=(3,0))
+            row = self._job_rows[job.id] = {"frame": frame, "status": status_label, "bar": bar, "cancel": cancel_button, "job": job}
+        if job.status == "running":
+            tracker = job.tracker
+            fraction, eta = tracker.progress() if tracker else (None, None)
+            phase = (tracker.phase if tracker else None) or ("restoring" if job.kind == "restore" else "running")
+            if fraction is None:
+                row["status"].config(text=f"{phase} (-j{job.make_jobs})")
+                if str(row["bar"].cget("mode")) != "indeterminate" or not row.get("animating"):
+                    row["bar"].config(mode='indeterminate'); row["bar"].start(15); row["animating"] = True
+            else:
+                row["status"].config(text=f"{phase} {int(fraction * 100)}% ETA {format_duration(eta)}")
+                if row.get("animating"): row["bar"].stop(); row["animating"] = False
+                row["bar"].config(mode='determinate', value=fraction * 100)
+            if not self._job_progress_ticking:
+                self._job_progress_ticking = True
+                self.master.after(1000, self._tick_job_progress)
+        else:
+            row["status"].config(text=job.status, style="Error.TLabel" if job.status == "failed" else "Small.TLabel")
+            if not job.active:
+                row["bar"].stop(); row["bar"].config(mode='determinate', value=100 if job.status == "succeeded" else 0)
+                row["cancel"].config(state=tk.DISABLED)
+
+    def clear_finished_jobs(self):
+        for job_id, row in list(self._job_rows.items()):
+            if not row["job"].active:
+                row["frame"].destroy(); del self._job_rows[job_id]
+
+    def show_job_log(self, job):
+        if not job.log_path or not os.path.exists(job.log_path):
+            messagebox.showinfo("Build Log", f"No log available yet for {job.version}."); return
+        LogViewer(self.master, job.log_path, f"Build log: {job.version}", follow=True)
+
+    def show_console_log(self):
+        if not self.console_log_path:
+            messagebox.showinfo("Console Log", "The console log could not be created (cache directory not writable)."); return
+        if self._console_log is not None: self._console_log.flush()
+        LogViewer(self.master, self.console_log_path, "Console log", follow=True)
+
+    def browse_logs(self):
+        path = filedialog.askopenfilename(parent=self.master, title="Open Log", initialdir=self.engine.log_dir,
+                                          filetypes=[("Logs", "*.log"), ("All files", "*")])
+        if path: LogViewer(self.master, path, follow=False)
 
     def uninstall_selected_version(self):
+        # Every selected version goes in one bulk removal (trees deleted side by side, a single rehash)
         if not self.installed_versions_list.winfo_exists(): return
         selected_indices = self.installed_versions_list.curselection()
         if not selected_indices:
             if self.master.winfo_exists(): messagebox.showwarning("Selection Required", "Please select an installed version.")
             return
-        selected_item_text = self.installed_versions_list.get(selected_indices[0]).strip()
-        version_to_uninstall = selected_item_text.lstrip('*> ').split(" ")[0]
-        if self.master.winfo_exists() and messagebox.askyesno("Confirm Uninstall", f"Uninstall '{version_to_uninstall}'?"):
-            self._run_pyenv_command_threaded(["pyenv", "uninstall", "-f"],
-                success_message=f"Uninstalled {version_to_uninstall}.", error_message=f"Failed to uninstall {version_to_uninstall}.",
-                on_complete_action="uninstallation_complete", requires_selection_from=self.installed_versions_list)
+        versions = [self.installed_versions_list.get(i).strip().lstrip('*> ').split(" ")[0] for i in selected_indices]
+        sizes = [(self._scan_records.get(v) or {}).get("bytes") for v in versions]
+        listing = "\n".join(versions[:15]) + (f"\n... and {len(versions) - 15} more" if len(versions) > 15 else "")
+        size_note = f" ({self._format_size(sum(x or 0 for x in sizes))})" if any(sizes) else ""
+        prompt = f"Uninstall '{versions[0]}'{size_note}?" if len(versions) == 1 else f"Uninstall these {len(versions)} versions{size_note}?\n\n{listing}"
+        if self.master.winfo_exists() and messagebox.askyesno("Confirm Uninstall", prompt):
+            self.start_bulk_uninstall(versions)
+
+    def start_bulk_uninstall(self, versions):
+        if self._bulk_uninstall_running:
+            messagebox.showinfo("Uninstall", "An uninstall is already running."); return
+        self._bulk_uninstall_running = True
+        for button in (self.uninstall_button, self.prune_button): button.config(state=tk.DISABLED)
+        self.start_animation()
+        self.gui_queue.put(("append_output", f"Uninstalling {', '.join(versions)}...\n"))
+        def worker():
+            try: results = self.engine.uninstall_many(versions, on_message=lambda text: self.gui_queue.put(("append_output", text)))
+            except Exception as e:
+                self.gui_queue.put(("append_output", f"An unexpected error occurred while uninstalling: {e}\n")); results = []
+            self.gui_queue.put(("bulk_uninstall_complete", results))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_bulk_uninstall_complete(self, results):
+        self._bulk_uninstall_running = False
+        self.stop_animation()
+        if not self._pyenv_broken and self._fetch_ops_pending == 0:
+            for button in (self.uninstall_button, self.prune_button): button.config(state=tk.NORMAL)
+        removed = [r for r in results if r["removed"]]
+        freed = sum(r["bytes"] or 0 for r in removed)
+        self.gui_queue.put(("append_output", f"Uninstalled {len(removed)} of {len(results)} version(s)" + (f", freed {self._format_size(freed)}" if freed else "") + ".\n"))
+        for result in results:
+            if result["error"]: self.gui_queue.put(("append_output", f"  {result['version']}: {result['error']}\n"))
+        self.load_installed_versions(); self.load_current_versions()
+
+    PRUNE_PREVIEW_DEBOUNCE_MS = 250
+
+    def show_prune_dialog(self):
+        window = tk.Toplevel(self.master)
+        window.title("Prune Installed Versions")
+        window.geometry("640x420")
+        options_frame = ttk.Frame(window)
+        options_frame.pack(fill=tk.X)
+        latest_patch_var, unused_var, unused_days_var = tk.BooleanVar(value=True), tk.BooleanVar(value=False), tk.IntVar(value=90)
+        ttk.Checkbutton(options_frame, text="Keep only the latest patch of each minor series", variable=latest_patch_var,
+                        command=lambda: preview()).pack(anchor=tk.W)
+        unused_frame = ttk.Frame(options_frame, padding=0)
+        unused_frame.pack(anchor=tk.W)
+        ttk.Checkbutton(unused_frame, text="Remove versions not run for", variable=unused_var, command=lambda: preview()).pack(side=tk.LEFT)
+        ttk.Spinbox(unused_frame, from_=1, to=3650, width=5, textvariable=unused_days_var, command=lambda: preview()).pack(side=tk.LEFT, padx=5)
+        ttk.Label(unused_frame, text="days", style="Small.TLabel").pack(side=tk.LEFT)
+        tree = ttk.Treeview(window, columns=("version", "size", "last_used", "reason"), show="headings", height=10, selectmode=tk.EXTENDED)
+        for column, heading, width in (("version", "Version", 140), ("size", "Size", 80), ("last_used", "Last Run", 100), ("reason", "Reason", 280)):
+            tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        summary_label = ttk.Label(window, text="", style="Small.TLabel", justify=tk.LEFT, padding=5, wraplength=620)
+        summary_label.pack(fill=tk.X)
+        candidates = {}
+        def update_summary(*args):
+            selected = [candidates[iid] for iid in tree.selection()]
+            unknown = any(c["bytes"] is None for c in selected)
+            text = (f"{len(candidates)} candidate(s); {len(selected)} selected, reclaiming {self._format_size(sum(c['bytes'] or 0 for c in selected))}"
+                    + (" (some sizes unknown; Rescan Sizes first for exact numbers)" if unknown else "") + ".")
+            if protected: text += "\nKept regardless: " + ", ".join(f"{v} ({why})" for v, why in protected.items())
+            summary_label.config(text=text)
+        pending = {"after": None, "generation": 0, "outcome": None}
+        def preview(): # Debounced: spinbox clicks and typing come in bursts, and each run stats every version
+            if pending["after"] is not None: window.after_cancel(pending["after"])
+            pending["after"] = window.after(self.PRUNE_PREVIEW_DEBOUNCE_MS, start_preview)
+        def start_preview(): # prune_candidates runs on a worker; show_preview gets the newest result back here
+            pending["after"] = None
+            try: days = unused_days_var.get() if unused_var.get() else None
+            except tk.TclError: days = None
+            pending["generation"] += 1
+            generation, keep_latest_patch = pending["generation"], latest_patch_var.get()
+            def worker():
+                try: result = self.engine.prune_candidates(keep_latest_patch=keep_latest_patch, unused_days=days)
+                except Exception as e: result = e
+                pending["outcome"] = (generation, result)
+            threading.Thread(target=worker, daemon=True).start()
+            poll(generation)
+        def poll(generation):
+            if not window.winfo_exists() or generation != pending["generation"]: return # Closed, or a newer preview started
+            outcome = pending["outcome"]
+            if outcome is None or outcome[0] != generation: window.after(50, poll, generation); return
+            if isinstance(outcome[1], Exception): summary_label.config(text=f"Error: {outcome[1]}")
+            else: show_preview(outcome[1])
+        def show_preview(result):
+            nonlocal protected
+            protected = result["protected"]
+            candidates.clear(); tree.delete(*tree.get_children())
+            for candidate in result["candidates"]:
+                candidates[candidate["version"]] = candidate
+                last_used = time.strftime("%Y-%m-%d", time.localtime(candidate["last_used"])) if candidate["last_used"] else "?"
+                tree.insert("", tk.END, iid=candidate["version"], values=(candidate["version"], self._format_size(candidate["bytes"]) or "?",
+                                                                        last_used, "; ".join(candidate["reasons"])))
+            tree.selection_set(tuple(candidates))
+            update_summary()
+        def remove():
+            versions = list(tree.selection())
+            if not versions: return
+            if not messagebox.askyesno("Confirm Prune", f"Uninstall {len(versions)} version(s)?\n\n" + "\n".join(versions[:15])
+                                       + (f"\n... and {len(versions) - 15} more" if len(versions) > 15 else ""), parent=window): return
+            window.destroy()
+            self.start_bulk_uninstall(versions)
+        protected = {}
+        tree.bind("<<TreeviewSelect>>", update_summary)
+        unused_days_var.trace_add("write", lambda *args: unused_var.get() and preview())
+        buttons_frame = ttk.Frame(window)
+        buttons_frame.pack(fill=tk.X)
+        ttk.Button(buttons_frame, text="Remove Selected", command=remove).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="Cancel", command=window.destroy).pack(side=tk.LEFT, padx=5)
+        preview()
+
+    def show_roots_panel(self):
+        # Every registered root in one list, scanned concurrently on a worker (each root through its own cache).
+        # Builds installed identically in several roots are marked and can be hardlinked to the first copy.
+        window = tk.Toplevel(self.master)
+        window.title("All Roots")
+        window.geometry("820x460")
+        summary_label = ttk.Label(window, text="", style="Small.TLabel", justify=tk.LEFT, padding=5, wraplength=800)
+        summary_label.pack(fill=tk.X)
+        tree = ttk.Treeview(window, columns=("version", "root", "size", "python", "duplicate"), show="headings", height=12, selectmode=tk.BROWSE)
+        for column, heading, width in (("version", "Version", 140), ("root", "Root", 220), ("size", "Size", 80), ("python", "Python", 70),
+                                       ("duplicate", "Same Build As", 220)):
+            tree.heading(column, text=heading); tree.column(column, width=width, anchor=tk.E if column == "size" else tk.W)
+        tree.tag_configure("duplicate", foreground="gray40")
+        tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        state = {"results": {}, "duplicates": [], "outcome": None}
+        rows = {} # iid -> merged row (or {"root": root} for a root with nothing installed)
+        def render():
+            results, duplicates = state["results"], state["duplicates"]
+            tree.delete(*tree.get_children()); rows.clear()
+            for row in self.roots.merged(results, duplicates):
+                iid = tree.insert("", tk.END, values=(row["version"], self.roots.label(row["root"]), self._format_size(row["bytes"]),
+                                                      row["python_version"] or ("alias" if row["alias_of"] else "?"),
+                                                      self.roots.label(row["duplicate_of"]) if row["duplicate_of"] else ""),
+                                  tags=("duplicate",) if row["duplicate_of"] else ())
+                rows[iid] = row
+            lines = []
+            for root, result in results.items():
+                records = result["records"] or {}
+                if not records: rows[tree.insert("", tk.END, values=("(none)", self.roots.label(root), "", "", ""))] = {"root": root}
+                lines.append(f"{self.roots.label(root)}{' (target)' if root == self.pyenv_root_path else ''}: " +
+                             (f"error: {result['error']}" if result["error"] else f"{len(records)} version(s), "
+                              f"{self._format_size(sum(r['bytes'] or 0 for r in records.values()))}, scanned in {result['seconds']:.1f}s"))
+            linkable = [d for d in duplicates if d["same_filesystem"]]
+            lines.append(f"{len(duplicates)} build(s) installed identically in several roots"
+                         + (f", {len(linkable)} of them hardlinkable (same filesystem)" if duplicates else "") + ".")
+            summary_label.config(text="\n".join(lines))
+            link_button.config(state=tk.NORMAL if linkable else tk.DISABLED)
+        def run(task, done): # task() on a worker thread, done(result) back on this one; polled like LogViewer's searches
+            state["outcome"] = None
+            for button in buttons + [link_button]: button.config(state=tk.DISABLED)
+            def worker():
+                try: state["outcome"] = (task(), None)
+                except Exception as e: state["outcome"] = (None, e)
+            def poll():
+                if not window.winfo_exists(): return
+                if state["outcome"] is None: window.after(100, poll); return
+                result, error = state["outcome"]
+                for button in buttons: button.config(state=tk.NORMAL)
+                if error is not None: summary_label.config(text=f"Error: {error}")
+                else: done(result)
+            threading.Thread(target=worker, daemon=True).start()
+            poll()
+        def scan(force=False):
+            summary_label.config(text=f"Scanning {len(self.roots.roots)} root(s)...")
+            def task():
+                results = self.roots.scan(force=force)
+                return results, self.roots.duplicates(results)
+            def done(result):
+                state["results"], state["duplicates"] = result
+                render()
+            run(task, done)
+        def selected_root():
+            selection = tree.selection()
+            return rows[selection[0]]["root"] if selection else None
+        def add_root():
+            path = filedialog.askdirectory(parent=window, title="Add PYENV_ROOT", mustexist=True)
+            if not path: return
+            try: self.roots.add(path)
+            except ValueError as e:
+                messagebox.showerror("Add Root", str(e), parent=window); return
+            self._update_root_choices(); scan()
+        def remove_root():
+            root = selected_root()
+            if root is None:
+                messagebox.showinfo("Remove Root", "Select a row of the root to remove.", parent=window); return
+            if root in (self.roots.primary.pyenv_root_path, self.pyenv_root_path):
+                messagebox.showinfo("Remove Root", "The detected root and the one being managed can't be removed.", parent=window); return
+            if any(job.active and self.roots.key(job.pyenv_root) == self.roots.key(root) for job in self.install_scheduler.jobs):
+                messagebox.showinfo("Remove Root", f"{root} still has installs queued or running.", parent=window); return
+            if not messagebox.askyesno("Remove Root", f"Stop listing {root}?\nNothing on disk is deleted.", parent=window): return
+            self.roots.remove(root)
+            self._update_root_choices(); scan()
+        def use_root():
+            root = selected_root()
+            if root is not None: self.switch_root(root)
+        def link_duplicates():
+            linkable = [d for d in state["duplicates"] if d["same_filesystem"]]
+            listing = "\n".join(f"{d['version']}: {', '.join(self.roots.label(r) for r in d['roots'])}" for d in linkable[:15])
+            if not messagebox.askyesno("Hardlink Duplicates", f"Hardlink the identical files of {len(linkable)} build(s) to their copy in the first "
+                                       f"root listed?\n\n{listing}\n\nsite-packages and virtualenvs stay separate copies.", parent=window): return
+            def done(results):
+                self.gui_queue.put(("append_output", f"Hardlinked {sum(r['files'] for r in results)} files across roots, "
+                                                      f"freed {self._format_size(sum(r['bytes'] for r in results))}.\n"))
+                for result in results:
+                    for error in result["errors"][:3]: self.gui_queue.put(("append_output", f"  {error}\n"))
+                if any(r["root"] == self.pyenv_root_path for r in results): self.load_installed_details()
+                scan()
+            run(lambda: self.roots.link_duplicates(linkable, on_message=lambda text: self.gui_queue.put(("append_output", text))), done)
+        tree.bind("<Double-1>", lambda event: use_root())
+        buttons_frame = ttk.Frame(window)
+        buttons_frame.pack(fill=tk.X)
+        buttons = [ttk.Button(buttons_frame, text="Rescan", command=lambda: scan(force=True)),
+                   ttk.Button(buttons_frame, text="Add Root...", command=add_root),
+                   ttk.Button(buttons_frame, text="Remove Root", command=remove_root),
+                   ttk.Button(buttons_frame, text="Manage This Root", command=use_root)]
+        link_button = ttk.Button(buttons_frame, text="Hardlink Duplicates", command=link_duplicates, state=tk.DISABLED)
+        for button in buttons: button.pack(side=tk.LEFT, padx=(0,5))
+        link_button.pack(side=tk.RIGHT)
+        scan()
 
     def set_global_selected_version(self):
         self._run_pyenv_command_threaded(["pyenv", "global"],
@@ -530,16 +1499,187 @@ class PyenvGUI:
             success_message=f"Local version set for: {os.getcwd()}", error_message="Failed to set local version.",
             on_complete_action="set_version_complete", requires_selection_from=self.installed_versions_list)
 
+class LogViewer:
+    # Toplevel viewer for a log file of any size. The file is read through LogIndex (mmap plus a line offset index
+    # built a chunk per tick while the file grows) and only the lines in view are ever put into the Text widget;
+    # the vertical scrollbar is driven by line numbers rather than by the widget's content. Regex searches run on
+    # a worker thread, so a miss across a 100 MB build log does not freeze the window.
+    TICK_MS = 300 # While idle, watching the file grow
+    BUSY_TICK_MS = 15 # While indexing or searching
+
+    def __init__(self, master, path, title=None, follow=True):
+        self.index = LogIndex(path)
+        self.top_line = 0
+        self.match = None # (line, first column, last column) of the highlighted match
+        self.note = None # Search outcome shown in the status line
+        self.searching = False
+        self._search_result = None
+        self._lock = threading.Lock() # Orders the search worker finishing against close()
+        self.closed = False
+        self.window = tk.Toplevel(master)
+        self.window.title(title or os.path.basename(path))
+        self.window.geometry("900x560")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        search_frame = ttk.Frame(self.window, padding=(5, 5, 5, 0))
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="Regex:", style="Small.TLabel").pack(side=tk.LEFT)
+        self.pattern_var = tk.StringVar()
+        pattern_entry = ttk.Entry(search_frame, textvariable=self.pattern_var, width=40)
+        pattern_entry.pack(side=tk.LEFT, padx=5)
+        pattern_entry.bind("<Return>", lambda event: self.search())
+        pattern_entry.bind("<Shift-Return>", lambda event: self.search(backwards=True))
+        ttk.Button(search_frame, text="Next", command=self.search).pack(side=tk.LEFT)
+        ttk.Button(search_frame, text="Previous", command=lambda: self.search(backwards=True)).pack(side=tk.LEFT, padx=(5,0))
+        self.match_case_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Match case", variable=self.match_case_var).pack(side=tk.LEFT, padx=5)
+        self.follow_var = tk.BooleanVar(value=follow)
+        ttk.Checkbutton(search_frame, text="Follow", variable=self.follow_var, command=self._on_follow_toggled).pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self.window, padding=(5, 0, 5, 0))
+        body.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scrollbar = ttk.Scrollbar(body, orient=tk.HORIZONTAL)
+        x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.font = tkfont.Font(font=('Monaco', 10) if sys.platform == 'darwin' else ('Consolas', 10))
+        self.text = tk.Text(body, wrap=tk.NONE, relief=tk.SOLID, borderwidth=1, font=self.font, xscrollcommand=x_scrollbar.set, state=tk.DISABLED)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        x_scrollbar.config(command=self.text.xview)
+        self.text.tag_configure("match", background="#ffd54f")
+        self.text.bind("<Configure>", lambda event: self.scroll_to(self.top_line))
+        self.text.bind("<MouseWheel>", lambda event: self.scroll_by(-event.delta // 120 * 3 if abs(event.delta) >= 120 else -event.delta))
+        self.text.bind("<Button-4>", lambda event: self.scroll_by(-3)) # X11 wheel
+        self.text.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.text.bind("<Up>", lambda event: self.scroll_by(-1))
+        self.text.bind("<Down>", lambda event: self.scroll_by(1))
+        self.text.bind("<Prior>", lambda event: self.scroll_by(-self.visible_rows()))
+        self.text.bind("<Next>", lambda event: self.scroll_by(self.visible_rows()))
+        self.text.bind("<Control-Home>", lambda event: self.scroll_by(-self.index.line_count))
+        self.text.bind("<Control-End>", lambda event: self.scroll_to(self.index.line_count))
+        self.status_label = ttk.Label(self.window, text="", style="Small.TLabel", padding=5)
+        self.status_label.pack(fill=tk.X)
+        self.text.focus_set()
+        self._tick()
+
+    def visible_rows(self):
+        return max(1, self.text.winfo_height() // max(1, self.font.metrics("linespace")))
+
+    def scroll_to(self, line):
+        self.top_line = max(0, min(line, self.index.line_count - self.visible_rows()))
+        self.render()
+        return "break"
+
+    def scroll_by(self, lines):
+        if lines < 0: self.follow_var.set(False) # Scrolling back stops following the end of the file
+        return self.scroll_to(self.top_line + lines)
+
+    def render(self):
+        if self.closed: return
+        rows, total = self.visible_rows(), self.index.line_count
+        with tracer.span("log viewer render", "gui", rows=rows):
+            lines = self.index.lines(self.top_line, self.top_line + rows)
+            self.text.config(state=tk.NORMAL)
+            self.text.delete("1.0", tk.END)
+            self.text.insert("1.0", "\n".join(line.rstrip("\r") for line in lines))
+            if self.match and self.top_line <= self.match[0] < self.top_line + rows:
+                row = self.match[0] - self.top_line + 1
+                self.text.tag_add("match", f"{row}.{self.match[1]}", f"{row}.{self.match[2]}")
+                self.text.see(f"{row}.{self.match[2]}"); self.text.see(f"{row}.{self.match[1]}") # Scroll long lines sideways to it
+            self.text.config(state=tk.DISABLED)
+        if total: self.scrollbar.set(self.top_line / total, min(1.0, (self.top_line + rows) / total))
+        else: self.scrollbar.set(0, 1)
+        self._update_status()
+
+    def _update_status(self):
+        total, index = self.index.line_count, self.index
+        parts = [f"Lines {min(total, self.top_line + 1):,}-{min(total, self.top_line + self.visible_rows()):,} of {total:,}",
+                 f"{index.size / 1024 ** 2:.1f} MiB"]
+        if index.indexed < index.size: parts.append(f"indexing {index.indexed * 100 // index.size}%")
+        if self.searching: parts.append("searching...")
+        elif self.note: parts.append(self.note)
+        self.status_label.config(text="    ".join(parts))
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto": self.scroll_to(int(float(args[0]) * self.index.line_count))
+        elif action == "scroll": self.scroll_by(int(args[0]) * (self.visible_rows() if args[1] == "pages" else 1))
+
+    def _on_follow_toggled(self):
+        if self.follow_var.get(): self.scroll_to(self.index.line_count)
+
+    def _tick(self):
+        if self.closed: return
+        busy = self.searching
+        if not self.searching: # refresh() remaps the file, so never while a search reads it
+            if self._search_result is not None: self._show_search_result()
+            before = (self.index.line_count, self.index.size, self.index.generation)
+            busy = self.index.refresh()
+            if (self.index.line_count, self.index.size, self.index.generation) != before:
+                self.scroll_to(self.index.line_count if self.follow_var.get() else self.top_line)
+            elif busy: self._update_status()
+        self.window.after(self.BUSY_TICK_MS if busy else self.TICK_MS, self._tick)
+
+    def search(self, backwards=False):
+        pattern = self.pattern_var.get()
+        if not pattern or self.searching: return
+        try: regex = re.compile(pattern.encode("utf-8"), re.MULTILINE | (0 if self.match_case_var.get() else re.IGNORECASE))
+        except re.error as e:
+            self.note = f"Bad regex: {e}"; self._update_status(); return
+        # Next/previous matching line from the current match, or from the top of the view
+        if self.match: start = self.match[0] if backwards else self.match[0] + 1
+        else: start = self.top_line
+        self.searching, self._search_result = True, None
+        self.follow_var.set(False)
+        self._update_status()
+        def worker():
+            try:
+                with tracer.span("log search", "gui", backwards=backwards):
+                    while self.index.refresh(): pass # Search the whole file, not just what the ticks have indexed so far
+                    result = ("match", self.index.search(regex, start, backwards))
+            except (OSError, ValueError) as e: result = ("error", str(e))
+            with self._lock:
+                self._search_result, self.searching = result, False
+                if self.closed: self.index.close()
+        threading.Thread(target=worker, name="log-search", daemon=True).start()
+
+    def _show_search_result(self):
+        kind, value = self._search_result
+        self._search_result = None
+        if kind == "error": self.note = f"Search failed: {value}"
+        elif value is None: self.note = "No match"
+        else:
+            self.match, self.note = value, f"Match on line {value[0] + 1:,}"
+            self.scroll_to(value[0] - self.visible_rows() // 3)
+        self._update_status()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if not self.searching: self.index.close()
+        self.window.destroy()
+
+
 if __name__ == "__main__":
+    if "--headless" in sys.argv[1:]: # Batch mode with JSON output; needs no display (or Tk at all)
+        sys.exit(engine_main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+    if tk is None:
+        print("Tkinter is not available; install it (e.g. python3-tk) or use --headless.")
+        sys.exit(1)
+    startup_profile = StartupProfile(_SCRIPT_START, enabled="--startup-profile" in sys.argv[1:])
+    startup_profile.mark("imports")
     root = tk.Tk()
+    startup_profile.mark("Tk root")
     PyenvGUI._fetch_ops_pending = 0 # Class variable reset
     print("--- Python Script Starting ---")
-    app = PyenvGUI(root)
+    app = PyenvGUI(root, startup_profile=startup_profile)
     if app.is_successfully_initialized:
         print("CONSOLE_DEBUG: PyenvGUI initialized successfully. Starting mainloop.")
         try: root.mainloop()
         except Exception as e: print(f"CONSOLE_DEBUG: Fatal error during Tkinter mainloop: {e}")
         finally:
+             print(f"CONSOLE_DEBUG: Refresh counters: {app.refresh.stats()}")
+             print(f"CONSOLE_DEBUG: pyenv session: {app.engine.session.counters if app.engine.session else 'off'}")
+             if tracer.export_path: print(f"CONSOLE_DEBUG: Wrote {tracer.export(tracer.export_path)} trace events to {tracer.export_path}")
              if root.winfo_exists(): # Ensure window is destroyed if mainloop exits unexpectedly
                 try: messagebox.showerror("Fatal Error", f"A critical error occurred: {e}\nThe application will now close.")
                 except tk.TclError: pass # If root is too far gone
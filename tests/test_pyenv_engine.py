@@ -0,0 +1,579 @@
+# Engine tests that need no pyenv: throwaway PYENV_ROOTs and cache directories under a temp dir.
+# Run with `python -m pytest tests` from the repository root.
+import os
+import atexit
+import collections
+import itertools
+import sys
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyenv_engine import (VersionsDirWatcher, BuildHistory, InstallScheduler, PyenvEngine, ArtifactCache, CurrentVersionResolver,
+                          InstallListCache, CatalogueIndex, RefreshCoordinator, RefreshFlight, RefreshCancelled,
+                          PyenvSession, LogIndex, CatalogueRecord, catalogue_records, apply_build_profile, available_cpus,
+                          RestoreCancelled)
+
+
+class VersionsDirWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_inotify_reports_new_virtualenv(self):
+        envs_dir = os.path.join(self.root, "versions", "3.12.1", "envs")
+        os.makedirs(envs_dir)
+        changes = queue.Queue()
+        watcher = VersionsDirWatcher(self.root, lambda added, removed, current: changes.put(added))
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        for _ in range(100): # Started once the first scan is done and the watches are in place
+            if watcher.mode: break
+            watcher._stop_event.wait(0.02)
+        self.assertEqual(watcher.mode, "inotify")
+        os.mkdir(os.path.join(envs_dir, "project"))
+        self.assertEqual(changes.get(timeout=5), ["3.12.1/envs/project"])
+
+
+class BuildHistoryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.history = BuildHistory(os.path.join(directory, "history.sqlite3"))
+
+    def record(self, version, seconds):
+        self.history.record(version, {"compile": seconds}, seconds, True, machine="test")
+
+    def test_series_estimate_ignores_longer_minor_numbers(self):
+        for version, seconds in (("3.10.13", 100), ("3.12.1", 200), ("pypy3.10-7.3.12", 300), ("3.1.4", 40)):
+            self.record(version, seconds)
+        self.assertEqual(self.history.estimate("3.1.5", machine="test"), {"compile": 40})
+        self.assertEqual(self.history.estimate("3.10.14", machine="test"), {"compile": 100})
+        self.assertEqual(self.history.estimate("pypy3.10-7.3.13", machine="test"), {"compile": 300})
+
+    def test_fallback_stays_within_the_implementation_family(self):
+        for version, seconds in (("3.12.1", 200), ("pypy3.10-7.3.12", 300), ("miniconda3-4.7.12", 5)):
+            self.record(version, seconds)
+        self.assertEqual(self.history.estimate("3.9.18", machine="test"), {"compile": 200})
+        self.assertEqual(self.history.estimate("pypy2.7-7.3.12", machine="test"), {"compile": 300})
+        self.assertEqual(self.history.estimate("miniconda3-latest", machine="test"), {"compile": 5})
+        self.assertEqual(self.history.estimate("graalpy-23.1.0", machine="test"), {})
+
+
+class InstallSchedulerTest(unittest.TestCase):
+    def test_roots_share_one_queue_and_route_their_own_events(self):
+        events = {"a": queue.Queue(), "b": queue.Queue()}
+        release = threading.Event()
+        def runner(job, emit):
+            release.wait(5); emit(job.pyenv_root); return 0
+        scheduler = InstallScheduler(lambda job: {}, lambda event, job, data: None, max_concurrent=1)
+        def submit(root):
+            return scheduler.submit("3.12.1", [], runner=runner, pyenv_root=root,
+                                    on_event=lambda event, job, data: events[root].put((event, data)))
+        job_a, job_b = submit("a"), submit("b")
+        self.assertIsNotNone(job_b) # The same version in another root is a separate job
+        self.assertIsNone(submit("a")) # ...but not twice in one root
+        self.assertEqual((job_a.status, job_b.status), ("running", "queued")) # One limit across both roots
+        release.set()
+        for root, job in (("a", job_a), ("b", job_b)):
+            received = [events[root].get(timeout=5) for _ in range(4)]
+            self.assertEqual(received, [("queued", None), ("started", None), ("output", root), ("finished", None)])
+            self.assertEqual((job.pyenv_root, job.status), (root, "succeeded"))
+
+
+class CurrentVersionResolverTest(unittest.TestCase):
+    # pyenv's order (pyenv-version-name / pyenv-version-file): PYENV_VERSION, then the first .python-version found
+    # from the current directory up to /, then $PYENV_ROOT/version, then "system"
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.root = os.path.join(self.directory, "root")
+        self.project = os.path.join(self.directory, "project")
+        self.cwd = os.path.join(self.project, "src", "pkg")
+        os.makedirs(self.root); os.makedirs(self.cwd)
+        self.resolver = CurrentVersionResolver(self.root)
+
+    def write(self, path, text):
+        with open(path, "w") as f: f.write(text)
+
+    def resolve(self, shell=""):
+        return self.resolver.resolve({"PYENV_VERSION": shell} if shell else {}, cwd=self.cwd)
+
+    def test_precedence(self):
+        self.assertEqual(self.resolve(), {"global": "system", "local": "N/A", "shell": "N/A", "origin": os.path.join(self.root, "version")})
+        self.write(os.path.join(self.root, "version"), "3.11.7\n")
+        self.assertEqual((self.resolve()["global"], self.resolve()["origin"]), ("3.11.7", os.path.join(self.root, "version")))
+        self.write(os.path.join(self.project, ".python-version"), "# pinned\n3.12.1 extra words\n3.11.7\n")
+        result = self.resolve()
+        self.assertEqual((result["local"], result["global"], result["origin"]),
+                         ("3.12.1\n3.11.7", "3.11.7", os.path.join(self.project, ".python-version")))
+        self.write(os.path.join(self.cwd, ".python-version"), "3.13.0\n") # The nearest file wins
+        self.assertEqual(self.resolve()["local"], "3.13.0")
+        result = self.resolve(shell="pypy3.10-7.3.12")
+        self.assertEqual((result["shell"], result["local"], result["origin"]),
+                         ("pypy3.10-7.3.12", "3.13.0", "PYENV_VERSION environment variable"))
+
+    def test_path_like_names_outside_versions_are_ignored(self):
+        self.write(os.path.join(self.project, ".python-version"), "../../etc\n3.12.1\n")
+        self.assertEqual(self.resolve()["local"], "3.12.1")
+
+    def test_cache_follows_the_version_files(self):
+        local_file = os.path.join(self.project, ".python-version")
+        self.write(local_file, "3.12.1\n")
+        self.assertEqual(self.resolve()["local"], "3.12.1")
+        self.assertEqual(self.resolve()["local"], "3.12.1")
+        self.assertEqual((self.resolver.cache_misses, self.resolver.cache_hits), (1, 1))
+        self.write(local_file, "3.12.10\n") # Edited in place
+        self.assertEqual(self.resolve()["local"], "3.12.10")
+        self.write(os.path.join(self.cwd, ".python-version"), "3.13.0\n") # A nearer file appears
+        self.assertEqual(self.resolve()["local"], "3.13.0")
+        os.remove(os.path.join(self.cwd, ".python-version"))
+        self.assertEqual(self.resolve()["local"], "3.12.10")
+        self.write(os.path.join(self.root, "version"), "3.11.7\n")
+        self.assertEqual(self.resolve()["global"], "3.11.7")
+        self.assertEqual(self.resolve(shell="3.10.13")["shell"], "3.10.13")
+        self.assertEqual((self.resolver.cache_misses, self.resolver.cache_hits), (6, 1))
+
+
+class InstallListCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.definitions = os.path.join(self.root, "plugins", "python-build", "share", "python-build")
+        os.makedirs(self.definitions)
+        self.touch("3.12.1")
+        self.cache = InstallListCache(self.root, None, os.path.join(self.root, "cache"))
+
+    def touch(self, name, mtime_ns=None):
+        with open(os.path.join(self.definitions, name), "w") as f: f.write("install_package ...\n")
+        if mtime_ns is not None: os.utime(self.definitions, ns=(mtime_ns, mtime_ns))
+
+    def test_key_follows_the_definitions_directories(self):
+        key = self.cache.compute_key("pyenv 2.4.0")
+        self.assertEqual(self.cache.compute_key("pyenv 2.4.0"), key)
+        self.assertNotEqual(self.cache.compute_key("pyenv 2.4.1"), key)
+        mtime_ns = os.stat(self.definitions).st_mtime_ns
+        self.touch("3.13.0", mtime_ns) # A new definition, even with the directory mtime unchanged
+        self.assertNotEqual(self.cache.compute_key("pyenv 2.4.0"), key)
+        key = self.cache.compute_key("pyenv 2.4.0")
+        os.utime(self.definitions, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9)) # An edited definition
+        self.assertNotEqual(self.cache.compute_key("pyenv 2.4.0"), key)
+        key = self.cache.compute_key("pyenv 2.4.0")
+        plugin = os.path.join(self.root, "plugins", "pyenv-extra", "share", "python-build")
+        os.makedirs(plugin) # A plugin that brings its own definitions
+        self.assertNotEqual(self.cache.compute_key("pyenv 2.4.0"), key)
+
+    def test_key_skips_a_directory_that_vanishes_after_listing(self):
+        empty = InstallListCache(os.path.join(self.root, "cache"), None)
+        with mock.patch.object(self.cache, "definition_dirs", return_value=self.cache.definition_dirs()), \
+             mock.patch("os.stat", side_effect=FileNotFoundError):
+            self.assertEqual(self.cache.compute_key("pyenv 2.4.0"), empty.compute_key("pyenv 2.4.0"))
+
+
+class CatalogueIndexTest(unittest.TestCase):
+    VERSIONS = ["2.7.18", "3.1.5", "3.10.13", "3.12.1", "3.12.1t", "3.13.0rc1", "pypy2.7-7.3.12", "pypy3.10-7.3.12",
+                "miniconda3-4.7.12", "graalpy-23.1.0", "stackless-3.7.5"]
+
+    def typed(self, index, query): # Search each prefix of query in turn, as typing it into the filter does
+        for end in range(1, len(query) + 1): result = index.search(query[:end])
+        return result
+
+    def test_typing_ahead_matches_a_fresh_search(self):
+        for query in ("3.12", "3.1", "py 3.10", "pypy3", "3.12.1t", "conda", "7.3.12 pypy", "xyz"):
+            with self.subTest(query=query):
+                self.assertEqual(self.typed(CatalogueIndex(self.VERSIONS), query), CatalogueIndex(self.VERSIONS).search(query))
+
+    def test_backspacing_widens_again(self):
+        index = CatalogueIndex(self.VERSIONS)
+        self.typed(index, "3.12")
+        self.assertEqual(index.search("3.1"), CatalogueIndex(self.VERSIONS).search("3.1"))
+        self.assertEqual(index.search(""), list(range(len(self.VERSIONS))))
+
+    def test_non_plain_queries_search_everything(self):
+        # "<30" matches versions "<3" excluded, so it must not be narrowed from that result
+        index = CatalogueIndex(self.VERSIONS)
+        names = lambda query: [self.VERSIONS[i] for i in index.search(query)]
+        self.assertEqual(names("<3"), ["2.7.18", "pypy2.7-7.3.12"]) # Compared on every implementation's leading number
+        self.assertEqual(names("<30"), self.VERSIONS)
+        self.assertEqual(names("pypy"), ["pypy2.7-7.3.12", "pypy3.10-7.3.12"])
+        self.assertEqual(names("pypy:>=3"), ["pypy3.10-7.3.12"])
+        self.assertEqual(names("pypy:>=3 "), ["pypy3.10-7.3.12"])
+        self.assertEqual(names("cpython:3.12"), ["3.12.1", "3.12.1t"])
+        self.assertEqual(names("cpython:3.12 >=3.12.1"), ["3.12.1", "3.12.1t"])
+
+
+class FakeSource:
+    # A refresh source whose fetch for generation N runs until gates[N] is opened, then notices a cancellation
+    def __init__(self):
+        self.started, self.delivered = queue.Queue(), queue.Queue()
+        self.gates = collections.defaultdict(threading.Event)
+
+    def fetch(self, flight):
+        self.started.put(flight.generation)
+        self.gates[flight.generation].wait(5)
+        if flight.cancelled.is_set(): raise RefreshCancelled(flight.source)
+        if flight.generation == 3: raise ValueError("broken")
+        return f"result {flight.generation}"
+
+    def deliver(self, result, error):
+        self.delivered.put((result, error))
+
+
+class RefreshCoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.source = FakeSource()
+        self.coordinator = RefreshCoordinator(debounce_seconds=0.05)
+        self.coordinator.register("installed", self.source.fetch, self.source.deliver)
+
+    def counters(self):
+        return self.coordinator.stats()["installed"]
+
+    def test_first_request_runs_at_once_and_a_burst_is_merged(self):
+        self.coordinator.request("installed")
+        self.assertEqual(self.source.started.get(timeout=5), 1)
+        self.source.gates[1].set()
+        self.assertEqual(self.source.delivered.get(timeout=5), ("result 1", None))
+        for _ in range(3): self.coordinator.request("installed") # Debounced into one run
+        self.assertEqual(self.source.started.get(timeout=5), 2)
+        self.source.gates[2].set()
+        self.assertEqual(self.source.delivered.get(timeout=5), ("result 2", None))
+        self.assertTrue(self.source.started.empty())
+        self.assertEqual(self.counters(), {"requested": 4, "merged": 2, "started": 2, "processes": 0, "delivered": 2})
+
+    def test_request_while_running_supersedes_the_flight(self):
+        self.coordinator.request("installed")
+        self.assertEqual(self.source.started.get(timeout=5), 1)
+        self.coordinator.request("installed") # Cancels flight 1; one fresh run follows once it has exited
+        self.coordinator.request("installed") # Merged into that rerun
+        self.assertTrue(self.source.started.empty())
+        self.source.gates[1].set()
+        self.assertEqual(self.source.started.get(timeout=5), 2)
+        self.source.gates[2].set()
+        self.assertEqual(self.source.delivered.get(timeout=5), ("result 2", None)) # Flight 1's result was dropped
+        self.assertEqual(self.counters(), {"requested": 3, "superseded": 1, "merged": 1, "started": 2, "processes": 0,
+                                           "discarded": 1, "delivered": 1})
+        self.assertTrue(self.source.delivered.empty())
+
+    def test_failures_are_delivered(self):
+        for generation in (1, 2, 3): self.source.gates[generation].set()
+        for _ in range(3):
+            self.coordinator.request("installed")
+            result, error = self.source.delivered.get(timeout=5)
+        self.assertIsNone(result)
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(self.counters()["failed"], 1)
+
+    def test_an_older_flight_never_overwrites_a_newer_delivery(self):
+        state = self.coordinator._sources["installed"]
+        for generation in (1, 2): self.source.gates[generation].set()
+        self.coordinator._run(state, RefreshFlight("installed", 2)) # Flight 2 finishes first
+        self.coordinator._run(state, RefreshFlight("installed", 1))
+        self.assertEqual(self.source.delivered.get(timeout=5), ("result 2", None))
+        self.assertTrue(self.source.delivered.empty())
+
+    def test_superseding_terminates_the_flights_subprocess(self):
+        started, delivered = threading.Event(), queue.Queue()
+        def fetch(flight):
+            if flight.generation > 1: return "fresh"
+            started.set()
+            return flight.run([sys.executable, "-c", "import time; time.sleep(30)"])
+        self.coordinator.register("slow", fetch, lambda result, error: delivered.put(result))
+        began = time.monotonic()
+        self.coordinator.request("slow")
+        started.wait(5)
+        while self.coordinator._sources["slow"]["flight"].process is None: time.sleep(0.01)
+        self.coordinator.request("slow")
+        self.assertEqual(delivered.get(timeout=10), "fresh")
+        self.assertLess(time.monotonic() - began, 10)
+        self.assertEqual(self.coordinator.stats()["slow"]["processes"], 1)
+
+
+@unittest.skipUnless(os.name == "posix" and shutil.which("bash"), "the session is a bash coprocess")
+class PyenvSessionTest(unittest.TestCase):
+    # A fake pyenv front script (exec pyenv-<command> from PATH with PYENV_ROOT set) and two subcommands
+    SCRIPTS = {
+        "pyenv": 'export PYENV_ROOT="${0%/bin/pyenv}"\ncommand="$1"; shift\nexec "pyenv-$command" "$@"\n',
+        "pyenv-echo": 'echo "args:$*"\necho "version:${PYENV_VERSION-unset} dir:$PYENV_DIR"\necho oops >&2\nexit 3\n',
+        "pyenv-sleep": 'sleep 30\n',
+    }
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        bin_dir = os.path.join(self.root, "bin")
+        os.makedirs(bin_dir)
+        for name, body in self.SCRIPTS.items():
+            with open(os.path.join(bin_dir, name), "w") as f: f.write("#!/usr/bin/env bash\n" + body)
+            os.chmod(os.path.join(bin_dir, name), 0o755)
+        env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""))
+        env.pop("PYENV_VERSION", None)
+        self.session = PyenvSession(os.path.join(bin_dir, "pyenv"), lambda: dict(env))
+        self.addCleanup(self.session.close)
+
+    def test_frames_carry_status_and_output(self):
+        with mock.patch.dict(os.environ, {"PYENV_VERSION": "3.12.1"}):
+            result = self.session.run(["echo", "a b", "c"])
+        self.assertEqual((result.returncode, result.stdout, result.stderr),
+                         (3, f"args:a b c\nversion:3.12.1 dir:{os.getcwd()}\n", "oops\n"))
+        result = self.session.run(["echo"], merge_stderr=True)
+        self.assertEqual(result.stdout.splitlines()[0::2], ["args:", "oops"])
+        self.assertEqual((self.session.counters["runs"], self.session.counters["starts"]), (2, 1))
+
+    def test_commands_needing_the_front_script_fall_back(self):
+        self.assertIsNone(self.session.run(["missing"]))
+        self.assertIsNone(self.session.run(["echo", "--help"]))
+        self.assertEqual(self.session.counters["fallbacks"], 2)
+
+    def test_timeout_and_cancellation_restart_the_shell(self):
+        began = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired): self.session.run(["sleep"], timeout=0.2)
+        cancelled = threading.Event()
+        threading.Timer(0.2, cancelled.set).start()
+        with self.assertRaises(RefreshCancelled): self.session.run(["sleep"], cancelled=cancelled)
+        self.assertLess(time.monotonic() - began, 10)
+        self.assertIsNone(self.session.process)
+        self.assertEqual(self.session.run(["echo"]).returncode, 3)
+        self.assertEqual(self.session.counters["starts"], 3)
+
+    def test_a_dead_shell_is_replaced(self):
+        self.session.run(["echo"])
+        self.session.process.kill(); self.session.process.wait()
+        self.assertEqual(self.session.run(["echo"]).returncode, 3) # poll() sees it exited; a new shell is started
+        self.assertEqual(self.session.counters["starts"], 2)
+
+    def test_an_unexpected_frame_closes_the_session(self):
+        self.session.run(["echo"])
+        self.session._buffer = b"\x1e99 0\n" # A frame for some other request
+        self.assertIsNone(self.session.run(["echo"])) # The caller spawns pyenv instead
+        self.assertEqual((self.session.counters["failures"], self.session.process), (1, None))
+        self.assertEqual(self.session.run(["echo"]).returncode, 3)
+
+    def test_closed_sessions_leave_no_exit_handlers(self):
+        handlers = []
+        with mock.patch("pyenv_engine.atexit") as fake_atexit:
+            fake_atexit.register.side_effect = handlers.append
+            fake_atexit.unregister.side_effect = lambda function: handlers.remove(function)
+            for _ in range(3):
+                self.session.run(["echo"]); self.session.run(["echo"])
+                self.assertEqual(handlers, [self.session.close])
+                self.session.close()
+                self.assertEqual(handlers, [])
+
+
+class LogIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, "install.log")
+        self.write("first\nsecond\n")
+        self.index = LogIndex(self.path)
+        self.addCleanup(self.index.close)
+
+    def write(self, text, mode="w", mtime_offset=0):
+        with open(self.path, mode) as f: f.write(text)
+        if mtime_offset:
+            mtime_ns = os.stat(self.path).st_mtime_ns + mtime_offset
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def lines(self):
+        while self.index.refresh(budget=4): pass # Small chunks, so indexing stops mid-file
+        return self.index.lines(0, self.index.line_count)
+
+    def test_growth_is_indexed_incrementally(self):
+        self.assertEqual(self.lines(), ["first", "second"])
+        self.write("third\npartial", mode="a")
+        self.assertEqual(self.lines(), ["first", "second", "third", "partial"])
+        self.assertEqual(self.index.generation, 0)
+
+    def test_a_replaced_larger_file_is_reindexed(self):
+        self.assertEqual(self.lines(), ["first", "second"])
+        replacement = self.path + ".new"
+        with open(replacement, "w") as f: f.write("rerun line one\nrerun line two\nrerun line three\n")
+        os.replace(replacement, self.path) # Rotation / a rerun writing a new file
+        self.assertEqual(self.lines(), ["rerun line one", "rerun line two", "rerun line three"])
+
+    def test_a_file_rewritten_in_place_is_reindexed(self):
+        self.assertEqual(self.lines(), ["first", "second"])
+        self.write("FIRST LINE\nSECOND LINE\nTHIRD\n") # Truncated and regrown past the old size between refreshes
+        self.assertEqual(self.lines(), ["FIRST LINE", "SECOND LINE", "THIRD"])
+        self.write("first line\nsecond line\nthird\n", mtime_offset=10 ** 9) # Same size, new mtime
+        self.assertEqual(self.lines(), ["first line", "second line", "third"])
+        self.assertEqual(self.index.generation, 2)
+
+
+class CatalogueRecordTest(unittest.TestCase):
+    FIELDS = [ # name: implementation, series, numbers, prerelease, dev, freethreaded
+        ("3.13.0rc2", ("cpython", "3.13", (0,), "rc2", False, False)),
+        ("3.12.1t", ("cpython", "3.12", (1,), None, False, True)),
+        ("3.14t-dev", ("cpython", "3.14", (), None, True, True)),
+        ("2.7.18", ("cpython", "2.7", (18,), None, False, False)),
+        ("pypy3.10-7.3.17", ("pypy", "3.10", (7, 3, 17), None, False, False)),
+        ("miniconda3-24.1.2-0", ("miniconda3", "24.1", (2, 0), None, False, False)),
+        ("graalpy-23.1.0", ("graalpy", "23.1", (0,), None, False, False)),
+        ("stackless-3.7.5", ("stackless", "3.7", (5,), None, False, False)),
+    ]
+
+    def test_fields(self):
+        for name, expected in self.FIELDS:
+            with self.subTest(name=name):
+                record = CatalogueRecord(name)
+                self.assertEqual((record.implementation, record.series, record.numbers, record.prerelease, record.dev,
+                                  record.freethreaded), expected)
+
+    def test_version_order(self):
+        # Numeric series, a < b < rc < final, free-threaded right after its regular build, -dev after every release
+        ordered = ["3.9.18", "3.10.0a1", "3.10.0a7", "3.10.0b2", "3.10.0rc1", "3.10.0", "3.10.0t", "3.10.1", "3.10.12",
+                   "3.10-dev", "3.10t-dev", "3.11.0"]
+        for shuffled in (list(reversed(ordered)), ordered[1::2] + ordered[0::2]):
+            self.assertEqual(sorted(shuffled, key=lambda name: CatalogueRecord(name).version_key), ordered)
+
+    def test_catalogue_groups_cpython_first_then_newest_first(self):
+        names = ["pypy3.10-7.3.17", "3.12.1", "pypy3.9-7.3.16", "3.13.0", "graalpy-23.1.0", "3.12.1t", "3.13.0rc1"]
+        self.assertEqual([record.name for record in catalogue_records(names)],
+                         ["3.13.0", "3.13.0rc1", "3.12.1t", "3.12.1", "graalpy-23.1.0", "pypy3.10-7.3.17", "pypy3.9-7.3.16"])
+
+
+class BuildProfileTest(unittest.TestCase):
+    CASES = [ # profile, environment before, the variables afterwards
+        ("default", {"PYTHON_CONFIGURE_OPTS": "--enable-shared"}, {"PYTHON_CONFIGURE_OPTS": "--enable-shared"}),
+        ("fast-build", {"PYTHON_CONFIGURE_OPTS": "--enable-shared --enable-optimizations --with-lto=full"},
+         {"PYTHON_CONFIGURE_OPTS": "--enable-shared", "CFLAGS": "-O1 -g0"}),
+        ("fast-build", {"CONFIGURE_OPTS": "--with-lto --enable-optimizations", "CFLAGS": "-march=native"},
+         {"CFLAGS": "-march=native -O1 -g0"}),
+        ("production", {"PYTHON_CONFIGURE_OPTS": "--enable-optimizations"}, {"PYTHON_CONFIGURE_OPTS": "--enable-optimizations --with-lto"}),
+        ("production", {}, {"PYTHON_CONFIGURE_OPTS": "--enable-optimizations --with-lto"}),
+        ("debug", {"PYTHON_CONFIGURE_OPTS": "--enable-optimizations"}, {"PYTHON_CONFIGURE_OPTS": "--with-pydebug", "CFLAGS": "-O0 -g3"}),
+    ]
+
+    def test_profiles(self):
+        for profile, before, after in self.CASES:
+            with self.subTest(profile=profile, env=before):
+                env = apply_build_profile(dict(before, HOME="/home/user"), profile)
+                self.assertEqual(env, dict(after, HOME="/home/user"))
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError): apply_build_profile({}, "turbo")
+
+    def test_make_jobs_leave_a_users_j_alone(self):
+        cases = [({}, "default", f"-j{available_cpus()}"), ({"MAKE_OPTS": "-j3"}, "fast-build", "-j3"),
+                 ({"MAKE_OPTS": "-s"}, "fast-build", f"-s -j{available_cpus()}"), ({"MAKEFLAGS": "-j5"}, "fast-build", None)]
+        for env, profile, make_opts in cases:
+            with self.subTest(env=env, profile=profile):
+                scheduler = InstallScheduler(lambda job: dict(env), lambda event, job, data: None)
+                job = scheduler.submit("3.12.1", [], runner=lambda job, emit: 0, build_profile=profile)
+                self.assertEqual(scheduler._job_env(job).get("MAKE_OPTS"), make_opts)
+
+
+class ArtifactCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = ArtifactCache(os.path.join(self.directory, "artifacts"))
+        self.addCleanup(atexit.unregister, self.cache.flush)
+
+    def built_tree(self, root, config_args="'--prefix=/x'", shared_lib=False):
+        prefix = os.path.join(self.directory, root, "versions", "3.12.1")
+        files = {"bin/python3.12": b"\x7fELF\0binary", "bin/pip": f"#!{prefix}/bin/python3.12\n".encode(),
+                 "lib/python3.12/_sysconfigdata__linux_x86_64-linux-gnu.py":
+                     f"build_time_vars = {{'CONFIG_ARGS': {config_args!r},\n 'prefix': '{prefix}'}}\n".encode()}
+        if shared_lib: files["lib/libpython3.12.so.1.0"] = b"\x7fELF\0library"
+        for relative, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(prefix, relative)), exist_ok=True)
+            with open(os.path.join(prefix, relative), "wb") as f: f.write(content)
+        return prefix
+
+    def test_prefix_binding_is_read_from_the_tree(self):
+        cases = ((dict(), False), (dict(shared_lib=True), True),
+                 (dict(config_args="'--prefix=/x' '--enable-shared'"), True), (dict(config_args="'--enable-framework=/x'"), True))
+        for index, (tree, bound) in enumerate(cases):
+            with self.subTest(**tree):
+                source = self.built_tree(f"root{index}", **tree)
+                self.cache.store_tree(f"key{index}", "3.12.1", source, configure="") # Nothing in the environment
+                self.assertIsNotNone(self.cache.lookup(f"key{index}", prefix=source))
+                moved = self.cache.lookup(f"key{index}", prefix=os.path.join(self.directory, "elsewhere", "versions", "3.12.1"))
+                self.assertEqual(moved is None, bound)
+
+    def test_linked_restore_relocates_into_new_inodes(self):
+        source = self.built_tree("a")
+        self.cache.store_tree("key", "3.12.1", source)
+        cached_pip = os.path.join(self.cache.trees_dir, "key", "bin", "pip")
+        with open(cached_pip, "rb") as f: cached_content = f.read()
+        destination = os.path.join(self.directory, "b", "versions", "3.12.1")
+        os.makedirs(os.path.dirname(destination))
+        self.cache.restore_tree("key", destination, link_files=True)
+        for relative in ("bin/pip", "lib/python3.12/_sysconfigdata__linux_x86_64-linux-gnu.py"): # Rewritten by _relocate
+            restored = os.path.join(destination, relative)
+            self.assertFalse(os.path.samefile(restored, os.path.join(self.cache.trees_dir, "key", relative)), relative)
+            with open(restored, "rb") as f: self.assertIn(destination.encode(), f.read())
+        self.assertTrue(os.path.samefile(os.path.join(destination, "bin", "python3.12"),
+                                         os.path.join(self.cache.trees_dir, "key", "bin", "python3.12")))
+        with open(cached_pip, "rb") as f: self.assertEqual(f.read(), cached_content)
+
+    def test_restore_copies_by_default(self):
+        self.cache.store_tree("key", "3.12.1", self.built_tree("a"))
+        destination = os.path.join(self.directory, "b", "versions", "3.12.1")
+        os.makedirs(os.path.dirname(destination))
+        self.cache.restore_tree("key", destination)
+        self.assertFalse(os.path.samefile(os.path.join(destination, "bin", "python3.12"),
+                                          os.path.join(self.cache.trees_dir, "key", "bin", "python3.12")))
+
+    def test_cancelled_restore_leaves_nothing_behind(self):
+        self.cache.store_tree("key", "3.12.1", self.built_tree("a"))
+        versions_dir = os.path.join(self.directory, "b", "versions")
+        os.makedirs(versions_dir)
+        # Six checks here: one per directory copied (4), then before relocating and before the rename
+        for cancel_at in range(1, 7):
+            with self.subTest(cancel_at=cancel_at):
+                checks = itertools.count(1)
+                with self.assertRaises(RestoreCancelled):
+                    self.cache.restore_tree("key", os.path.join(versions_dir, "3.12.1"), cancelled=lambda: next(checks) == cancel_at)
+                self.assertEqual(os.listdir(os.path.dirname(versions_dir)), ["versions"]) # No temp dir left
+                self.assertEqual(os.listdir(versions_dir), [])
+
+    def test_lookups_batch_manifest_writes(self):
+        self.cache.store_tree("key", "3.12.1", self.built_tree("a"))
+        written = os.stat(self.cache.manifest_path).st_mtime_ns
+        os.utime(self.cache.manifest_path, ns=(written - 10 ** 9, written - 10 ** 9))
+        for _ in range(5): self.cache.lookup("key")
+        self.assertEqual(os.stat(self.cache.manifest_path).st_mtime_ns, written - 10 ** 9)
+        self.cache.flush()
+        self.assertEqual(ArtifactCache(self.cache.root_dir)._manifest["stats"]["tree_hits"], 5)
+
+
+class EngineTestCase(unittest.TestCase):
+    # A PyenvEngine on a throwaway root, with its caches in a throwaway XDG_CACHE_HOME and no working pyenv
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="pyenv-gui-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.root, "versions"))
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": os.path.join(self.root, "cache")})
+        patcher.start(); self.addCleanup(patcher.stop)
+        self.engine = PyenvEngine("/bin/false", self.root)
+
+
+class DirectUninstallTest(EngineTestCase):
+    @unittest.skipUnless(os.name == "posix", "trash sweeping probes pids on POSIX only")
+    def test_runs_keep_to_their_own_trash_directory(self):
+        os.makedirs(os.path.join(self.root, "versions", "3.12.1", "bin"))
+        trash_dir = os.path.join(self.root, PyenvEngine.TRASH_DIR_NAME)
+        live_run = os.path.join(trash_dir, f"{os.getppid()}-other-run", "0-3.11.0")
+        dead_run = os.path.join(trash_dir, "999999999-crashed-run")
+        os.makedirs(live_run); os.makedirs(dead_run)
+        with mock.patch.dict(os.environ, {"PYENV_GUI_UNINSTALL_METHOD": "direct"}):
+            results = self.engine.uninstall_many(["3.12.1"])
+        self.assertTrue(results[0]["removed"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "versions", "3.12.1")))
+        self.assertTrue(os.path.isdir(live_run)) # Another live run's trees are left alone
+        self.assertFalse(os.path.exists(dead_run))
+        self.assertEqual(os.listdir(trash_dir), [f"{os.getppid()}-other-run"])
+
+
+if __name__ == "__main__":
+    unittest.main()